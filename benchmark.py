@@ -0,0 +1,422 @@
+"""Run a grid of MILP and CP configurations in parallel with per-run limits and resumable results.
+
+Every configuration runs in its own process under a wall-clock and an address space limit.
+The result of a run is appended as one JSON line to the results file as soon as it finishes,
+so a crash or a killed run loses nothing else, and a restarted benchmark skips the
+configurations that are already in the file. With a trace directory, the objective and the
+bound over time of every run are kept as <run_id>.npz, see load_progress.
+
+Example
+-------
+>>> grid = get_grid(methods=["MILP", "CP"], n_opt_list=range(10, 94, 5), seeds=[0, 1])
+>>> run_benchmark(grid, "benchmark_results.jsonl", max_parallel=4, timeout=3600)
+>>> results = load_results("benchmark_results.jsonl")
+>>> progress = load_progress("traces").merge(results, on="run_id")
+
+"""
+
+import argparse
+import hashlib
+import itertools as it
+import json
+import multiprocessing
+import os
+import random
+import resource
+import signal
+import sys
+import time
+import traceback
+
+import numpy as np
+import pandas as pd
+
+
+def get_grid(
+    methods=("MILP", "CP"),
+    n_opt_list=(10,),
+    num_workers_list=(16,),
+    options_list=({},),
+    seeds=(None,),
+):
+    """Get the configurations of the cartesian product of the arguments.
+
+    Parameters
+    ----------
+    methods : list[str]
+        "MILP" (run_single_milp) and/or "CP" (run_single_cp).
+    n_opt_list : list[int]
+        The numbers of operations.
+    num_workers_list : list[int | None]
+        The solver threads.
+    options_list : list[dict]
+        Further keyword arguments of run_single_milp or run_single_cp, e.g.
+        {"formulation": "indicator", "sparse_pairs": True}.
+    seeds : list[int | None]
+        The random seeds of the solver and of the Python and numpy generators.
+
+    Returns
+    -------
+    list[dict]
+        One configuration per combination, with the keys method, n_opt, num_workers, seed
+        and options.
+
+    """
+    return [
+        {
+            "method": method.upper(),
+            "n_opt": int(n_opt),
+            "num_workers": num_workers,
+            "seed": seed,
+            "options": dict(options),
+        }
+        for method, n_opt, num_workers, options, seed in it.product(
+            methods, n_opt_list, num_workers_list, options_list, seeds
+        )
+    ]
+
+
+def get_run_id(config):
+    """Get the key of a configuration, the same for equal configurations."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def to_json(value):
+    """Convert the numpy scalars of a row for json.dumps."""
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def append_result(path, record):
+    """Append record as one JSON line with a single write to a file opened with O_APPEND."""
+    line = (json.dumps(record, default=to_json) + "\n").encode()
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_records(path):
+    """Read the records of a results file, a line cut short by a crash is skipped."""
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def load_results(path):
+    """Load a results file as a DataFrame with one row per run.
+
+    The columns are run_id, outcome, the configuration, the columns of the row of
+    run_single_milp/run_single_cp and the options prefixed with "option_".
+    """
+    rows = []
+    for record in read_records(path):
+        row = {"run_id": record["run_id"], "outcome": record["outcome"]}
+        row.update({key: value for key, value in record["config"].items() if key != "options"})
+        row.update({f"option_{key}": value for key, value in record["config"]["options"].items()})
+        row.update(record.get("row") or {})
+        row["error"] = record.get("error")
+        row["wall_seconds"] = record["wall_seconds"]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def load_progress(trace_dir):
+    """Load the ProgressTrace files of a trace directory as one DataFrame.
+
+    The columns are run_id (the file name), the columns of ProgressTrace and the metadata of
+    the file, e.g. method and n_opt, with one row per improved incumbent or bound.
+    """
+    # imported here, so that loading the results does not load the solvers
+    from fjss import ProgressTrace
+
+    frames = []
+    for fname in sorted(os.listdir(trace_dir)):
+        if not fname.endswith(".npz"):
+            continue
+        arrays = ProgressTrace.load(os.path.join(trace_dir, fname))
+        frame = pd.DataFrame({name: arrays.pop(name) for name in ProgressTrace.COLUMNS})
+        frame.insert(0, "run_id", fname[: -len(".npz")])
+        for name, value in arrays.items():
+            frame[name] = value.item()
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=["run_id", *ProgressTrace.COLUMNS])
+    return pd.concat(frames, ignore_index=True)
+
+
+def get_exit_reason(exitcode):
+    """Describe the exit code of a process, a negative one is the signal that killed it."""
+    if exitcode is not None and exitcode < 0:
+        try:
+            name = signal.Signals(-exitcode).name
+        except ValueError:
+            return f"killed by signal {-exitcode}"
+        return f"killed by signal {-exitcode} ({name})"
+    return f"exit code {exitcode}"
+
+
+def run_config(
+    config, memory_limit, connection, log_path=None, progress_path=None, time_limit=None
+):
+    """Run a single configuration in a child process and send the outcome over connection.
+
+    Parameters
+    ----------
+    config : dict
+        A configuration of get_grid.
+    memory_limit : int | None
+        The address space limit (RLIMIT_AS) of the process in bytes.
+    connection : multiprocessing.connection.Connection
+        Receives (outcome, row, error).
+    log_path : str, optional
+        The file that gets the output of the run instead of the terminal.
+    progress_path : str, optional
+        The npz file that gets the ProgressTrace of the solver.
+    time_limit : float, optional
+        The upper bound of the time_limit of the solver in seconds, the smaller of it and the
+        time_limit of the options is used.
+
+    """
+    if log_path is not None:
+        log = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.dup2(log, sys.stdout.fileno())
+        os.dup2(log, sys.stderr.fileno())
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    if config["seed"] is not None:
+        random.seed(config["seed"])
+        np.random.seed(config["seed"])
+
+    # imported here, so that the solvers are only loaded in the child processes
+    import gurobipy as gp
+    from gurobipy import GRB
+
+    from profiling_utils import run_single_cp, run_single_milp
+
+    run_single = run_single_milp if config["method"] == "MILP" else run_single_cp
+    options = dict(config["options"])
+    if time_limit is not None and options.get("time_limit") is not None:
+        options["time_limit"] = min(options["time_limit"], time_limit)
+    elif time_limit is not None:
+        options["time_limit"] = time_limit
+    try:
+        row = run_single(
+            n_opt_selected=config["n_opt"],
+            num_workers=config["num_workers"],
+            seed=config["seed"],
+            progress_path=progress_path,
+            **options,
+        )
+        connection.send(("ok", dict(row), None))
+    except MemoryError:
+        connection.send(("memory", None, traceback.format_exc()))
+    except gp.GurobiError as error:
+        # gurobi reports a failed allocation as an error, not as MemoryError
+        outcome = "memory" if error.errno == GRB.Error.OUT_OF_MEMORY else "error"
+        connection.send((outcome, None, traceback.format_exc()))
+    except Exception:  # pylint: disable=broad-except
+        connection.send(("error", None, traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+def run_benchmark(
+    grid,
+    results_path="benchmark_results.jsonl",
+    max_parallel=1,
+    timeout=None,
+    memory_limit=None,
+    log_dir=None,
+    retry_failed=False,
+    trace_dir=None,
+    time_margin=0.1,
+):
+    """Run the configurations of grid that are not in the results file yet.
+
+    Parameters
+    ----------
+    grid : list[dict]
+        The configurations, see get_grid.
+    results_path : str
+        The JSON lines file the records are appended to.
+    max_parallel : int
+        The number of runs at the same time. The threads of a run are set by its num_workers.
+    timeout : float, optional
+        The wall-clock limit of a run in seconds, a run over it is terminated. The solver
+        gets a time_limit of (1 - time_margin) * timeout, so that it stops and the row and
+        the ProgressTrace are saved before. The ProgressTrace of a run killed during the
+        solve is the one written last by save_progress, a run killed before the solve has
+        none.
+    memory_limit : int, optional
+        The address space limit of a run in bytes, set as RLIMIT_AS. It bounds the virtual
+        memory, not the resident set: the threads of gurobi and CP-SAT reserve more address
+        space than they use, so the limit has to be larger than the expected peak RSS.
+    log_dir : str, optional
+        The directory of the output of every run, <run_id>.log. By default the runs print to
+        the terminal.
+    retry_failed : bool
+        Run the configurations again whose recorded outcome is not "ok". By default every
+        recorded configuration is skipped.
+    trace_dir : str, optional
+        The directory of the ProgressTrace of every run, <run_id>.npz. By default the
+        progress of the solvers is not kept.
+    time_margin : float
+        The fraction of timeout left for reading the instance, building the model and
+        saving the results, by default 0.1.
+
+    Returns
+    -------
+    list[dict]
+        The records of the runs of this call, each with the keys run_id, config, outcome,
+        row, error and wall_seconds. The outcome is "ok" (row is the row of run_single_milp
+        or run_single_cp), "error" (error is the traceback), "timeout", "memory" or
+        "crashed" if the process exited without reporting, e.g. killed by the OS (error is
+        the exit code or the signal).
+
+    """
+    done = {
+        record["run_id"]
+        for record in read_records(results_path)
+        if record["outcome"] == "ok" or not retry_failed
+    }
+    pending = []
+    for config in grid:
+        run_id = get_run_id(config)
+        if run_id in done:
+            continue
+        done.add(run_id)
+        pending.append((run_id, config))
+    print(f"{len(grid) - len(pending)} configurations done, {len(pending)} to run")
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+    if trace_dir is not None:
+        os.makedirs(trace_dir, exist_ok=True)
+
+    time_limit = None if timeout is None else (1.0 - time_margin) * timeout
+    context = multiprocessing.get_context("spawn")
+    running = {}
+    records = []
+    while pending or running:
+        while pending and len(running) < max_parallel:
+            run_id, config = pending.pop(0)
+            receiver, sender = context.Pipe(duplex=False)
+            log_path = None if log_dir is None else os.path.join(log_dir, f"{run_id}.log")
+            progress_path = (
+                None if trace_dir is None else os.path.join(trace_dir, f"{run_id}.npz")
+            )
+            process = context.Process(
+                target=run_config,
+                args=(config, memory_limit, sender, log_path, progress_path, time_limit),
+                daemon=True,
+            )
+            process.start()
+            sender.close()
+            running[run_id] = (config, process, receiver, time.time())
+
+        time.sleep(0.1)
+        for run_id, (config, process, receiver, start_time) in list(running.items()):
+            wall_seconds = time.time() - start_time
+            if receiver.poll():
+                try:
+                    outcome, row, error = receiver.recv()
+                    process.join()
+                except EOFError:
+                    # the process exited without sending anything, e.g. a native abort
+                    process.join()
+                    outcome, row, error = "crashed", None, get_exit_reason(process.exitcode)
+            elif not process.is_alive():
+                outcome, row, error = "crashed", None, get_exit_reason(process.exitcode)
+            elif timeout is not None and wall_seconds > timeout:
+                process.kill()
+                process.join()
+                outcome, row, error = "timeout", None, None
+            else:
+                continue
+
+            receiver.close()
+            del running[run_id]
+            record = {
+                "run_id": run_id,
+                "config": config,
+                "outcome": outcome,
+                "row": row,
+                "error": error,
+                "wall_seconds": wall_seconds,
+            }
+            append_result(results_path, record)
+            records.append(record)
+            print(
+                f"{config['method']} n_opt={config['n_opt']} seed={config['seed']}: "
+                f"{outcome} after {wall_seconds:.1f} s"
+            )
+
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", default="benchmark_results.jsonl")
+    parser.add_argument("--methods", nargs="+", default=["MILP", "CP"])
+    parser.add_argument("--n-opt", nargs="+", type=int, default=list(range(10, 94, 5)))
+    parser.add_argument("--num-workers", nargs="+", type=int, default=[16])
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument(
+        "--options",
+        nargs="+",
+        type=json.loads,
+        default=[{}],
+        help="keyword arguments of run_single_milp/run_single_cp as JSON objects",
+    )
+    parser.add_argument("--max-parallel", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=None, help="seconds per run")
+    parser.add_argument(
+        "--memory-gb",
+        type=float,
+        default=None,
+        help="GiB of address space per run (RLIMIT_AS, larger than the resident memory)",
+    )
+    parser.add_argument("--log-dir", default=None)
+    parser.add_argument("--retry-failed", action="store_true")
+    parser.add_argument("--trace-dir", default=None, help="directory of the progress traces")
+    parser.add_argument(
+        "--time-margin",
+        type=float,
+        default=0.1,
+        help="fraction of the timeout not given to the solver",
+    )
+    args = parser.parse_args()
+
+    grid = get_grid(
+        methods=args.methods,
+        n_opt_list=args.n_opt,
+        num_workers_list=args.num_workers,
+        options_list=args.options,
+        seeds=args.seeds,
+    )
+    run_benchmark(
+        grid,
+        results_path=args.results,
+        max_parallel=args.max_parallel,
+        timeout=args.timeout,
+        memory_limit=None if args.memory_gb is None else int(args.memory_gb * 1024**3),
+        log_dir=args.log_dir,
+        retry_failed=args.retry_failed,
+        trace_dir=args.trace_dir,
+        time_margin=args.time_margin,
+    )
+
+
+# the main script
+if __name__ == "__main__":
+    main()
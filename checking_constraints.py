@@ -1,11 +1,202 @@
 # check constrints
 
 import numpy as np
-import itertools as it
 
 eps = 1e-6
 
 
+class ConstraintViolations:
+    """Violated constraints of a solution, one record per violated (equation, i, j, m).
+
+    The records are kept in a NumPy structured array with the fields eq, i, j, m and slack. An
+    index that an equation does not have is -1 (for eq. (24) of the CP, j is the time step) and
+    slack is the amount by which the constraint is violated, as a negative number.
+    """
+
+    dtype = np.dtype(
+        [("eq", "U8"), ("i", np.int64), ("j", np.int64), ("m", np.int64), ("slack", float)]
+    )
+
+    def __init__(self, records: np.ndarray = None):
+        if records is None:
+            records = np.empty(0, dtype=self.dtype)
+        self.records = np.asarray(records, dtype=self.dtype)
+
+    @classmethod
+    def from_residuals(cls, families):
+        """Collect the violations from (equation, residual, i, j, m, tolerance) tuples."""
+        chunks = []
+        for equation, residual, idx_i, idx_j, idx_m, tol in families:
+            residual = np.asarray(residual, dtype=float)
+            violated = np.flatnonzero(residual + tol < 0)
+            chunk = np.empty(len(violated), dtype=cls.dtype)
+            chunk["eq"] = equation
+            chunk["i"] = np.asarray(idx_i)[violated]
+            chunk["j"] = np.asarray(idx_j)[violated]
+            chunk["m"] = np.asarray(idx_m)[violated]
+            chunk["slack"] = residual[violated]
+            chunks.append(chunk)
+
+        if not chunks:
+            return cls()
+        return cls(np.concatenate(chunks))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, equation: str):
+        """Get the violations of one equation."""
+        return ConstraintViolations(self.records[self.records["eq"] == equation])
+
+    def summary(self):
+        """Summarise the violations per equation.
+
+        Returns
+        -------
+        summary : dict
+            The number of violations and the largest violation (the smallest slack) of every
+            violated equation, in the order the equations were checked.
+
+        """
+        summary = {}
+        equations, first, counts = np.unique(
+            self.records["eq"], return_index=True, return_counts=True
+        )
+        for k in np.argsort(first):
+            slack = self.records["slack"][self.records["eq"] == equations[k]]
+            summary[str(equations[k])] = {"count": int(counts[k]), "min_slack": float(slack.min())}
+
+        return summary
+
+    def to_csv(self, fname: str):
+        """Write the violations to a csv file."""
+        np.savetxt(
+            fname,
+            self.records,
+            fmt=["%s", "%d", "%d", "%d", "%.10g"],
+            delimiter=",",
+            header=",".join(self.dtype.names),
+            comments="",
+        )
+
+
+def _milp_constraint_families(
+    var_y,
+    var_s,
+    var_c,
+    var_c_max,
+    para_p,
+    para_a,
+    para_w,
+    para_h,
+    para_delta,
+    para_mach_capacity,
+    para_lmin,
+    para_lmax,
+    big_m,
+    var_x=None,
+    var_z=None,
+):
+    """Evaluate eqs. (2)-(16) of the MILP formulation as arrays.
+
+    Yields
+    ------
+    tuple[str, np.ndarray, np.ndarray, np.ndarray, np.ndarray, float]
+        The equation, the residual (lhs - rhs of the ">=" form, so that a negative value is a
+        violation), the i, j and m index of every residual (-1 if the equation does not have that
+        index) and the tolerance of the equation.
+
+    """
+    var_y = np.asarray(var_y, dtype=float)
+    var_s = np.asarray(var_s, dtype=float)
+    var_c = np.asarray(var_c, dtype=float)
+    para_p = np.asarray(para_p, dtype=float)
+    para_a = np.asarray(para_a, dtype=float)
+    para_w = np.asarray(para_w, dtype=float)
+    para_h = np.asarray(para_h, dtype=float)
+    para_delta = np.asarray(para_delta, dtype=float)
+    para_mach_capacity = np.asarray(para_mach_capacity, dtype=float)
+    para_lmin = np.asarray(para_lmin, dtype=float)
+    para_lmax = np.asarray(para_lmax, dtype=float)
+    n_opt, n_mach = var_y.shape
+
+    idx_op = np.arange(n_opt)
+    no_idx = np.full(n_opt, -1)
+
+    # eq. (2)
+    yield "eq_2", var_c_max - var_c, idx_op, no_idx, no_idx, 0.0
+    # eq. (3)
+    yield "eq_3", var_c - var_s - np.sum(para_p * var_y, axis=1), idx_op, no_idx, no_idx, eps
+    # eq. (4)
+    residual = var_s + np.sum((para_p + para_h) * var_y, axis=1) - var_c
+    yield "eq_4", residual, idx_op, no_idx, no_idx, eps
+    # eq. (5)
+    yield "eq_5", -np.abs(np.sum(var_y, axis=1) - 1), idx_op, no_idx, no_idx, 0.0
+
+    # eqs. (6) and (7) for all i != j
+    idx_i, idx_j = np.nonzero(~np.eye(n_opt, dtype=bool))
+    no_idx = np.full(len(idx_i), -1)
+    residual = var_s[idx_j] - var_c[idx_i] - para_lmin[idx_i, idx_j]
+    yield "eq_6", residual, idx_i, idx_j, no_idx, eps
+    residual = var_c[idx_i] + para_lmax[idx_i, idx_j] - var_s[idx_j]
+    yield "eq_7", residual, idx_i, idx_j, no_idx, eps
+
+    if var_x is not None:
+        var_x = np.asarray(var_x, dtype=float)
+        big_m = np.broadcast_to(np.asarray(big_m, dtype=float), (n_opt, n_opt, n_mach))
+
+        # every (i, j, m) with i < j
+        idx_i, idx_j = np.triu_indices(n_opt, k=1)
+        idx_i = np.repeat(idx_i, n_mach)
+        idx_j = np.repeat(idx_j, n_mach)
+        idx_m = np.tile(np.arange(n_mach), n_opt * (n_opt - 1) // 2)
+
+        x_ij = var_x[idx_i, idx_j]
+        y_im = var_y[idx_i, idx_m]
+        y_jm = var_y[idx_j, idx_m]
+        s_i, s_j = var_s[idx_i], var_s[idx_j]
+        c_i, c_j = var_c[idx_i], var_c[idx_j]
+        delta = para_delta[idx_m]
+        m_ijm = big_m[idx_i, idx_j, idx_m]
+        expr_0 = m_ijm * (3 - x_ij - y_im - y_jm)
+        expr_1 = m_ijm * (2 + x_ij - y_im - y_jm)
+        index = (idx_i, idx_j, idx_m)
+
+        # eq. (8)
+        yield "eq_8", s_j - c_i - para_a[idx_i, idx_j, idx_m] + expr_0, *index, eps
+        # eq. (9)
+        yield "eq_9", s_i - c_j - para_a[idx_j, idx_i, idx_m] + expr_1, *index, eps
+        # eq. (10)
+        yield "eq_10", s_j - s_i - delta + expr_0, *index, eps
+        # eq. (11)
+        yield "eq_11", s_i - s_j - delta + expr_1, *index, eps
+        # eq. (12)
+        yield "eq_12", c_j - c_i - delta + expr_0, *index, eps
+        # eq. (13)
+        yield "eq_13", c_i - c_j - delta + expr_1, *index, eps
+
+        if var_z is not None:
+            var_z = np.asarray(var_z, dtype=float)
+            z_ijm = var_z[idx_i, idx_j, idx_m]
+            z_jim = var_z[idx_j, idx_i, idx_m]
+            # eq. (14)
+            expr_2 = m_ijm * (3 + z_ijm - x_ij - y_im - y_jm)
+            yield "eq_14", s_j - c_i + expr_2, *index, eps
+            # eq. (15)
+            expr_3 = m_ijm * (2 + z_jim + x_ij - y_im - y_jm)
+            yield "eq_15", s_i - c_j + expr_3, *index, eps
+
+    # eq. (16)
+    if var_z is not None:
+        var_z = np.asarray(var_z, dtype=float)
+        var_z = var_z * ~np.eye(n_opt, dtype=bool)[:, :, None]
+        lhs = np.einsum("ijm,jm->im", var_z, para_w)
+        rhs = (para_mach_capacity[None, :] - para_w) * var_y
+        idx_i, idx_m = np.divmod(np.arange(n_opt * n_mach), n_mach)
+        residual = (rhs - lhs).ravel()
+        yield "eq_16", residual, idx_i, np.full(len(idx_i), -1), idx_m, 0.0
+
+
 def check_constraints_milp(
     var_y: np.ndarray,
     var_s: np.ndarray,
@@ -21,99 +212,150 @@ def check_constraints_milp(
     para_mach_capacity: list[int] | np.ndarray,
     para_lmin: np.ndarray,
     para_lmax: np.ndarray,
-    big_m: float | int,
+    big_m: float | int | np.ndarray,
     var_x: np.array = None,
     var_z: np.array = None,
+    return_violations: bool = False,
 ):
-    """Check the constraints of the MILP problem."""
-    n_opt = len(operations)
-    n_mach = len(machines)
-
-    print(f"shape of para_a = {para_a.shape}")
+    """Check the constraints of the MILP problem.
 
-    # eq. (2)
-    for i in range(n_opt):
-        assert var_c_max >= var_c[i]
-
-    for i in range(n_opt):
-        # eq. (3)
-        assert var_c[i] + eps >= var_s[i] + sum(
-            [para_p[i, m] * var_y[i, m] for m in range(n_mach)]
-        )  # , f"var_c[i]={var_c[i]}, var_s[i]={var_s[i]}, i={i}, sum={sum([para_p[i, m] * var_y[i, m] for m in range(n_mach)])}"
-        # eq. (4)
-        assert var_c[i] - eps <= var_s[i] + sum(
-            [(para_p[i, m] + para_h[i, m]) * var_y[i, m] for m in range(n_mach)]
-        )
-        # eq. (5)
-        assert sum([var_y[i, m] for m in range(n_mach)]) == 1
+    Every equation is evaluated as one broadcast NumPy expression. An AssertionError is raised
+    for the first equation that is violated by more than its tolerance. eqs. (8)-(15) are only
+    checked when var_x is given (eqs. (14) and (15) also need var_z) and eq. (16) only when
+    var_z is given. big_m can be a scalar or an array with shape (n_opt, n_opt, n_mach).
 
-    for i, j in it.product(range(n_opt), range(n_opt)):
-        if i != j:
-            # eq. (6)
-            assert var_s[j] + eps >= var_c[i] + para_lmin[i, j]
-            # eq. (7)
-            assert var_s[j] - eps <= var_c[i] + para_lmax[i, j]
-
-    if var_x is not None:
-        for i, j, m in it.product(range(n_opt), range(n_opt), range(n_mach)):
-            if i < j:
-                # eq. (8)
-                assert var_s[j] + eps >= var_c[i] + para_a[i, j, m] - big_m * (
-                    3 - var_x[i, j] - var_y[i, m] - var_y[j, m]
-                )  # , f"var_s[j]={var_s[j]}, var_c[i]={var_c[i]}, para_a[i, j, m]={para_a[i, j, m]}, big_m={big_m}, var_x[i, j]={var_x[i, j]}, var_y[i, m]={var_y[i, m]}, var_y[j, m]={var_y[j, m]}"
-                # eq. (9)
-                assert var_s[i] + eps >= var_c[j] + para_a[j, i, m] - big_m * (
-                    2 + var_x[i, j] - var_y[i, m] - var_y[j, m]
-                ), f"var_s[i]={var_s[i]} \n var_c[j]={var_c[j]}\n para[j, i, m]={para_a[j, i, m]} \n big_m={big_m} \n var_x[i, j]={var_x[i, j]} \n var_y[i, m]={var_y[i, m]} \n var_y[j, m]={var_y[j, m]} \n difference={var_s[i] - var_c[j] - para_a[j, i, m] + big_m * (2 + var_x[i, j] - var_y[i, m] - var_y[j, m])}"
-                # eq. (10)
-                assert var_s[j] + eps >= var_s[i] + para_delta[m] - big_m * (
-                    3 - var_x[i, j] - var_y[i, m] - var_y[j, m]
-                )
-                # eq. (11)
-                assert var_s[i] + eps >= var_s[j] + para_delta[m] - big_m * (
-                    2 + var_x[i, j] - var_y[i, m] - var_y[j, m]
-                ), f"var_s[i]={var_s[i]}, var_s[j]={var_s[j]}, para_delta[m]={para_delta[m]}, big_m={big_m}, var_x[i, j]={var_x[i, j]}, var_y[i, m]={var_y[i, m]}, var_y[j, m]={var_y[j, m]}, difference={var_s[i] - var_s[j] - para_delta[m] + big_m * (2 + var_x[i, j] - var_y[i, m] - var_y[j, m])}"
-                # assert var_s[i] + eps >= var_s[j] + para_delta[m] - big_m * (2 + var_x[i, j] - var_y[i, m] - var_y[j, m]), f"difference = {var_s[i] - var_s[j] - para_delta[m] + big_m * (2 + var_x[i, j] - var_y[i, m] - var_y[j, m])}"
-                # eq. (12)
-                assert var_c[j] + eps >= var_c[i] + para_delta[m] - big_m * (
-                    3 - var_x[i, j] - var_y[i, m] - var_y[j, m]
-                )
-                # eq. (13)
-                assert var_c[i] + eps >= var_c[j] + para_delta[m] - big_m * (
-                    2 + var_x[i, j] - var_y[i, m] - var_y[j, m]
-                ), f"var_c[i]={var_c[i]}, var_c[j]={var_c[j]}, para_delta[m]={para_delta[m]}, big_m={big_m}, var_x[i, j]={var_x[i, j]}, var_y[i, m]={var_y[i, m]}, var_y[j, m]={var_y[j, m]}, difference={var_c[i] - var_c[j] - para_delta[m] + big_m * (2 + var_x[i, j] - var_y[i, m] - var_y[j, m])}"
-                # eq. (14)
-                assert var_s[j] + eps >= var_c[i] - big_m * (
-                    3 + var_z[i, j, m] - var_x[i, j] - var_y[i, m] - var_y[j, m]
-                )
-                # eq. (15)
-                assert var_s[i] + eps >= var_c[j] - big_m * (
-                    2 + var_z[j, i, m] + var_x[i, j] - var_y[i, m] - var_y[j, m]
-                )# f"var_s[i]={var_s[i]}, var_c[j]={var_c[j]}, big_m={big_m}, var_z[i, j, m]={var_z[j,i, m]}, var_x[i, j]={var_x[i, j]}, var_y[i, m]={var_y[i, m]}, var_y[j, m]={var_y[j, m]}, difference={var_s[i] - var_c[j] + big_m * (2 + var_z[j,i,m] + var_x[i, j] - var_y[i, m] - var_y[j, m])}"
+    With return_violations=True, all constraints are checked and a ConstraintViolations report
+    of every violated constraint is returned instead.
+    """
+    assert np.shape(var_y) == (len(operations), len(machines))
+
+    families = _milp_constraint_families(
+        var_y=var_y,
+        var_s=var_s,
+        var_c=var_c,
+        var_c_max=var_c_max,
+        para_p=para_p,
+        para_a=para_a,
+        para_w=para_w,
+        para_h=para_h,
+        para_delta=para_delta,
+        para_mach_capacity=para_mach_capacity,
+        para_lmin=para_lmin,
+        para_lmax=para_lmax,
+        big_m=big_m,
+        var_x=var_x,
+        var_z=var_z,
+    )
+
+    return _check_families(families, return_violations)
+
+
+def _check_families(families, return_violations: bool):
+    """Assert that all constraints hold or return a ConstraintViolations report."""
+    if return_violations:
+        return ConstraintViolations.from_residuals(families)
+
+    for equation, residual, idx_i, idx_j, idx_m, tol in families:
+        violated = np.flatnonzero(residual + tol < 0)
+        if len(violated) > 0:
+            k = violated[0]
+            raise AssertionError(
+                f"{equation} is violated {len(violated)} times, first at i={idx_i[k]}, "
+                f"j={idx_j[k]}, m={idx_m[k]} with difference={residual[k]}"
+            )
+
+    return None
+
+
+def _cp_constraint_families(
+    var_y,
+    var_s,
+    var_c,
+    para_p,
+    para_a,
+    para_w,
+    para_h,
+    para_delta,
+    para_mach_capacity,
+    para_lmin,
+    para_lmax,
+    num_t,
+    var_u=None,
+):
+    """Evaluate eqs. (3)-(7) and (22)-(25) of the CP formulation as arrays.
 
-    # eq. (16)
-    if var_z is not None:
-        # for i, m in it.product(range(n_opt), range(n_mach)):
-        #     expr_constraint = []
-        #     for j in range(n_opt):
-        #         if i != j:
-        #             expr_constraint.append(para_w[j, m] * var_z[i, j, m])
-        #     assert (
-        #         sum(expr_constraint)
-        #         <= (para_mach_capacity[m] - para_w[i, m]) * var_y[i, m]
-        #     ), f"sum(expr_constraint)={sum(expr_constraint)},
-        #     para_mach_capacity[m]={para_mach_capacity[m]}, para_w[i, m]={para_w[i, m]}, var_y[i,
-        #     m]={var_y[i, m]}, difference={sum(expr_constraint) - (para_mach_capacity[m] -
-        #     para_w[i, m]) * var_y[i, m]}"
-
-        for i, m in it.product(range(n_opt), range(n_mach)):
-            expr_constraint_left = [
-                para_w[j, m] * var_z[i, j, m] for j in range(n_opt) if i != j
-            ]
-            expr_constraint_right = (para_mach_capacity[m] - para_w[i, m]) * var_y[i, m]
-            assert (
-                sum(expr_constraint_left) <= expr_constraint_right
-            ), f"sum(expr_constraint_left)={sum(expr_constraint_left)}, expr_constraint_right={expr_constraint_right}, difference={sum(expr_constraint_left) - expr_constraint_right}, C_m = {para_mach_capacity[m]}, w_i = {para_w[i, m]}, y_i = {var_y[i, m]}"
+    The yielded tuples are the same as in _milp_constraint_families, all with a tolerance of 0.
+    """
+    var_y = np.asarray(var_y, dtype=float)
+    var_s = np.asarray(var_s, dtype=float)
+    var_c = np.asarray(var_c, dtype=float)
+    para_p = np.asarray(para_p, dtype=float)
+    para_a = np.asarray(para_a, dtype=float)
+    para_w = np.asarray(para_w, dtype=float)
+    para_h = np.asarray(para_h, dtype=float)
+    para_delta = np.asarray(para_delta, dtype=float)
+    para_mach_capacity = np.asarray(para_mach_capacity, dtype=float)
+    para_lmin = np.asarray(para_lmin, dtype=float)
+    para_lmax = np.asarray(para_lmax, dtype=float)
+    n_opt, n_mach = var_y.shape
+
+    idx_op = np.arange(n_opt)
+    no_idx = np.full(n_opt, -1)
+
+    # eq. (3)
+    yield "eq_3", var_c - var_s - np.sum(para_p * var_y, axis=1), idx_op, no_idx, no_idx, 0.0
+    # eq. (4)
+    residual = var_s + np.sum((para_p + para_h) * var_y, axis=1) - var_c
+    yield "eq_4", residual, idx_op, no_idx, no_idx, 0.0
+    # eq. (5)
+    yield "eq_5", -np.abs(np.sum(var_y, axis=1) - 1), idx_op, no_idx, no_idx, 0.0
+
+    # eqs. (6) and (7) for all i != j
+    idx_i, idx_j = np.nonzero(~np.eye(n_opt, dtype=bool))
+    no_idx = np.full(len(idx_i), -1)
+    residual = var_s[idx_j] - var_c[idx_i] - para_lmin[idx_i, idx_j]
+    yield "eq_6", residual, idx_i, idx_j, no_idx, 0.0
+    residual = var_c[idx_i] + para_lmax[idx_i, idx_j] - var_s[idx_j]
+    yield "eq_7", residual, idx_i, idx_j, no_idx, 0.0
+
+    # eqs. (22) and (23) for every pair i < j on the same machine
+    assigned = var_y > 0.5
+    idx_i, idx_j, idx_m = np.nonzero(
+        np.triu(np.ones((n_opt, n_opt), dtype=bool), k=1)[:, :, None]
+        & assigned[:, None, :]
+        & assigned[None, :, :]
+    )
+    s_i, s_j = var_s[idx_i], var_s[idx_j]
+    c_i, c_j = var_c[idx_i], var_c[idx_j]
+    # eq. (22), one of the two orders must hold
+    residual = np.maximum(
+        s_j - c_i - para_a[idx_m, idx_i, idx_j], s_i - c_j - para_a[idx_m, idx_j, idx_i]
+    )
+    yield "eq_22", residual, idx_i, idx_j, idx_m, 0.0
+    # eq. (23)
+    d_i, d_j = c_i - s_i, c_j - s_j
+    residual = np.maximum(
+        s_j - s_i - np.maximum(0, d_i - d_j) - para_delta[idx_m],
+        s_i - s_j - np.maximum(0, d_j - d_i) - para_delta[idx_m],
+    )
+    yield "eq_23", residual, idx_i, idx_j, idx_m, 0.0
+
+    no_idx = np.full(n_mach, -1)
+    if var_u is not None:
+        var_u = np.asarray(var_u, dtype=float)
+        time_steps = np.arange(num_t)
+        active = (var_s[:, None] <= time_steps) & (time_steps <= var_c[:, None])
+        # eq. (24), j is the time step
+        expected = np.where(active[:, None, :], para_w[:, :, None], 0)
+        idx_i, idx_m, idx_t = np.indices(var_u.shape).reshape(3, -1)
+        yield "eq_24", -np.abs(var_u - expected).ravel(), idx_i, idx_t, idx_m, 0.0
+        # eq. (25)
+        load = np.einsum("im,imt->mt", var_y, var_u)
+        peak_load = np.max(load, axis=1, initial=0)
+    else:
+        # eq. (25) with var_u given by eq. (24), without building var_u
+        peak_load = get_peak_load(var_y, var_s, var_c, para_w, num_t=num_t)
+    yield "eq_25", para_mach_capacity - peak_load, no_idx, no_idx, np.arange(n_mach), 0.0
 
 
 def check_constraints_cp(
@@ -134,119 +376,149 @@ def check_constraints_cp(
     horizion: int | float,
     num_t: int = None,
     var_u: np.array = None,
+    return_violations: bool = False,
 ):
-    """Check the constraints of the CP problem."""
-    n_opt = len(operations)
-    n_mach = len(machines)
-
-    for i, m in it.product(range(n_opt), range(n_mach)):
-        # eq. (3)
-        assert var_c[i] >= var_s[i] + sum(
-            [para_p[i, m] * var_y[i, m] for m in range(n_mach)]
-        )
-        # eq. (4)
-        assert var_c[i] <= var_s[i] + sum(
-            [(para_p[i, m] + para_h[i, m]) * var_y[i, m] for m in range(n_mach)]
-        )
-        # eq. (5)
-        assert sum([var_y[i, m] for m in range(n_mach)]) == 1
-
-    for i, j in it.product(range(n_opt), range(n_opt)):
-        if i != j:
-            # eq. (6)
-            assert var_s[j] >= var_c[i] + para_lmin[i, j]
-            # eq. (7)
-            assert var_s[j] <= var_c[i] + para_lmax[i, j]
-
-    # check eq. (22)
-    for i, j, m in it.product(range(n_opt), range(n_opt), range(n_mach)):
-        if i != j:
-            if var_y[i, m] == 1 and var_y[j, m] == 1:
-                bool_left = var_s[j] >= var_c[i] + para_a[m, i, j]
-                bool_right = var_s[i] >= var_c[j] + para_a[m, j, i]
-                assert bool_left or bool_right
-
-    # check eq. (23)
-    for i, j, m in it.product(range(n_opt), range(n_opt), range(n_mach)):
-        if i != j:
-            if var_y[i, m] == 1 and var_y[j, m] == 1:
-                bool_left = (
-                    var_s[j]
-                    >= var_s[i]
-                    + max([0, var_c[i] - var_s[i] - var_c[j] + var_s[j]])
-                    + para_delta[m]
-                )
-                bool_right = (
-                    var_s[i]
-                    >= var_s[j]
-                    + max([0, var_c[j] - var_s[j] - var_c[i] + var_s[i]])
-                    + para_delta[m]
-                )
-                assert bool_left or bool_right
+    """Check the constraints of the CP problem.
+
+    An AssertionError is raised for the first equation that is violated. eq. (24) is only
+    checked when var_u is given, otherwise the capacity of eq. (25) is checked with a sweep line
+    over the start and end events of every machine.
+
+    With return_violations=True, all constraints are checked and a ConstraintViolations report
+    of every violated constraint is returned instead.
+    """
+    assert np.shape(var_y) == (len(operations), len(machines))
 
     if num_t is None:
         num_t = int(horizion / 1.0e0)
 
-    if var_u is None and num_t is not None:
-        print("inferring var_u with eq. (24)")
-        num_t_list = range(num_t)
-        var_u = np.zeros((n_opt, n_mach, num_t))
-        for i, m, t in it.product(range(n_opt), range(n_mach), num_t_list):
-            # use eq. (24) to assign value to var_u
-            if var_s[i] <= t and t <= var_c[i]:
-                var_u[i, m, t] = para_w[i, m]
-            # else:
-            #     var_u[i, m, t] = 0
-
-    if num_t is not None and var_u is not None:
-        print("checking eq. (24)")
-        num_t_list = range(num_t)
-        for i, m in it.product(range(n_opt), range(n_mach)):
-            for t in num_t_list:
-                # check eq. (24)
-                if var_s[i] <= t and t <= var_c[i]:
-                    assert var_u[i, m, t] == para_w[i, m]
-                else:
-                    assert var_u[i, m, t] == 0
-
-    # eq. (25)
-    for m in range(n_mach):
-        yu_list = []
-        for t in range(num_t):
-            for i in range(n_opt):
-                yu_list.append(var_y[i, m] * var_u[i, m, t])
-        yu_max = max(yu_list)
-        assert yu_max <= para_mach_capacity[m]
-
-
-def infer_var_x(var_s: np.ndarray):
+    families = _cp_constraint_families(
+        var_y=var_y,
+        var_s=var_s,
+        var_c=var_c,
+        para_p=para_p,
+        para_a=para_a,
+        para_w=para_w,
+        para_h=para_h,
+        para_delta=para_delta,
+        para_mach_capacity=para_mach_capacity,
+        para_lmin=para_lmin,
+        para_lmax=para_lmax,
+        num_t=num_t,
+        var_u=var_u,
+    )
+
+    return _check_families(families, return_violations)
+
+
+def get_peak_load(
+    var_y: np.ndarray,
+    var_s: np.ndarray,
+    var_c: np.ndarray,
+    para_w: np.ndarray,
+    num_t: int = None,
+):
+    """Get the peak load of every machine with a sweep line over start and end events.
+
+    Operation i occupies machine m with weight w_im at every integer time step t with
+    s_i <= t <= c_i, which is the var_u of eq. (24). The cost only depends on the number of
+    operations and not on the length of the horizon.
+
+    Parameters
+    ----------
+    var_y : np.ndarray
+        Variable y where y[i, m] = 1 if operation i is assigned to machine m.
+    var_s : np.ndarray
+        Start time of each operation. Shape is (n_opt,).
+    var_c : np.ndarray
+        Completion time of each operation. Shape is (n_opt,).
+    para_w : np.ndarray
+        Weight of operation i in machine m. Shape is (n_opt, n_mach).
+    num_t : int, optional
+        Number of time steps. Time steps outside [0, num_t) are ignored when given.
+
+    Returns
+    -------
+    peak_load : np.ndarray
+        The largest sum of weights at a single time step for every machine. Shape is (n_mach,).
+
+    """
+    var_y = np.asarray(var_y, dtype=float)
+    var_s = np.asarray(var_s, dtype=float)
+    var_c = np.asarray(var_c, dtype=float)
+    para_w = np.asarray(para_w, dtype=float)
+    n_mach = var_y.shape[1]
+
+    idx_i, idx_m = np.nonzero(var_y > 0.5)
+    first = np.ceil(var_s[idx_i])
+    last = np.floor(var_c[idx_i])
+    if num_t is not None:
+        first = np.maximum(first, 0)
+        last = np.minimum(last, num_t - 1)
+    keep = first <= last
+    idx_i, idx_m, first, last = idx_i[keep], idx_m[keep], first[keep], last[keep]
+    weight = para_w[idx_i, idx_m]
+
+    # the operation is released at last + 1, so a release and a start at the same time step do
+    # not overlap and releases are sorted first
+    events_m = np.concatenate([idx_m, idx_m])
+    events_t = np.concatenate([first, last + 1])
+    events_w = np.concatenate([weight, -weight])
+    order = np.lexsort((events_w, events_t, events_m))
+    # the events of every machine sum up to zero, so one cumulative sum covers all machines
+    load = np.cumsum(events_w[order])
+
+    peak_load = np.zeros(n_mach)
+    np.maximum.at(peak_load, events_m[order], load)
+
+    return peak_load
+
+
+def _co_assigned(var_y: np.ndarray):
+    """Get the (i, j, m) with i != j of all pairs of operations assigned to the same machine."""
+    assigned = np.asarray(var_y) > 0.5
+    pairs = assigned[:, None, :] & assigned[None, :, :]
+    pairs &= ~np.eye(assigned.shape[0], dtype=bool)[:, :, None]
+
+    return pairs
+
+
+def infer_var_x(var_s: np.ndarray, var_y: np.ndarray = None, sparse: bool = False):
     """Infer variable x based on results from CP.
 
     Parameters
     ----------
     var_s : np.ndarray
         Start time of each operation.
+    var_y : np.ndarray, optional
+        Variable y where y[i, m] = 1 if operation i is assigned to machine m. Only needed when
+        sparse is True.
+    sparse : bool, optional
+        If True, only the pairs of operations assigned to the same machine are returned.
 
     Returns
     -------
-    var_x : np.ndarray
-        Variable x where x[i, j] = 1 if operation i is before operation j.
+    var_x : np.ndarray | tuple[tuple[np.ndarray, np.ndarray], np.ndarray]
+        Variable x where x[i, j] = 1 if operation i is before operation j. If sparse is True, a
+        tuple (index, values) where index is the (i, j) index arrays of the co-assigned pairs,
+        so that ``var_x[index] = values`` fills the dense array.
 
     """
-    n_opt = var_s.shape[0]
-    var_x = np.zeros((n_opt, n_opt))
+    var_s = np.asarray(var_s)
+    var_x = (var_s[:, None] < var_s[None, :]).astype(float)
 
-    for i, j in it.product(range(n_opt), range(n_opt)):
-        if i != j:
-            if var_s[i] < var_s[j]:
-                var_x[i, j] = 1
-            else:
-                var_x[i, j] = 0
+    if sparse:
+        if var_y is None:
+            raise ValueError("var_y is required for a sparse var_x.")
+        index = np.nonzero(np.any(_co_assigned(var_y), axis=2))
+        return index, var_x[index]
 
     return var_x
 
 
-def infer_var_z(var_s: np.ndarray, var_y: np.ndarray, var_c: np.ndarray):
+def infer_var_z(
+    var_s: np.ndarray, var_y: np.ndarray, var_c: np.ndarray, sparse: bool = False
+):
     """Infer variable z based on results from CP.
 
     Parameters
@@ -257,24 +529,25 @@ def infer_var_z(var_s: np.ndarray, var_y: np.ndarray, var_c: np.ndarray):
         Variable y where y[i, m] = 1 if operation i is assigned to machine m.
     var_c : np.ndarray
         Completion time of each operation. Shape is (n_opt,).
+    sparse : bool, optional
+        If True, only the (i, j, m) of operations assigned to the same machine are returned.
 
     Returns
     -------
-    var_z : np.ndarray
+    var_z : np.ndarray | tuple[tuple[np.ndarray, np.ndarray, np.ndarray], np.ndarray]
         Variable z where z[i, j, m] = 1 if operation i is before and overlapped operation j on machine m.
+        If sparse is True, a tuple (index, values) where index is the (i, j, m) index arrays of
+        the co-assigned pairs, so that ``var_z[index] = values`` fills the dense array.
 
     """
-    n_opt = var_y.shape[0]
-    n_mach = var_y.shape[1]
-
-    var_z = np.zeros((n_opt, n_opt, n_mach))
+    var_s = np.asarray(var_s)
+    var_c = np.asarray(var_c)
+    # j starts after i and before i is completed, see eqs. (14) and (15)
+    overlap = (var_s[:, None] < var_s[None, :]) & (var_s[None, :] < var_c[:, None])
+    pairs = _co_assigned(var_y)
 
-    for i, j, m in it.product(range(n_opt), range(n_opt), range(n_mach)):
-        if i != j:
-            if var_y[i, m] == 1 and var_y[j, m] == 1:
-                if var_s[j] < var_c[i]:
-                    var_z[i, j, m] = 1
-                else:
-                    var_z[i, j, m] = 0
+    if sparse:
+        index = np.nonzero(pairs)
+        return index, overlap[index[0], index[1]].astype(float)
 
-    return var_z
+    return (pairs & overlap[:, :, None]).astype(float)
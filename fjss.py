@@ -3,7 +3,10 @@ from __future__ import annotations
 import collections
 import math
 import os
+import queue
 import random
+import threading
+import time
 import itertools as it
 from abc import ABC
 from collections import defaultdict
@@ -11,16 +14,31 @@ from itertools import product, combinations
 
 import gurobipy as gp
 import numpy as np
+import scipy.sparse as sp
 from docplex.mp.model import Model
 from gurobipy import GRB
 from monty.json import MSONable
 from pydantic import BaseModel
 from ortools.sat.python import cp_model
 from ortools.linear_solver import pywraplp
-from utils import get_m_value_old, get_m_value_runzhong
+from checking_constraints import infer_var_x, infer_var_z
+from heuristics import list_scheduling
+from utils import (
+    PhaseTimer,
+    get_lag_closure,
+    get_lag_graph,
+    get_m_value_old,
+    get_m_value_runzhong,
+    get_time_windows,
+)
 
 # from reaction_network.schema.lv2 import BenchTopLv2, OperationType
 
+# names of the gurobi status codes, e.g. GUROBI_STATUS_NAMES[GRB.TIME_LIMIT] = "TIME_LIMIT"
+GUROBI_STATUS_NAMES = {
+    getattr(GRB.Status, name): name for name in dir(GRB.Status) if name.isupper()
+}
+
 # os.environ["GRB_LICENSE_FILE"] = "/home/qai/local/gurobi_lic/gurobi.lic"
 
 
@@ -51,6 +69,11 @@ class SolvedOperation(BaseModel):
 class FjsOutput(BaseModel):
     solved_operations: list[SolvedOperation]
     makespan: float
+    # solver status, e.g. OPTIMAL, or FEASIBLE/TIME_LIMIT when a limit stopped the search
+    status: str | None = None
+    # best lower bound of the makespan and the relative gap to it
+    best_bound: float | None = None
+    mip_gap: float | None = None
 
     @property
     def machine_timetable(self):
@@ -59,6 +82,242 @@ class FjsOutput(BaseModel):
             timetable[op.assigned_to].append((op.start_time, op.end_time))
         return timetable
 
+    def to_arrays(self, operations, machines):
+        """Get the (var_y, var_s, var_c) arrays of the solution.
+
+        Parameters
+        ----------
+        operations : list[str] | dict[int, str]
+            The operation ids in the order of the model indices.
+        machines : list[str] | dict[int, str]
+            The machine ids in the order of the model indices.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray]
+            var_y with shape (n_opt, n_mach), var_s and var_c with shape (n_opt,).
+
+        """
+        if isinstance(operations, dict):
+            operations = list(operations.values())
+        if isinstance(machines, dict):
+            machines = list(machines.values())
+        operation_index = {str(oid): i for i, oid in enumerate(operations)}
+        machine_index = {str(mid): m for m, mid in enumerate(machines)}
+
+        var_y = np.zeros((len(operations), len(machines)))
+        var_s = np.zeros(len(operations))
+        var_c = np.zeros(len(operations))
+        for op in self.solved_operations:
+            i = operation_index[op.id]
+            var_y[i, machine_index[op.assigned_to]] = 1
+            var_s[i] = op.start_time
+            var_c[i] = op.end_time
+
+        return var_y, var_s, var_c
+
+
+class Incumbent(BaseModel):
+    """An improving schedule reported by the solver while it is still running."""
+
+    elapsed_seconds: float
+    objective: float
+    best_bound: float
+    # the machine index, starting time and completion time of every operation
+    machines: list[int]
+    start_times: list[float]
+    end_times: list[float]
+
+    @classmethod
+    def from_arrays(cls, elapsed_seconds, objective, best_bound, var_y, var_s, var_c):
+        """Build an incumbent from the values of var_y, var_s and var_c."""
+        return cls(
+            elapsed_seconds=elapsed_seconds,
+            objective=objective,
+            best_bound=best_bound,
+            machines=np.argmax(np.asarray(var_y, dtype=float), axis=1).tolist(),
+            start_times=np.asarray(var_s, dtype=float).tolist(),
+            end_times=np.asarray(var_c, dtype=float).tolist(),
+        )
+
+
+class ProgressTrace:
+    """Buffer of the search progress of a solver, one row per improved incumbent or bound.
+
+    The rows are kept in a preallocated float array that doubles when it is full, so the
+    callbacks of the solvers only write into it. save writes every column as an array of an
+    npz file.
+
+    Parameters
+    ----------
+    capacity : int
+        The initial number of rows, by default 256.
+
+    Notes
+    -----
+    The columns are elapsed_seconds since start, objective (the incumbent makespan),
+    best_bound, mip_gap, nodes (explored nodes of gurobi) and conflicts (of CP-SAT). Values
+    that are unknown are NaN.
+
+    """
+
+    COLUMNS = ("elapsed_seconds", "objective", "best_bound", "mip_gap", "nodes", "conflicts")
+
+    def __init__(self, capacity=256):
+        self.data = np.full((capacity, len(self.COLUMNS)), np.nan)
+        self.size = 0
+        self.start_time = time.perf_counter()
+        # the callbacks of CP-SAT run in the threads of its workers
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Measure elapsed_seconds from now, called when the solver starts."""
+        self.start_time = time.perf_counter()
+
+    def append(
+        self, objective=np.nan, best_bound=np.nan, nodes=np.nan, conflicts=np.nan, force=False
+    ):
+        """Add a row if the objective or the best bound differs from the last row or if force.
+
+        An unknown objective or best_bound (NaN or infinite) is taken from the last row.
+        """
+        elapsed_seconds = time.perf_counter() - self.start_time
+        # gurobi reports a missing incumbent or bound as +/-GRB.INFINITY
+        objective = objective if abs(objective) < GRB.INFINITY else np.nan
+        best_bound = best_bound if abs(best_bound) < GRB.INFINITY else np.nan
+        with self.lock:
+            if self.size > 0:
+                last = self.data[self.size - 1]
+                objective = last[1] if np.isnan(objective) else objective
+                best_bound = last[2] if np.isnan(best_bound) else best_bound
+                unchanged = np.array_equal(last[1:3], [objective, best_bound], equal_nan=True)
+                if unchanged and not force:
+                    return
+            if self.size == len(self.data):
+                self.data = np.vstack([self.data, np.full_like(self.data, np.nan)])
+            mip_gap = np.nan
+            if not np.isnan(objective) and not np.isnan(best_bound):
+                mip_gap = get_mip_gap(objective, best_bound)
+            self.data[self.size] = (
+                elapsed_seconds,
+                objective,
+                best_bound,
+                mip_gap,
+                nodes,
+                conflicts,
+            )
+            self.size += 1
+
+    def to_arrays(self):
+        """Get the rows as one array per column."""
+        with self.lock:
+            return {
+                name: self.data[: self.size, k].copy() for k, name in enumerate(self.COLUMNS)
+            }
+
+    def save(self, path, **metadata):
+        """Write the columns and metadata (e.g. method, n_opt) to a compressed npz file.
+
+        The file is written next to path and moved into place, so a process killed while
+        saving keeps the previous file.
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **self.to_arrays(), **metadata)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read the columns and the metadata of a file written by save as a dict of arrays."""
+        with np.load(path) as arrays:
+            return {name: arrays[name] for name in arrays.files}
+
+
+def iter_incumbents(solve, stop):
+    """Run solve in a thread and yield its incumbents as soon as they are found.
+
+    Parameters
+    ----------
+    solve : Callable
+        A solve method that takes callbacks, e.g. FJSS2.solve_ortools.
+    stop : Callable
+        Stops the running solver, used if the generator is closed before solve returns.
+
+    Yields
+    ------
+    Incumbent
+        Every improving schedule, in the order the solver finds them.
+
+    Returns
+    -------
+    FjsOutput | None
+        The return value of solve, as the value of the StopIteration.
+
+    """
+    incumbents = queue.Queue()
+    finished = object()
+    closed = threading.Event()
+    result = {}
+
+    def report(incumbent):
+        incumbents.put(incumbent)
+        # stop the search at the next incumbent if the generator is closed meanwhile
+        return closed.is_set()
+
+    def run():
+        try:
+            result["output"] = solve(callbacks=[report])
+        except Exception as error:  # pylint: disable=broad-except
+            result["error"] = error
+        finally:
+            incumbents.put(finished)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while (incumbent := incumbents.get()) is not finished:
+            yield incumbent
+    finally:
+        if thread.is_alive():
+            closed.set()
+            stop()
+        thread.join()
+
+    if "error" in result:
+        raise result["error"]
+    return result["output"]
+
+
+def get_warm_start_arrays(solution, var_y, var_s, var_c, operations, machines, heuristic):
+    """Get the (var_y, var_s, var_c) arrays of a warm start.
+
+    The arrays come from solution if it is given, else from var_y, var_s and var_c, else from
+    heuristic(), which returns (var_y, var_s, var_c, makespan) or None.
+    """
+    if solution is not None:
+        return solution.to_arrays(operations, machines)
+    if var_y is None and var_s is None and var_c is None:
+        heuristic_solution = heuristic()
+        if heuristic_solution is None:
+            raise ValueError("the list-scheduling heuristic found no schedule to warm start.")
+        var_y, var_s, var_c, _ = heuristic_solution
+    elif var_y is None or var_s is None or var_c is None:
+        raise ValueError("var_y, var_s and var_c have to be given together.")
+    return (
+        np.asarray(var_y, dtype=float),
+        np.asarray(var_s, dtype=float),
+        np.asarray(var_c, dtype=float),
+    )
+
+
+def get_mip_gap(objective, bound):
+    """Get the relative gap |objective - bound| / |objective| as gurobi defines MIPGap."""
+    if objective == bound:
+        return 0.0
+    if objective == 0:
+        return math.inf
+    return abs(objective - bound) / abs(objective)
+
 
 def get_dummy_time_est(operation_type: OperationType):
     # in seconds
@@ -434,6 +693,141 @@ class VarArraySolutionPrinterWithLimit(cp_model.CpSolverSolutionCallback):
         return self.__solution_count
 
 
+class IncumbentCallback(cp_model.CpSolverSolutionCallback):
+    """Report the improving solutions of CP-SAT and stop the search after solution_limit.
+
+    Every callback is called with an Incumbent built from variables, (var_y, var_s, var_c), and
+    can return True to stop the search. Every solution is added to the ProgressTrace progress.
+    """
+
+    def __init__(self, solution_limit=None, callbacks=None, variables=None, progress=None):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.solution_limit = solution_limit
+        self.callbacks = callbacks or []
+        self.variables = variables
+        self.progress = progress
+        self.solution_count = 0
+
+    def on_solution_callback(self):
+        self.solution_count += 1
+        if self.progress is not None:
+            self.progress.append(
+                objective=self.ObjectiveValue(),
+                best_bound=self.BestObjectiveBound(),
+                conflicts=self.NumConflicts(),
+            )
+        stop = self.solution_limit is not None and self.solution_count >= self.solution_limit
+        if self.callbacks:
+            var_y, var_s, var_c = (
+                [self.Value(var) for var in variables.flat] for variables in self.variables
+            )
+            incumbent = Incumbent.from_arrays(
+                self.WallTime(),
+                self.ObjectiveValue(),
+                self.BestObjectiveBound(),
+                np.reshape(var_y, self.variables[0].shape),
+                var_s,
+                var_c,
+            )
+            # every callback sees the incumbent, even if an earlier one asks to stop
+            stop = any([callback(incumbent) for callback in self.callbacks]) or stop
+        if stop:
+            self.StopSearch()
+
+
+class GurobiIncumbentCallback:
+    """Report the improving solutions of gurobi, the callback of Model.optimize.
+
+    Every callback is called with an Incumbent built from variables, (var_y, var_s, var_c), and
+    can return True to stop the search. presolve_end is the PhaseTimer.now() at the first
+    callback after the presolve, None if gurobi finished in the presolve. The incumbents and
+    the bounds of the branch and bound are added to the ProgressTrace progress.
+    """
+
+    # the callbacks that only happen once the presolved model is solved
+    AFTER_PRESOLVE = (
+        GRB.Callback.SIMPLEX,
+        GRB.Callback.MIP,
+        GRB.Callback.MIPNODE,
+        GRB.Callback.BARRIER,
+    )
+
+    def __init__(self, callbacks, variables, progress=None):
+        self.callbacks = callbacks
+        self.variables = variables
+        self.progress = progress
+        self.presolve_end = None
+
+    def __call__(self, model, where):
+        if self.presolve_end is None and where in self.AFTER_PRESOLVE:
+            self.presolve_end = PhaseTimer.now()
+        if self.progress is not None and where == GRB.Callback.MIP:
+            self.progress.append(
+                objective=model.cbGet(GRB.Callback.MIP_OBJBST),
+                best_bound=model.cbGet(GRB.Callback.MIP_OBJBND),
+                nodes=model.cbGet(GRB.Callback.MIP_NODCNT),
+            )
+        elif self.progress is not None and where == GRB.Callback.MIPSOL:
+            self.progress.append(
+                objective=model.cbGet(GRB.Callback.MIPSOL_OBJ),
+                best_bound=model.cbGet(GRB.Callback.MIPSOL_OBJBND),
+                nodes=model.cbGet(GRB.Callback.MIPSOL_NODCNT),
+            )
+        if where != GRB.Callback.MIPSOL or not self.callbacks:
+            return
+        incumbent = Incumbent.from_arrays(
+            model.cbGet(GRB.Callback.RUNTIME),
+            model.cbGet(GRB.Callback.MIPSOL_OBJ),
+            model.cbGet(GRB.Callback.MIPSOL_OBJBND),
+            *(model.cbGetSolution(variables) for variables in self.variables),
+        )
+        if any([callback(incumbent) for callback in self.callbacks]):
+            model.terminate()
+
+
+def set_cp_sat_limits(solver, time_limit, mip_gap):
+    """Set the time limit (seconds) and the relative gap limit of a CP-SAT solver."""
+    if time_limit is not None:
+        solver.parameters.max_time_in_seconds = time_limit
+    if mip_gap is not None:
+        solver.parameters.relative_gap_limit = mip_gap
+
+
+def watch_cp_sat_presolve(solver, verbose):
+    """Log the search of a CP-SAT solver to catch the end of its presolve.
+
+    The log is printed if verbose, as with log_search_progress.
+
+    Returns
+    -------
+    dict
+        Gets the key "presolve_end", the PhaseTimer.now() at the "Starting search" line of the
+        log, i.e. after the presolve and the loading of the presolved model.
+
+    """
+    marks = {}
+
+    def on_log(line):
+        if "presolve_end" not in marks and line.startswith("Starting search"):
+            marks["presolve_end"] = PhaseTimer.now()
+
+    solver.parameters.log_search_progress = True
+    solver.parameters.log_to_stdout = bool(verbose)
+    solver.log_callback = on_log
+    return marks
+
+
+def add_solve_phases(timer, start, presolve_end, end):
+    """Split the time of a solver call between start and end into presolve and solve.
+
+    Without presolve_end, the solver finished in the presolve.
+    """
+    if presolve_end is None:
+        presolve_end = end
+    timer.add("presolve", start, presolve_end)
+    timer.add("solve", presolve_end, end)
+
+
 class FJSS2(_FJS):
     """
     Implementation of the constraint programming formulation in:
@@ -457,6 +851,19 @@ class FJSS2(_FJS):
         inf_cp: int = 1.0e10,
         num_workers: int = 16,
         verbose: bool = True,
+        sparse_lags: bool = True,
+        capacity_model: str = "time_indexed",
+        unit_capacity_model: str = "reified",
+        heuristic_bounds: bool = False,
+        lag_closure: bool = False,
+        time_windows: bool = False,
+        para_window: np.ndarray | None = None,
+        horizon: int | None = None,
+        time_limit: float | None = None,
+        mip_gap: float | None = None,
+        solution_limit: int | None = None,
+        seed: int | None = None,
+        timer: PhaseTimer | None = None,
     ):
         """
         _summary_
@@ -499,6 +906,46 @@ class FJSS2(_FJS):
             _description_, by default 1.0e10
         verbose : bool, optional
             If print out the solution explicitly, by default True.
+        sparse_lags : bool, optional
+            Only add eqs. (6) and (7) for finite lags, by default True. Lags equal to +/-inf_cp
+            are trivially slack.
+        capacity_model : str, optional
+            How eqs. (24) and (25) are modelled, by default "time_indexed". "time_indexed" uses
+            var_u for every time step in the horizon; "cumulative" uses one optional interval
+            per (operation, eligible machine) and one AddCumulative per machine.
+        unit_capacity_model : str, optional
+            How eqs. (22) and (23) are modelled on machines that cannot host two operations at
+            once, by default "reified". "reified" uses the pairwise reified booleans of all other
+            machines; "no_overlap" uses optional intervals with AddNoOverlap.
+        heuristic_bounds : bool, optional
+            Use the makespan of a list-scheduling heuristic as the horizon, by default False.
+            The heuristic schedule is kept in heuristic_solution, which stays None if the
+            heuristic misses a deadline of para_window.
+        lag_closure : bool, optional
+            Add s_j >= c_i + longest_ij for the pairs whose order follows from the longest paths
+            of the minimum lag graph, by default False. The closure is kept in lag_longest and
+            lag_precedes.
+        time_windows : bool, optional
+            Propagate the time windows, the lags and the processing times to per-operation
+            bounds of var_s and var_c, by default False. The bounds are kept in time_bounds.
+        para_window : np.ndarray, optional
+            The time window (a_i, b_i) of operation i, i.e. it starts at or after a_i and
+            completes at or before b_i, by default None. Shape=(n_opt, 2).
+        horizon : int, optional
+            The upper bound of the time variables, by default None (get_horizon). A sweep
+            with add_operations passes the horizon of its largest instance.
+        time_limit : float, optional
+            Stop the search after time_limit seconds, by default None (no limit).
+        mip_gap : float, optional
+            Stop the search once the relative gap between the makespan and its bound is at
+            most mip_gap, by default None (solve to optimality).
+        solution_limit : int, optional
+            Stop the search after solution_limit improving solutions, by default None.
+        seed : int, optional
+            The random seed of CP-SAT, by default None (the solver default).
+        timer : PhaseTimer, optional
+            Records the wall-clock and CPU time of the normalize, bounds, presolve, solve and
+            extract phases, by default a new PhaseTimer.
 
         Returns
         -------
@@ -516,7 +963,20 @@ class FJSS2(_FJS):
         """
         self.inf_cp = inf_cp
         self.num_workers = num_workers
-
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+        self.solution_limit = solution_limit
+        self.seed = seed
+        self.sparse_lags = sparse_lags
+        if capacity_model not in ("time_indexed", "cumulative"):
+            raise ValueError("capacity_model must be either time_indexed or cumulative.")
+        self.capacity_model = capacity_model
+        if unit_capacity_model not in ("reified", "no_overlap"):
+            raise ValueError("unit_capacity_model must be either reified or no_overlap.")
+        self.unit_capacity_model = unit_capacity_model
+        self.timer = PhaseTimer() if timer is None else timer
+
+        start = PhaseTimer.now()
         para_p[para_p == np.inf] = inf_cp
         para_p[para_p == -np.inf] = -inf_cp
         self.para_p = para_p.astype(int)
@@ -549,8 +1009,41 @@ class FJSS2(_FJS):
         self.para_lmin = para_lmin.astype(int)
         self.para_lmax = para_lmax.astype(int)
         self.para_h = para_h.astype(int)
+        self.timer.add("normalize", start, PhaseTimer.now())
+
+        # the lag closure, the horizon and the time windows
+        start = PhaseTimer.now()
+        self.lag_closure = lag_closure
+        self.lag_longest = None
+        self.lag_precedes = None
+        if lag_closure:
+            self.lag_longest, self.lag_precedes = get_lag_closure(
+                para_lmin=self.para_lmin, para_p=self.para_p, infinity=self.inf_cp
+            )
 
-        self.horizon = self.get_horizon()
+        self.para_window = para_window
+        self.horizon = self.get_horizon() if horizon is None else int(horizon)
+        self.heuristic_solution = None
+        if heuristic_bounds:
+            self.heuristic_solution = self.get_heuristic_solution()
+        if self.heuristic_solution is not None:
+            # an optimal schedule does not complete after the heuristic makespan
+            self.horizon = int(np.ceil(self.heuristic_solution[3])) + 1
+
+        self.time_windows = time_windows
+        self.time_bounds = None
+        if time_windows:
+            time_bounds = get_time_windows(
+                para_p=self.para_p,
+                para_h=self.para_h,
+                para_lmin=self.para_lmin,
+                para_lmax=self.para_lmax,
+                horizon=self.horizon,
+                infinity=self.inf_cp,
+                para_window=para_window,
+            )
+            self.time_bounds = tuple(bound.astype(int) for bound in time_bounds)
+        self.timer.add("bounds", start, PhaseTimer.now())
 
         self._model = None
         self._solver = None
@@ -559,9 +1052,23 @@ class FJSS2(_FJS):
         self.var_y = None
         self.verbose = verbose
         self.var_c_max = inf_cp
+        # the objective variable of build_model_ortools, solve_ortools replaces var_c_max
+        # with its value
+        self.var_c_max_var = None
         self.var_u = None
         self.yu_list = None
         self.num_t = None
+        self.intervals = None
+        self.no_overlap_intervals = None
+        self.no_overlap_machines = None
+        # the AddNoOverlap and AddCumulative constraint of every machine, re-added over the
+        # grown intervals by add_operations
+        self.no_overlap_constraints = None
+        self.cumulative_constraints = None
+        # initial solution of set_warm_start, (var_y, var_s, var_c)
+        self.warm_start = None
+        # the incumbents and bounds over time of the last solve_ortools
+        self.progress = None
 
     def get_horizon(self):
         """Get the horizon."""
@@ -583,6 +1090,40 @@ class FJSS2(_FJS):
 
         return horizon
 
+    def get_heuristic_solution(self):
+        """Get a feasible (var_y, var_s, var_c, makespan) from list scheduling.
+
+        None if the heuristic finds no schedule, e.g. one that meets the deadlines of
+        para_window, then the bounds are not tightened by it.
+        """
+        try:
+            return list_scheduling(
+                para_p=self.para_p,
+                para_a=np.einsum("mij->ijm", self.para_a),
+                para_w=self.para_w,
+                para_delta=self.para_delta,
+                para_mach_capacity=self.para_mach_capacity,
+                para_lmin=self.para_lmin,
+                para_lmax=self.para_lmax,
+                infinity=self.inf_cp,
+                para_window=self.para_window,
+            )
+        except RuntimeError as error:
+            print(f"the list-scheduling heuristic found no schedule: {error}")
+            return None
+
+    def get_time_bounds(self):
+        """Get the lower and upper bounds (s_lb, s_ub, c_lb, c_ub) of var_s and var_c."""
+        if self.time_bounds is not None:
+            return self.time_bounds
+        n_opt = len(self.para_p)
+        return (
+            np.zeros(n_opt, dtype=int),
+            np.full(n_opt, self.horizon),
+            np.zeros(n_opt, dtype=int),
+            np.full(n_opt, self.horizon),
+        )
+
     def build_model_ortools(self):
         """Build the model."""
         n_opt, n_mach = self.get_params()
@@ -599,18 +1140,225 @@ class FJSS2(_FJS):
         for i, m in product(range(n_opt), range(n_mach)):
             var_y[i, m] = model.NewBoolVar(f"y_{i}_{m}")
 
+        s_lb, s_ub, c_lb, c_ub = self.get_time_bounds()
         # starting time of operation i
         var_s = np.empty((n_opt), dtype=object)
         for i in range(n_opt):
-            var_s[i] = model.NewIntVar(0, horizon, f"s_{i}")
+            var_s[i] = model.NewIntVar(int(s_lb[i]), int(s_ub[i]), f"s_{i}")
 
         # completion time of operation i
         var_c = np.empty((n_opt), dtype=object)
         for i in range(n_opt):
-            var_c[i] = model.NewIntVar(0, horizon, f"c_{i}")
+            var_c[i] = model.NewIntVar(int(c_lb[i]), int(c_ub[i]), f"c_{i}")
 
         # add constraints
-        for i in range(n_opt):
+        self.add_operation_constraints(
+            model=model, var_c_max=var_c_max, var_y=var_y, var_s=var_s, var_c=var_c
+        )
+        self.add_lag_constraints(model=model, var_s=var_s, var_c=var_c)
+
+        self.no_overlap_constraints = {}
+        self.cumulative_constraints = {}
+        if self.unit_capacity_model == "no_overlap":
+            no_overlap_machines = self.get_unit_capacity_machines()
+            no_overlap_intervals = self.add_no_overlap_constraints(
+                model=model,
+                var_y=var_y,
+                var_s=var_s,
+                var_c=var_c,
+                machines=no_overlap_machines,
+            )
+        else:
+            no_overlap_machines = []
+            no_overlap_intervals = None
+
+        self.add_disjunctive_constraints(
+            model=model,
+            var_y=var_y,
+            var_s=var_s,
+            var_c=var_c,
+            no_overlap_machines=no_overlap_machines,
+        )
+
+        if self.capacity_model == "time_indexed":
+            var_u, yu_list, num_t = self.add_time_indexed_capacity_constraints(
+                model=model, var_y=var_y, var_s=var_s, var_c=var_c
+            )
+            intervals = None
+        else:
+            intervals = self.add_cumulative_constraints(
+                model=model, var_y=var_y, var_s=var_s, var_c=var_c
+            )
+            var_u, yu_list, num_t = None, None, None
+
+        model.Minimize(var_c_max)
+        self._model = model
+        self.var_c_max = var_c_max
+        self.var_c_max_var = var_c_max
+        self.var_s = var_s
+        self.var_c = var_c
+        self.var_y = var_y
+        self.var_u = var_u
+        self.yu_list = yu_list
+        self.num_t = num_t
+        self.intervals = intervals
+        self.no_overlap_intervals = no_overlap_intervals
+        self.no_overlap_machines = no_overlap_machines
+
+        return model
+
+    def add_operations(
+        self,
+        operations: list[str],
+        para_p: np.ndarray,
+        para_a: np.ndarray,
+        para_w: np.ndarray,
+        para_h: np.ndarray,
+        para_lmin: np.ndarray,
+        para_lmax: np.ndarray,
+        para_window: np.ndarray | None = None,
+    ):
+        """Add a batch of operations to the model of build_model_ortools.
+
+        Only the variables of the added operations and the constraints that involve them are
+        created. The AddCumulative (and AddNoOverlap) of every machine is replaced by one over
+        the intervals of all the operations. A sweep over n_opt can so grow one model instead
+        of building one per step.
+
+        Parameters
+        ----------
+        operations : list[str]
+            The operations of the grown instance, starting with the current operations.
+        para_p, para_a, para_w, para_h, para_lmin, para_lmax : np.ndarray
+            The parameters of the grown instance in the layout of the constructor. The block
+            of the current operations has to be unchanged.
+        para_window : np.ndarray, optional
+            The time windows of the grown instance.
+
+        Raises
+        ------
+        ValueError
+            If the model was not built by build_model_ortools with capacity_model="cumulative",
+            if the bounds of the variables come from the whole instance (heuristic_bounds,
+            lag_closure, time_windows), if the current operations change, if the grown
+            instance needs a larger horizon or other unit-capacity machines.
+
+        Notes
+        -----
+        Pass the horizon of the largest instance to the constructor to grow the model up to
+        it. Use set_warm_start with the schedule of the current operations to hint the next
+        solve with it.
+
+        """
+        if self._model is None or self.cumulative_constraints is None:
+            raise ValueError("add_operations requires a model built by build_model_ortools.")
+        if self.capacity_model != "cumulative":
+            raise ValueError("add_operations requires capacity_model='cumulative'.")
+        if self.heuristic_solution is not None or self.lag_closure or self.time_windows:
+            raise ValueError(
+                "add_operations does not support heuristic_bounds, lag_closure and "
+                "time_windows."
+            )
+
+        first_new, n_mach = self.get_params()
+        n_opt = len(operations)
+        if list(operations[:first_new]) != list(self.operations):
+            raise ValueError("operations must start with the current operations.")
+
+        # the block of the current operations in every parameter
+        current = (slice(first_new),)
+        para = {
+            "para_p": (para_p, current),
+            "para_a": (para_a, (slice(None), slice(first_new), slice(first_new))),
+            "para_w": (para_w, current),
+            "para_h": (para_h, current),
+            "para_lmin": (para_lmin, current * 2),
+            "para_lmax": (para_lmax, current * 2),
+        }
+        for name, (value, block) in para.items():
+            value = np.array(value, dtype=float)
+            value[value == np.inf] = self.inf_cp
+            value[value == -np.inf] = -self.inf_cp
+            value = value.astype(int)
+            if not np.array_equal(value[block], getattr(self, name)):
+                raise ValueError(f"{name} of the current operations has changed.")
+            para[name] = value
+
+        current = {name: getattr(self, name) for name in ("operations", "para_window", *para)}
+        self.operations = operations
+        for name, value in para.items():
+            setattr(self, name, value)
+        self.para_window = para_window
+        error = None
+        if self.get_horizon() > self.horizon:
+            error = (
+                f"horizon={self.horizon} is smaller than the {self.get_horizon()} of the grown "
+                "instance, pass the horizon of the largest instance to the constructor."
+            )
+        elif (
+            self.unit_capacity_model == "no_overlap"
+            and self.get_unit_capacity_machines() != self.no_overlap_machines
+        ):
+            error = "the unit-capacity machines of the grown instance have changed."
+        if error is not None:
+            # keep the current instance, it still matches the model
+            for name, value in current.items():
+                setattr(self, name, value)
+            raise ValueError(error)
+
+        # create the variables of the added operations
+        model = self._model
+        var_y = np.empty((n_opt, n_mach), dtype=object)
+        var_y[:first_new] = self.var_y
+        for i, m in product(range(first_new, n_opt), range(n_mach)):
+            var_y[i, m] = model.NewBoolVar(f"y_{i}_{m}")
+        s_lb, s_ub, c_lb, c_ub = self.get_time_bounds()
+        var_s = np.empty((n_opt), dtype=object)
+        var_s[:first_new] = self.var_s
+        var_c = np.empty((n_opt), dtype=object)
+        var_c[:first_new] = self.var_c
+        for i in range(first_new, n_opt):
+            var_s[i] = model.NewIntVar(int(s_lb[i]), int(s_ub[i]), f"s_{i}")
+            var_c[i] = model.NewIntVar(int(c_lb[i]), int(c_ub[i]), f"c_{i}")
+
+        self.add_operation_constraints(
+            model=model,
+            var_c_max=self.var_c_max_var,
+            var_y=var_y,
+            var_s=var_s,
+            var_c=var_c,
+            first_new=first_new,
+        )
+        self.add_lag_constraints(model=model, var_s=var_s, var_c=var_c, first_new=first_new)
+        if self.unit_capacity_model == "no_overlap":
+            self.no_overlap_intervals = self.add_no_overlap_constraints(
+                model=model,
+                var_y=var_y,
+                var_s=var_s,
+                var_c=var_c,
+                machines=self.no_overlap_machines,
+                first_new=first_new,
+            )
+        self.add_disjunctive_constraints(
+            model=model,
+            var_y=var_y,
+            var_s=var_s,
+            var_c=var_c,
+            no_overlap_machines=self.no_overlap_machines,
+            first_new=first_new,
+        )
+        self.intervals = self.add_cumulative_constraints(
+            model=model, var_y=var_y, var_s=var_s, var_c=var_c, first_new=first_new
+        )
+
+        self.var_y = var_y
+        self.var_s = var_s
+        self.var_c = var_c
+
+    def add_operation_constraints(self, model, var_c_max, var_y, var_s, var_c, first_new=0):
+        """Add eqs. (2)-(5) for the operations from first_new on."""
+        n_opt, n_mach = self.get_params()
+        for i in range(first_new, n_opt):
             # eq. (2)
             model.Add(var_c_max >= var_c[i])
 
@@ -626,22 +1374,42 @@ class FJSS2(_FJS):
             model.Add(var_c[i] <= var_s[i] + sum(expr))
 
         # eq. (5)
-        for i in range(n_opt):
+        for i in range(first_new, n_opt):
             # sum of y_im = 1
             model.Add(sum([var_y[i, m] for m in range(n_mach)]) == 1)
 
-        for i, j in product(range(n_opt), range(n_opt)):
-            if i != j:
-                # eq. (6)
-                # minimum lag between the starting time of operation i and the ending time of operation j
+    def add_lag_constraints(self, model, var_s, var_c, first_new=0):
+        """Add eqs. (6) and (7) for the lags of the operations from first_new on."""
+        lmin_pairs, lmax_pairs = self.get_lag_pairs()
+        # eq. (6)
+        # minimum lag between the starting time of operation i and the ending time of operation j
+        for i, j in lmin_pairs:
+            if max(i, j) >= first_new:
                 model.Add(var_s[j] >= var_c[i] + self.para_lmin[i, j])
-                # eq. (7)
-                # maximum lag between the starting time of operation i and the ending time of operation j
+        # eq. (7)
+        # maximum lag between the starting time of operation i and the ending time of operation j
+        for i, j in lmax_pairs:
+            if max(i, j) >= first_new:
                 model.Add(var_s[j] <= var_c[i] + self.para_lmax[i, j])
+        if self.lag_closure:
+            # precedences implied by the longest paths of the minimum lag graph
+            for i, j in np.argwhere(self.lag_precedes):
+                if max(i, j) >= first_new:
+                    model.Add(var_s[j] >= var_c[i] + int(self.lag_longest[i, j]))
+
+    def add_disjunctive_constraints(
+        self, model, var_y, var_s, var_c, no_overlap_machines, first_new=0
+    ):
+        """Add eqs. (22) and (23) as reified constraints for the pairs (i, j), i != j.
+
+        Machines in no_overlap_machines are covered by add_no_overlap_constraints. With
+        first_new > 0 only the pairs of an operation from first_new on are added.
+        """
+        n_opt, n_mach = self.get_params()
 
         # https://developers.google.com/optimization/cp/channeling
         for i, j, m in product(np.arange(n_opt), np.arange(n_opt), np.arange(n_mach)):
-            if i != j:
+            if i != j and max(i, j) >= first_new and m not in no_overlap_machines:
                 # https://github.com/d-krupke/cpsat-primer
 
                 # eq. (22)
@@ -678,14 +1446,14 @@ class FJSS2(_FJS):
                 # right part of the implication
                 bool_b3 = model.NewBoolVar(f"bool_b3_{i}_{j}_{m}")
                 max_eq23_first = model.NewIntVar(
-                    0, horizon, f"max_eq23_{i}_{j}_{m}_first"
+                    0, self.horizon, f"max_eq23_{i}_{j}_{m}_first"
                 )
                 model.AddMaxEquality(
                     max_eq23_first, [0, var_c[i] - var_s[i] - var_c[j] + var_s[j]]
                 )
 
                 max_eq23_second = model.NewIntVar(
-                    0, horizon, f"max_eq23_{i}_{j}_{m}_second"
+                    0, self.horizon, f"max_eq23_{i}_{j}_{m}_second"
                 )
                 model.AddMaxEquality(
                     max_eq23_second, [0, var_c[j] - var_s[j] - var_c[i] + var_s[i]]
@@ -716,6 +1484,139 @@ class FJSS2(_FJS):
                 # the implication
                 model.AddImplication(bool_b1, bool_b3)
 
+    def set_warm_start(self, solution=None, var_y=None, var_s=None, var_c=None):
+        """Set the hints of the next solve_ortools.
+
+        Parameters
+        ----------
+        solution : FjsOutput, optional
+            The output of an earlier run, e.g. of FJSS4_v2 or of a smaller time limit.
+        var_y : np.ndarray, optional
+            Assignment of operation i to machine m with shape (n_start, n_mach), used with
+            var_s and var_c if solution is None.
+        var_s : np.ndarray, optional
+            Starting time of operation i with shape (n_start,).
+        var_c : np.ndarray, optional
+            Completion time of operation i with shape (n_start,).
+
+        Notes
+        -----
+        Without any argument the list-scheduling schedule is used. With n_start < n_opt only
+        the first n_start operations are hinted, e.g. the schedule before add_operations.
+
+        """
+        self.warm_start = get_warm_start_arrays(
+            solution=solution,
+            var_y=var_y,
+            var_s=var_s,
+            var_c=var_c,
+            operations=self.operations,
+            machines=self.machines,
+            heuristic=lambda: self.heuristic_solution or self.get_heuristic_solution(),
+        )
+
+    def apply_warm_start_ortools(self):
+        """Replace the hints of the CP-SAT model with the warm start."""
+        self._model.ClearHints()
+        for variables, values in zip((self.var_y, self.var_s, self.var_c), self.warm_start):
+            # a warm start of the first operations only hints those
+            for var, value in zip(variables[: len(values)].flat, values.flat):
+                self._model.AddHint(var, round(value))
+
+    def get_unit_capacity_machines(self):
+        """Get the machines on which no two operations can be processed at the same time.
+
+        That is the case when the two smallest weights of the operations machine m can process
+        already exceed para_mach_capacity[m], e.g. a capacity of 1 with unit weights.
+        """
+        _, n_mach = self.get_params()
+
+        machines = []
+        for m in range(n_mach):
+            eligible = self.para_p[:, m] < self.inf_cp
+            weights = np.sort(self.para_w[eligible, m])
+            if len(weights) < 2 or weights[0] + weights[1] > self.para_mach_capacity[m]:
+                machines.append(m)
+        return machines
+
+    def add_no_overlap_constraints(self, model, var_y, var_s, var_c, machines, first_new=0):
+        """Add eqs. (22) and (23) for unit-capacity machines with AddNoOverlap.
+
+        Each operation gets one optional interval per machine that can process it, present if
+        and only if var_y[i, m] is true. The interval covers [s_i, c_i + pad) with
+        pad = max(para_delta[m], 1), so consecutive operations on machine m satisfy both eq. (23)
+        and the closed-interval capacity of eq. (24). This is exact when para_delta[m] <= 1; with
+        a larger delta it can be stricter than eq. (23) for very short operations.
+
+        Eq. (22) only binds for pairs where both setup times are finite, since the other side of
+        the disjunction holds trivially otherwise. Those pairs get a single order literal.
+
+        With first_new > 0 the intervals of the current operations are kept, the AddNoOverlap
+        of every machine is replaced by one over all the intervals and only the pairs of an
+        operation from first_new on get eq. (22).
+
+        Returns
+        -------
+        np.ndarray
+            The optional intervals with shape (n_opt, n_mach), None where machine m is not
+            in machines or cannot process operation i.
+
+        """
+        n_opt, n_mach = self.get_params()
+
+        intervals = np.full((n_opt, n_mach), None, dtype=object)
+        if first_new > 0:
+            intervals[:first_new] = self.no_overlap_intervals
+        for m in machines:
+            pad = max(int(self.para_delta[m]), 1)
+            eligible = [i for i in range(n_opt) if self.para_p[i, m] < self.inf_cp]
+            for i in eligible:
+                if i < first_new:
+                    continue
+                var_d = model.NewIntVar(
+                    self.para_p[i, m],
+                    self.para_p[i, m] + self.para_h[i, m],
+                    f"d_no_overlap_{i}_{m}",
+                )
+                intervals[i, m] = model.NewOptionalIntervalVar(
+                    var_s[i],
+                    var_d + pad,
+                    var_c[i] + pad,
+                    var_y[i, m],
+                    f"interval_no_overlap_{i}_{m}",
+                )
+            if m in self.no_overlap_constraints:
+                # the constraint over the intervals of the current operations stays empty
+                index = self.no_overlap_constraints[m].Index()
+                model.Proto().constraints[index].clear_no_overlap()
+            self.no_overlap_constraints[m] = model.AddNoOverlap(
+                [intervals[i, m] for i in eligible]
+            )
+
+            # eq. (22)
+            for i, j in combinations(eligible, 2):
+                if j < first_new:
+                    continue
+                if (
+                    self.para_a[m, i, j] <= -self.inf_cp
+                    or self.para_a[m, j, i] <= -self.inf_cp
+                ):
+                    continue
+                bool_order = model.NewBoolVar(f"bool_order_{i}_{j}_{m}")
+                model.Add(var_s[j] >= var_c[i] + self.para_a[m, i, j]).OnlyEnforceIf(
+                    [bool_order, var_y[i, m], var_y[j, m]]
+                )
+                model.Add(var_s[i] >= var_c[j] + self.para_a[m, j, i]).OnlyEnforceIf(
+                    [bool_order.Not(), var_y[i, m], var_y[j, m]]
+                )
+
+        return intervals
+
+    def add_time_indexed_capacity_constraints(self, model, var_y, var_s, var_c):
+        """Add eqs. (24) and (25) with one var_u per (operation, machine, time step)."""
+        n_opt, n_mach = self.get_params()
+        horizon = self.horizon
+
         sum_time = horizon
         num_t = int(sum_time / 1.0e0)
         var_u = np.empty((n_opt, n_mach, num_t), dtype=object)
@@ -767,17 +1668,58 @@ class FJSS2(_FJS):
                         bool_x9_and.Not()
                     )
 
-        model.Minimize(var_c_max)
-        self._model = model
-        self.var_c_max = var_c_max
-        self.var_s = var_s
-        self.var_c = var_c
-        self.var_y = var_y
-        self.var_u = var_u
-        self.yu_list = yu_list
-        self.num_t = num_t
+        return var_u, yu_list, num_t
 
-        return model
+    def add_cumulative_constraints(self, model, var_y, var_s, var_c, first_new=0):
+        """Add the machine capacity of eqs. (24) and (25) as one cumulative per machine.
+
+        Each operation gets one optional interval per machine that can process it, present if
+        and only if var_y[i, m] is true. Eq. (24) counts operation i at every t with
+        s_i <= t <= c_i, so the interval covers [s_i, c_i + 1). The model size does not depend
+        on the horizon. With first_new > 0 the intervals of the current operations are kept
+        and the AddCumulative of every machine is replaced by one over all the intervals.
+
+        Returns
+        -------
+        np.ndarray
+            The optional intervals with shape (n_opt, n_mach), None where machine m cannot
+            process operation i.
+
+        """
+        n_opt, n_mach = self.get_params()
+
+        intervals = np.full((n_opt, n_mach), None, dtype=object)
+        if first_new > 0:
+            intervals[:first_new] = self.intervals
+        for i, m in product(range(first_new, n_opt), range(n_mach)):
+            if self.para_p[i, m] >= self.inf_cp:
+                # machine m cannot process operation i
+                model.Add(var_y[i, m] == 0)
+                continue
+            # processing plus holding time of operation i on machine m, eqs. (3) and (4)
+            var_d = model.NewIntVar(
+                self.para_p[i, m], self.para_p[i, m] + self.para_h[i, m], f"d_{i}_{m}"
+            )
+            intervals[i, m] = model.NewOptionalIntervalVar(
+                var_s[i], var_d + 1, var_c[i] + 1, var_y[i, m], f"interval_{i}_{m}"
+            )
+
+        # eq. (25)
+        for m in range(n_mach):
+            eligible = [i for i in range(n_opt) if intervals[i, m] is not None]
+            if not eligible:
+                continue
+            if m in self.cumulative_constraints:
+                # the constraint over the intervals of the current operations stays empty
+                index = self.cumulative_constraints[m].Index()
+                model.Proto().constraints[index].clear_cumulative()
+            self.cumulative_constraints[m] = model.AddCumulative(
+                [intervals[i, m] for i in eligible],
+                [int(self.para_w[i, m]) for i in eligible],
+                int(self.para_mach_capacity[m]),
+            )
+
+        return intervals
 
     @property
     def model(self) -> Model | gp.Model | None:
@@ -790,7 +1732,23 @@ class FJSS2(_FJS):
 
         return n_opt, n_mach
 
-    def solve_ortools(self):
+    def get_lag_pairs(self):
+        """Get the (i, j) pairs for eqs. (6) and (7)."""
+        if self.sparse_lags:
+            return get_lag_graph(self.para_lmin, self.para_lmax, self.inf_cp)
+        n_opt, _ = self.get_params()
+        pairs = np.argwhere(~np.eye(n_opt, dtype=bool))
+        return pairs, pairs
+
+    def solve_ortools(self, callbacks=None):
+        """Solve the model with CP-SAT.
+
+        Parameters
+        ----------
+        callbacks : list[Callable[[Incumbent], bool | None]], optional
+            Called with every improving schedule, a callback returning True stops the search.
+
+        """
         # creates the solver and solve.
 
         if self._model is None:
@@ -801,10 +1759,36 @@ class FJSS2(_FJS):
         self._solver = solver
 
         solver.parameters.num_search_workers = self.num_workers
-        solver.parameters.log_search_progress = self.verbose
-
-        # TODO: add call back function to pint out the solution
-        status = solver.Solve(self._model)
+        presolve = watch_cp_sat_presolve(solver, self.verbose)
+        set_cp_sat_limits(solver, time_limit=self.time_limit, mip_gap=self.mip_gap)
+        if self.seed is not None:
+            solver.parameters.random_seed = self.seed
+
+        if self.warm_start is not None:
+            self.apply_warm_start_ortools()
+
+        progress = ProgressTrace()
+        self.progress = progress
+        solver.best_bound_callback = lambda bound: progress.append(best_bound=bound)
+        callback = IncumbentCallback(
+            solution_limit=self.solution_limit,
+            callbacks=callbacks,
+            variables=(self.var_y, self.var_s, self.var_c),
+            progress=progress,
+        )
+        start = PhaseTimer.now()
+        progress.start()
+        status = solver.Solve(self._model, callback)
+        add_solve_phases(self.timer, start, presolve.get("presolve_end"), PhaseTimer.now())
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            progress.append(
+                objective=solver.ObjectiveValue(),
+                best_bound=solver.BestObjectiveBound(),
+                conflicts=solver.NumConflicts(),
+                force=True,
+            )
+        extract_start = PhaseTimer.now()
+        # a limit can stop the search with a feasible but not optimal schedule
         if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
             self.var_c_max = solver.ObjectiveValue()
             # print the solution found.
@@ -833,15 +1817,32 @@ class FJSS2(_FJS):
                     )
                     solved_operations.append(solved_operation)
 
-            return FjsOutput(
+            output = FjsOutput(
                 solved_operations=solved_operations,
                 makespan=solver.ObjectiveValue(),
+                status=solver.StatusName(status),
+                best_bound=solver.BestObjectiveBound(),
+                mip_gap=get_mip_gap(solver.ObjectiveValue(), solver.BestObjectiveBound()),
             )
+            self.timer.add("extract", extract_start, PhaseTimer.now())
+            return output
 
         else:
             print("No solution found.")
             return None
 
+    def iter_incumbents(self):
+        """Solve the model with CP-SAT and yield an Incumbent for every improving schedule.
+
+        The FjsOutput of solve_ortools is the return value of the generator. Closing the
+        generator early stops the search.
+        """
+        if self._model is None:
+            self.build_model_ortools()
+        return iter_incumbents(
+            self.solve_ortools, stop=lambda: self._solver and self._solver.stop_search()
+        )
+
 
 class FJSS4_v2:
     """
@@ -867,17 +1868,67 @@ class FJSS4_v2:
         inf_milp: float = 1.0e7,
         shift_durations: float|int = None,
         operations_subset_indices: list[int] = None,
-        big_m: float | int = None,
+        big_m: float | int | np.ndarray = None,
         # big_m=1.0e6,
         matrix_variables=True,
+        vectorized_constraints: bool = False,
+        sparse_pairs: bool = False,
+        sparse_lags: bool = True,
+        heuristic_bounds: bool = False,
+        pairwise_big_m: bool = False,
+        formulation: str = "big_m",
+        prune_overlaps: bool = False,
+        lag_closure: bool = False,
+        time_windows: bool = False,
+        para_window: np.ndarray | None = None,
+        # stop the search after time_limit seconds, at a relative gap of mip_gap or after
+        # solution_limit improving solutions and return the best schedule found
+        time_limit: float | None = None,
+        mip_gap: float | None = None,
+        solution_limit: int | None = None,
+        # random seed of gurobi or CP-SAT, None keeps the solver default
+        seed: int | None = None,
+        # records the time of the normalize, bounds, presolve, solve and extract phases
+        timer: PhaseTimer | None = None,
         verbose: bool = True,
     ):
         self.num_workers = num_workers
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+        self.solution_limit = solution_limit
+        self.seed = seed
         self.matrix_variables = matrix_variables
+        # emit eqs. (8)-(15) as broadcast matrix constraints instead of one addConstr per (i, j, m)
+        if vectorized_constraints and not matrix_variables:
+            raise ValueError("vectorized_constraints requires matrix_variables=True.")
+        self.vectorized_constraints = vectorized_constraints
+        # only model var_x, var_z and eqs. (8)-(16) for operations that can share a machine
+        if sparse_pairs and not matrix_variables:
+            raise ValueError("sparse_pairs requires matrix_variables=True.")
+        self.sparse_pairs = sparse_pairs
+        # drop var_z[i, j, m] when w_im + w_jm exceeds the capacity of machine m, the two
+        # operations can never overlap there, together with the capacity rows left empty
+        if prune_overlaps and not sparse_pairs:
+            raise ValueError("prune_overlaps requires sparse_pairs=True.")
+        self.prune_overlaps = prune_overlaps
+        # only add eqs. (6) and (7) for finite lags, lags of +/-inf_milp are trivially slack
+        self.sparse_lags = sparse_lags
+        # one big-M per (i, j, m) of eqs. (8)-(15) from the bounds of the time variables, which
+        # needs the heuristic makespan as the upper bound of all the time variables
+        self.pairwise_big_m = pairwise_big_m
+        # eqs. (8)-(15) as big-M rows ("big_m") or as indicator constraints on the conjunction
+        # x_ij * y_im * y_jm ("indicator")
+        if formulation not in ("big_m", "indicator"):
+            raise ValueError(
+                f"formulation must be 'big_m' or 'indicator', got {formulation!r}."
+            )
+        self.formulation = formulation
         # self.big_m = get_m_value(
         #     para_p=para_p, para_h=para_h, para_lmin=para_lmin, para_a=para_a
         # )
+        self.timer = PhaseTimer() if timer is None else timer
 
+        start = PhaseTimer.now()
         para_lmin[para_lmin == -np.inf] = -inf_milp
         para_lmin[para_lmin == np.inf] = inf_milp
         para_lmax[para_lmax == np.inf] = inf_milp
@@ -914,8 +1965,67 @@ class FJSS4_v2:
         self.para_lmax = para_lmax
         self.para_h = para_h
         self.para_mach_capacity = para_mach_capacity
+        self.para_window = para_window
+        # eligible[i, m] is True if machine m can process operation i
+        self.eligible = np.asarray(para_p, dtype=float) < inf_milp
+        self.timer.add("normalize", start, PhaseTimer.now())
+
+        # the lag closure, the heuristic schedule, the horizon, the time windows and big-M
+        start = PhaseTimer.now()
+        # fix var_x of the pairs ordered by a chain of minimum lags and drop the rows of
+        # eqs. (8)-(15) that can no longer be active
+        self.lag_closure = lag_closure
+        self.lag_longest = None
+        self.lag_precedes = None
+        if lag_closure:
+            self.lag_longest, self.lag_precedes = get_lag_closure(
+                para_lmin=para_lmin, para_p=para_p, infinity=inf_milp
+            )
+
+        # a list-scheduling heuristic gives the horizon, the upper bound of all the time
+        # variables and the big-M value
+        self.heuristic_solution = None
+        if heuristic_bounds or pairwise_big_m:
+            self.heuristic_solution = self.get_heuristic_solution()
+
+        if self.heuristic_solution is not None:
+            self.horizon = self.heuristic_solution[3]
+        else:
+            self.horizon = self.__class__.get_horizon(
+                infinity=inf_milp,
+                para_p=para_p,
+                para_h=para_h,
+                para_lmax=para_lmax,
+                )
+
+        # per-operation bounds of var_s and var_c from the time windows (a_i, b_i), the lags
+        # and the processing times; they also tighten the pairwise big-M values
+        self.time_windows = time_windows
+        self.time_bounds = None
+        if time_windows:
+            self.time_bounds = get_time_windows(
+                para_p=para_p,
+                para_h=para_h,
+                para_lmin=para_lmin,
+                para_lmax=para_lmax,
+                # the time variables are only bounded by the heuristic makespan
+                horizon=self.horizon if self.heuristic_solution is not None else np.inf,
+                infinity=inf_milp,
+                para_window=para_window,
+            )
 
-        if big_m is None:
+        # the pairwise values need the time variables bounded by the heuristic makespan,
+        # without a heuristic schedule the scalar value below is used
+        if big_m is None and pairwise_big_m and self.heuristic_solution is not None:
+            self.big_m = self.get_pairwise_big_m()
+            print(
+                "the inferred pairwise big_m values are in "
+                f"[{self.big_m.min()}, {self.big_m.max()}]"
+            )
+        elif big_m is None and self.heuristic_solution is not None:
+            self.big_m = self.get_heuristic_big_m()
+            print(f"the inferred big_m value from the heuristic schedule is {self.big_m}")
+        elif big_m is None:
             # print(f"para_lmin={para_lmin}")
             # print(f"non-negative elements of para_lmin: {para_lmin[para_lmin>=0]}")
             self.big_m = get_m_value_runzhong(
@@ -932,15 +2042,12 @@ class FJSS4_v2:
         #     self.big_m = get_m_value_old(
         #         para_p=para_p, para_h=para_h, para_lmin=para_lmin, para_a=para_a
         #     )
+        elif isinstance(big_m, np.ndarray):
+            self.big_m = np.asarray(big_m, dtype=float)
         else:
             self.big_m = big_m
+        self.timer.add("bounds", start, PhaseTimer.now())
 
-        self.horizon = self.__class__.get_horizon(
-            infinity=inf_milp,
-            para_p=para_p,
-            para_h=para_h,
-            para_lmax=para_lmax,
-            )
         # self.big_m = self.horizon
 
         # print(f"big_m: {self.big_m}")
@@ -958,6 +2065,21 @@ class FJSS4_v2:
         self.model = None
         self.var_ws_assignments = None
         self.var_ws_starting_times = None
+        # positions of var_x[i, j] and var_z[i, j, m] in the flat variables when sparse_pairs
+        # is used, -1 if the entry is not modelled
+        self.x_index = None
+        self.z_index = None
+        # the eq. (16) row of every (i, m) of the gurobi model, extended by add_operations
+        self.capacity_rows = None
+        # CP-SAT model and solver of build_model_ortools and solve_ortools
+        self._model = None
+        self._solver = None
+        # the backend of the last built model, "gurobi" or "ortools"
+        self.backend = None
+        # initial solution of set_warm_start as dense arrays, used by the next solve
+        self.warm_start = None
+        # the incumbents and bounds over time of the last solve
+        self.progress = None
 
     def build_model_gurobi(self):
         """Build the mixed integer linear programming model with gurobi."""
@@ -971,7 +2093,33 @@ class FJSS4_v2:
         n_opt, n_mach = self.get_params()
 
         # create variables
-        if self.matrix_variables:
+        if self.matrix_variables and self.sparse_pairs:
+            # operation i cannot be processed by machine m if para_p[i, m] is infinity
+            var_y = model.addMVar(
+                (n_opt, n_mach),
+                ub=self.eligible.astype(float),
+                vtype=GRB.BINARY,
+                name="var_y",
+            )
+            idx_i, idx_j, _ = self.get_disjunctive_pairs()
+            # if operation i is processed before operation j, only for i < j sharing a machine
+            x_pairs = np.unique(np.stack([idx_i, idx_j], axis=1), axis=0)
+            self.x_index = np.full((n_opt, n_opt), -1, dtype=int)
+            self.x_index[x_pairs[:, 0], x_pairs[:, 1]] = np.arange(len(x_pairs))
+            var_x = model.addMVar(len(x_pairs), vtype=GRB.BINARY, name="var_x")
+            # if operation i is processed before and overlapped operation j in machine m, for
+            # both orders of every pair sharing machine m
+            z_triples = self.get_overlap_triples()
+            self.z_index = np.full((n_opt, n_opt, n_mach), -1, dtype=int)
+            self.z_index[z_triples[:, 0], z_triples[:, 1], z_triples[:, 2]] = np.arange(
+                len(z_triples)
+            )
+            var_z = model.addMVar(len(z_triples), vtype=GRB.BINARY, name="var_z")
+            # starting time of operation i
+            var_s = model.addMVar(n_opt, vtype=GRB.CONTINUOUS, name="var_s")
+            # completion time of operation i
+            var_c = model.addMVar(n_opt, vtype=GRB.CONTINUOUS, name="var_c")
+        elif self.matrix_variables:
             # if operation i is processed by machine m
             var_y = model.addMVar((n_opt, n_mach), vtype=GRB.BINARY, name="var_y")
             # if operation i is processed before operation j
@@ -1002,95 +2150,68 @@ class FJSS4_v2:
         # )
         var_c_max = model.addVar(lb=1.0e-5, name="var_c_max", vtype=GRB.CONTINUOUS)
 
+        if self.heuristic_solution is not None:
+            # an optimal schedule does not complete after the heuristic makespan
+            var_s.UB = self.horizon
+            var_c.UB = self.horizon
+            var_c_max.UB = self.horizon
+
+        if self.time_bounds is not None:
+            s_lb, s_ub, c_lb, c_ub = self.time_bounds
+            var_s.LB = s_lb
+            var_s.UB = np.minimum(s_ub, GRB.INFINITY)
+            var_c.LB = c_lb
+            var_c.UB = np.minimum(c_ub, GRB.INFINITY)
+
+        if self.lag_closure:
+            self.fix_lag_order(var_x=var_x, var_z=var_z)
+
         # var_c_max = model.addVar(
         #     name="var_c_max", lb=1e-5, ub=float("inf"), vtype=GRB.CONTINUOUS
         # )
 
         # add constraints
-        for i in range(n_opt):
-            # eq. (2)
-            model.addConstr(var_c_max >= var_c[i], name="eq_2")
-            # eq. (3)
-            model.addConstr(
-                var_c[i]
-                >= var_s[i]
-                + gp.quicksum(self.para_p[i, m] * var_y[i, m] for m in range(n_mach)),
-                name="eq_3",
+        self.add_operation_constraints(
+            model=model, var_c_max=var_c_max, var_y=var_y, var_s=var_s, var_c=var_c
+        )
+        self.add_lag_constraints(model=model, var_s=var_s, var_c=var_c)
+
+        if self.formulation == "indicator":
+            self.add_disjunctive_indicator_constraints(
+                model=model,
+                var_x=var_x,
+                var_y=var_y,
+                var_z=var_z,
+                var_s=var_s,
+                var_c=var_c,
             )
-            # eq. (4)
-            model.addConstr(
-                var_c[i]
-                <= var_s[i]
-                + gp.quicksum(
-                    (self.para_p[i, m] + self.para_h[i, m]) * var_y[i, m]
-                    for m in range(n_mach)
-                ),
-                name="eq_4",
+        elif self.vectorized_constraints:
+            self.add_disjunctive_constraints_vectorized(
+                model=model,
+                var_x=var_x,
+                var_y=var_y,
+                var_z=var_z,
+                var_s=var_s,
+                var_c=var_c,
             )
-            # eq. (5)
-            model.addConstr(
-                gp.quicksum(var_y[i, m] for m in range(n_mach)) == 1, name="eq_5"
+        else:
+            self.add_disjunctive_constraints(
+                model=model,
+                var_x=var_x,
+                var_y=var_y,
+                var_z=var_z,
+                var_s=var_s,
+                var_c=var_c,
             )
 
-        for i, j in it.product(range(n_opt), range(n_opt)):
-            if i != j:
-                # eq. (6)
-                model.addConstr(
-                    var_s[j] >= var_c[i] + self.para_lmin[i, j], name="eq_6"
-                )
-                # eq. (7)
-                model.addConstr(
-                    var_s[j] <= var_c[i] + self.para_lmax[i, j], name="eq_7"
-                )
-
-        for i, j, m in it.product(range(n_opt), range(n_opt), range(n_mach)):
-            if i < j:
-                expr_0 = self.big_m * (3 - var_x[i, j] - var_y[i, m] - var_y[j, m])
-                # eq. (8)
-                model.addConstr(
-                    var_s[j] >= var_c[i] + self.para_a[i, j, m] - expr_0, name="eq_8"
-                )
-                # eq. (9)
-                expr_1 = self.big_m * (2 + var_x[i, j] - var_y[i, m] - var_y[j, m])
-                model.addConstr(
-                    var_s[i] >= var_c[j] + self.para_a[j, i, m] - expr_1, name="eq_9"
-                )
-                # eq. (10)
-                model.addConstr(
-                    var_s[j] >= var_s[i] + self.para_delta[m] - expr_0, name="eq_10"
-                )
-                # eq. (11)
-                model.addConstr(
-                    var_s[i] >= var_s[j] + self.para_delta[m] - expr_1, name="eq_11"
-                )
-                # eq. (12)
-                model.addConstr(
-                    var_c[j] >= var_c[i] + self.para_delta[m] - expr_0, name="eq_12"
-                )
-                # eq. (13)
-                model.addConstr(
-                    var_c[i] >= var_c[j] + self.para_delta[m] - expr_1, name="eq_13"
-                )
-                # eq. (14)
-                expr_2 = self.big_m * (
-                    3 + var_z[i, j, m] - var_x[i, j] - var_y[i, m] - var_y[j, m]
-                )
-                model.addConstr(var_s[j] >= var_c[i] - expr_2, name="eq_14")
-                # eq. (15)
-                expr_3 = self.big_m * (
-                    2 + var_z[j, i, m] + var_x[i, j] - var_y[i, m] - var_y[j, m]
-                )
-                model.addConstr(var_s[i] >= var_c[j] - expr_3, name="eq_15")
-
         # eq. (16)
-        for i, m in it.product(range(n_opt), range(n_mach)):
-            model.addConstr(
-                gp.quicksum(
-                    self.para_w[j, m] * var_z[i, j, m] for j in range(n_opt) if i != j
-                )
-                <= (self.para_mach_capacity[m] - self.para_w[i, m]) * var_y[i, m],
-                name="eq_16",
+        self.capacity_rows = {}
+        if self.vectorized_constraints:
+            self.add_capacity_constraints_vectorized(
+                model=model, var_y=var_y, var_z=var_z
             )
+        else:
+            self.add_capacity_constraints(model=model, var_y=var_y, var_z=var_z)
 
         # work shifts
         if self.shift_durations is not None:
@@ -1187,10 +2308,892 @@ class FJSS4_v2:
         self.var_x = var_x
         self.var_z = var_z
         self.model = model
+        self.backend = "gurobi"
         env.close()
 
-    def solve_gurobi(self):
-        """Solve the mixed integer linear programming model with gurobi."""
+    def add_operations(
+        self,
+        operations: list[str],
+        para_p: np.ndarray,
+        para_a: np.ndarray,
+        para_w: np.ndarray,
+        para_h: np.ndarray,
+        para_lmin: np.ndarray,
+        para_lmax: np.ndarray,
+        para_window: np.ndarray | None = None,
+    ):
+        """Add a batch of operations to the model of build_model_gurobi.
+
+        Only the variables of the added operations and the rows of eqs. (2)-(16) that involve
+        them are created, the eq. (16) rows of the current operations get the var_z of the
+        added ones as new coefficients. A sweep over n_opt can so grow one model instead of
+        building one per step.
+
+        Parameters
+        ----------
+        operations : list[str]
+            The operations of the grown instance, starting with the current operations.
+        para_p, para_a, para_w, para_h, para_lmin, para_lmax : np.ndarray
+            The parameters of the grown instance in the layout of the constructor. The block
+            of the current operations has to be unchanged.
+        para_window : np.ndarray, optional
+            The time windows of the grown instance.
+
+        Raises
+        ------
+        ValueError
+            If the model was not built by build_model_gurobi with matrix_variables, if the
+            bounds or the order of the variables come from the whole instance
+            (heuristic_bounds, pairwise_big_m, lag_closure, time_windows, shift_durations),
+            if the current operations change or if big_m is too small for the grown instance.
+
+        Notes
+        -----
+        Pass the big_m of the largest instance to the constructor to grow the model up to it.
+        Gurobi drops the solution of the current operations once the model changes; use
+        set_warm_start with that schedule to start the next solve from it.
+
+        """
+        if self.backend != "gurobi" or self.capacity_rows is None:
+            raise ValueError("add_operations requires a model built by build_model_gurobi.")
+        if not self.matrix_variables:
+            raise ValueError("add_operations requires matrix_variables=True.")
+        if (
+            self.heuristic_solution is not None
+            or isinstance(self.big_m, np.ndarray)
+            or self.lag_closure
+            or self.time_windows
+            or self.shift_durations is not None
+        ):
+            raise ValueError(
+                "add_operations does not support heuristic_bounds, pairwise_big_m, "
+                "lag_closure, time_windows and shift_durations."
+            )
+
+        first_new, n_mach = self.get_params()
+        if isinstance(operations, list):
+            operations = {i: operations[i] for i in range(len(operations))}
+        n_opt = len(operations)
+        if n_opt < first_new or any(
+            operations[i] != self.operations[i] for i in range(first_new)
+        ):
+            raise ValueError("operations must start with the current operations.")
+
+        # the number of leading operation axes of every parameter
+        para = {
+            "para_p": (para_p, 1),
+            "para_a": (para_a, 2),
+            "para_w": (para_w, 1),
+            "para_h": (para_h, 1),
+            "para_lmin": (para_lmin, 2),
+            "para_lmax": (para_lmax, 2),
+        }
+        for name, (value, n_axes) in para.items():
+            value = np.array(value, dtype=float)
+            value[value == np.inf] = self.inf_milp
+            value[value == -np.inf] = -self.inf_milp
+            current = np.asarray(getattr(self, name), dtype=float)
+            if not np.array_equal(value[(slice(first_new),) * n_axes], current):
+                raise ValueError(f"{name} of the current operations has changed.")
+            para[name] = value
+
+        big_m = get_m_value_runzhong(
+            para_p=para["para_p"],
+            para_h=para["para_h"],
+            para_lmin=para["para_lmin"],
+            para_a=para["para_a"],
+            infinity=self.inf_milp,
+        )
+        if big_m > self.big_m:
+            raise ValueError(
+                f"big_m={self.big_m} is smaller than the {big_m} of the grown instance, pass "
+                "the big_m of the largest instance to the constructor."
+            )
+
+        self.operations = operations
+        for name, value in para.items():
+            setattr(self, name, value)
+        self.para_window = para_window
+        self.eligible = self.para_p < self.inf_milp
+        self.horizon = self.__class__.get_horizon(
+            infinity=self.inf_milp,
+            para_p=self.para_p,
+            para_h=self.para_h,
+            para_lmax=self.para_lmax,
+        )
+
+        # create the variables of the added operations
+        model = self.model
+        n_new = n_opt - first_new
+        var_y = self.grow_mvar(
+            model,
+            self.var_y,
+            (n_opt, n_mach),
+            ub=self.eligible[first_new:].reshape(-1).astype(float) if self.sparse_pairs else 1.0,
+            vtype=GRB.BINARY,
+            name="var_y",
+        )
+        var_s = self.grow_mvar(
+            model, self.var_s, (n_opt,), vtype=GRB.CONTINUOUS, name="var_s"
+        )
+        var_c = self.grow_mvar(
+            model, self.var_c, (n_opt,), vtype=GRB.CONTINUOUS, name="var_c"
+        )
+        if self.sparse_pairs:
+            idx_i, idx_j, _ = self.get_disjunctive_pairs(first_new)
+            x_pairs = np.unique(np.stack([idx_i, idx_j], axis=1), axis=0)
+            x_index = np.full((n_opt, n_opt), -1, dtype=int)
+            x_index[:first_new, :first_new] = self.x_index
+            x_index[x_pairs[:, 0], x_pairs[:, 1]] = self.var_x.shape[0] + np.arange(len(x_pairs))
+            var_x = self.grow_mvar(
+                model,
+                self.var_x,
+                (self.var_x.shape[0] + len(x_pairs),),
+                vtype=GRB.BINARY,
+                name="var_x",
+            )
+            z_triples = self.get_overlap_triples(first_new)
+            z_index = np.full((n_opt, n_opt, n_mach), -1, dtype=int)
+            z_index[:first_new, :first_new] = self.z_index
+            z_index[z_triples[:, 0], z_triples[:, 1], z_triples[:, 2]] = self.var_z.shape[
+                0
+            ] + np.arange(len(z_triples))
+            var_z = self.grow_mvar(
+                model,
+                self.var_z,
+                (self.var_z.shape[0] + len(z_triples),),
+                vtype=GRB.BINARY,
+                name="var_z",
+            )
+            self.x_index = x_index
+            self.z_index = z_index
+        else:
+            var_x = self.grow_mvar(
+                model, self.var_x, (n_opt, n_opt), vtype=GRB.BINARY, name="var_x"
+            )
+            var_z = self.grow_mvar(
+                model, self.var_z, (n_opt, n_opt, n_mach), vtype=GRB.BINARY, name="var_z"
+            )
+
+        # eqs. (2)-(15) of the added operations
+        self.add_operation_constraints(
+            model=model,
+            var_c_max=self.var_c_max,
+            var_y=var_y,
+            var_s=var_s,
+            var_c=var_c,
+            first_new=first_new,
+        )
+        self.add_lag_constraints(model=model, var_s=var_s, var_c=var_c, first_new=first_new)
+        if self.formulation == "indicator":
+            add_disjunctive_constraints = self.add_disjunctive_indicator_constraints
+        elif self.vectorized_constraints:
+            add_disjunctive_constraints = self.add_disjunctive_constraints_vectorized
+        else:
+            add_disjunctive_constraints = self.add_disjunctive_constraints
+        add_disjunctive_constraints(
+            model=model,
+            var_x=var_x,
+            var_y=var_y,
+            var_z=var_z,
+            var_s=var_s,
+            var_c=var_c,
+            first_new=first_new,
+        )
+
+        # eq. (16) of the added operations
+        if self.vectorized_constraints:
+            self.add_capacity_constraints_vectorized(
+                model=model, var_y=var_y, var_z=var_z, first_new=first_new
+            )
+        else:
+            self.add_capacity_constraints(
+                model=model, var_y=var_y, var_z=var_z, first_new=first_new
+            )
+        # the added operations overlapping the current ones in eq. (16)
+        if self.sparse_pairs:
+            z_triples = z_triples[z_triples[:, 0] < first_new]
+        else:
+            z_triples = np.argwhere(np.ones((first_new, n_new, n_mach), dtype=bool))
+            z_triples[:, 1] += first_new
+        model.update()
+        pruned = set()
+        for i, j, m in z_triples.tolist():
+            if (i, m) in self.capacity_rows:
+                model.chgCoeff(
+                    self.capacity_rows[i, m],
+                    self.get_z(var_z, i, j, m).item(),
+                    float(self.para_w[j, m]),
+                )
+            else:
+                pruned.add((i, m))
+        for i, m in sorted(pruned):
+            # the row of operation i was left out by prune_overlaps, without any var_z yet
+            overlaps = [j for j in range(first_new, n_opt) if self.has_z(i, j, m)]
+            self.capacity_rows[i, m] = model.addConstr(
+                gp.quicksum(self.para_w[j, m] * self.get_z(var_z, i, j, m) for j in overlaps)
+                <= (self.para_mach_capacity[m] - self.para_w[i, m]) * var_y[i, m],
+                name="eq_16",
+            )
+
+        self.var_y = var_y
+        self.var_c = var_c
+        self.var_s = var_s
+        self.var_x = var_x
+        self.var_z = var_z
+
+    @staticmethod
+    def grow_mvar(model, variables, shape, **kwargs):
+        """Get an MVar of the given shape with variables as its leading block.
+
+        The other entries are new variables of model, created with the keyword arguments of
+        addMVar in row-major order.
+        """
+        grown = np.empty(shape, dtype=object)
+        block = tuple(slice(size) for size in variables.shape)
+        grown[block] = variables.tolist()
+        new = np.ones(shape, dtype=bool)
+        new[block] = False
+        grown[new] = model.addMVar(int(new.sum()), **kwargs).tolist()
+        return gp.MVar.fromlist(grown.tolist())
+
+    def add_operation_constraints(self, model, var_c_max, var_y, var_s, var_c, first_new=0):
+        """Add eqs. (2)-(5) for the operations from first_new on."""
+        n_opt, n_mach = self.get_params()
+        for i in range(first_new, n_opt):
+            # eq. (2)
+            model.addConstr(var_c_max >= var_c[i], name="eq_2")
+            # eq. (3)
+            model.addConstr(
+                var_c[i]
+                >= var_s[i]
+                + gp.quicksum(self.para_p[i, m] * var_y[i, m] for m in range(n_mach)),
+                name="eq_3",
+            )
+            # eq. (4)
+            model.addConstr(
+                var_c[i]
+                <= var_s[i]
+                + gp.quicksum(
+                    (self.para_p[i, m] + self.para_h[i, m]) * var_y[i, m]
+                    for m in range(n_mach)
+                ),
+                name="eq_4",
+            )
+            # eq. (5)
+            model.addConstr(
+                gp.quicksum(var_y[i, m] for m in range(n_mach)) == 1, name="eq_5"
+            )
+
+    def add_lag_constraints(self, model, var_s, var_c, first_new=0):
+        """Add eqs. (6) and (7) for the lags of the operations from first_new on."""
+        lmin_pairs, lmax_pairs = self.get_lag_pairs()
+        lmin_pairs = lmin_pairs[lmin_pairs.max(axis=1, initial=-1) >= first_new]
+        lmax_pairs = lmax_pairs[lmax_pairs.max(axis=1, initial=-1) >= first_new]
+        if self.vectorized_constraints:
+            para_lmin = np.asarray(self.para_lmin, dtype=float)
+            para_lmax = np.asarray(self.para_lmax, dtype=float)
+            idx_i, idx_j = lmin_pairs.T
+            # eq. (6)
+            model.addConstr(
+                var_s[idx_j] >= var_c[idx_i] + para_lmin[idx_i, idx_j], name="eq_6"
+            )
+            idx_i, idx_j = lmax_pairs.T
+            # eq. (7)
+            model.addConstr(
+                var_s[idx_j] <= var_c[idx_i] + para_lmax[idx_i, idx_j], name="eq_7"
+            )
+        else:
+            for i, j in lmin_pairs:
+                # eq. (6)
+                model.addConstr(
+                    var_s[j] >= var_c[i] + self.para_lmin[i, j], name="eq_6"
+                )
+            for i, j in lmax_pairs:
+                # eq. (7)
+                model.addConstr(
+                    var_s[j] <= var_c[i] + self.para_lmax[i, j], name="eq_7"
+                )
+
+    def add_disjunctive_constraints(
+        self, model, var_x, var_y, var_z, var_s, var_c, first_new=0
+    ):
+        """Add eqs. (8)-(15) with one addConstr call per (i, j, m) and i < j."""
+        idx_i, idx_j, idx_m = self.get_disjunctive_pairs(first_new)
+        order = self.get_fixed_order(idx_i, idx_j)
+        for i, j, m, order_ij in zip(idx_i, idx_j, idx_m, order):
+            x_ij = self.get_x(var_x, i, j)
+            big_m = self.get_big_m(i, j, m)
+            expr_0 = big_m * (3 - x_ij - var_y[i, m] - var_y[j, m])
+            expr_1 = big_m * (2 + x_ij - var_y[i, m] - var_y[j, m])
+            if order_ij != -1:
+                # eq. (8)
+                model.addConstr(
+                    var_s[j] >= var_c[i] + self.para_a[i, j, m] - expr_0, name="eq_8"
+                )
+                # eq. (10)
+                model.addConstr(
+                    var_s[j] >= var_s[i] + self.para_delta[m] - expr_0, name="eq_10"
+                )
+                # eq. (12)
+                model.addConstr(
+                    var_c[j] >= var_c[i] + self.para_delta[m] - expr_0, name="eq_12"
+                )
+            if order_ij != 1:
+                # eq. (9)
+                model.addConstr(
+                    var_s[i] >= var_c[j] + self.para_a[j, i, m] - expr_1, name="eq_9"
+                )
+                # eq. (11)
+                model.addConstr(
+                    var_s[i] >= var_s[j] + self.para_delta[m] - expr_1, name="eq_11"
+                )
+                # eq. (13)
+                model.addConstr(
+                    var_c[i] >= var_c[j] + self.para_delta[m] - expr_1, name="eq_13"
+                )
+            if order_ij != 0:
+                # eqs. (14) and (15) are implied by the lags
+                continue
+            # eq. (14)
+            expr_2 = big_m * (
+                3 + self.get_z(var_z, i, j, m) - x_ij - var_y[i, m] - var_y[j, m]
+            )
+            model.addConstr(var_s[j] >= var_c[i] - expr_2, name="eq_14")
+            # eq. (15)
+            expr_3 = big_m * (
+                2 + self.get_z(var_z, j, i, m) + x_ij - var_y[i, m] - var_y[j, m]
+            )
+            model.addConstr(var_s[i] >= var_c[j] - expr_3, name="eq_15")
+
+    def add_disjunctive_constraints_vectorized(
+        self, model, var_x, var_y, var_z, var_s, var_c, first_new=0
+    ):
+        """Add eqs. (8)-(15) as one matrix constraint per equation.
+
+        The (i, j, m) triples with i < j are flattened into index arrays so that every equation
+        family is a single broadcast expression over matrix variables. The model gets exactly the
+        same rows as :meth:`add_disjunctive_constraints`, only grouped by equation.
+        """
+        idx_i, idx_j, idx_m = self.get_disjunctive_pairs(first_new)
+        order = self.get_fixed_order(idx_i, idx_j)
+        # rows of i before j, of j before i and of the pairs without a fixed order
+        fwd, bwd, free = order != -1, order != 1, order == 0
+
+        para_a = np.asarray(self.para_a, dtype=float)
+        a_ijm = para_a[idx_i, idx_j, idx_m]
+        a_jim = para_a[idx_j, idx_i, idx_m]
+        para_delta = np.asarray(self.para_delta, dtype=float)[idx_m]
+
+        x_ij = self.get_x(var_x, idx_i, idx_j)
+        y_im = var_y[idx_i, idx_m]
+        y_jm = var_y[idx_j, idx_m]
+        s_i = var_s[idx_i]
+        s_j = var_s[idx_j]
+        c_i = var_c[idx_i]
+        c_j = var_c[idx_j]
+        big_m = np.broadcast_to(self.get_big_m(idx_i, idx_j, idx_m), idx_i.shape)
+
+        expr_0 = big_m * (3 - x_ij - y_im - y_jm)
+        expr_1 = big_m * (2 + x_ij - y_im - y_jm)
+        # eq. (8)
+        model.addConstr(s_j[fwd] >= c_i[fwd] + a_ijm[fwd] - expr_0[fwd], name="eq_8")
+        # eq. (9)
+        model.addConstr(s_i[bwd] >= c_j[bwd] + a_jim[bwd] - expr_1[bwd], name="eq_9")
+        # eq. (10)
+        model.addConstr(s_j[fwd] >= s_i[fwd] + para_delta[fwd] - expr_0[fwd], name="eq_10")
+        # eq. (11)
+        model.addConstr(s_i[bwd] >= s_j[bwd] + para_delta[bwd] - expr_1[bwd], name="eq_11")
+        # eq. (12)
+        model.addConstr(c_j[fwd] >= c_i[fwd] + para_delta[fwd] - expr_0[fwd], name="eq_12")
+        # eq. (13)
+        model.addConstr(c_i[bwd] >= c_j[bwd] + para_delta[bwd] - expr_1[bwd], name="eq_13")
+        # eqs. (14) and (15) are implied by the lags for the pairs with a fixed order
+        idx_i, idx_j, idx_m = idx_i[free], idx_j[free], idx_m[free]
+        # eq. (14)
+        z_ijm = self.get_z(var_z, idx_i, idx_j, idx_m)
+        expr_2 = expr_0[free] + big_m[free] * z_ijm
+        model.addConstr(s_j[free] >= c_i[free] - expr_2, name="eq_14")
+        # eq. (15)
+        z_jim = self.get_z(var_z, idx_j, idx_i, idx_m)
+        expr_3 = expr_1[free] + big_m[free] * z_jim
+        model.addConstr(s_i[free] >= c_j[free] - expr_3, name="eq_15")
+
+    def add_disjunctive_indicator_constraints(
+        self, model, var_x, var_y, var_z, var_s, var_c, first_new=0
+    ):
+        """Add eqs. (8)-(15) as indicator constraints instead of big-M rows.
+
+        The binaries b_ijm >= x_ij + y_im + y_jm - 2 and b_jim >= y_im + y_jm - x_ij - 1 are 1
+        when i is before j (or j before i) on machine m and enforce eqs. (8), (10) and (12)
+        (or (9), (11) and (13)). eqs. (14) and (15) are enforced by a second pair of binaries
+        that are also 1 when the corresponding var_z is 0. Rows with a setup time of -inf_milp
+        are trivially satisfied and skipped.
+        """
+        idx_i, idx_j, idx_m = self.get_disjunctive_pairs(first_new)
+        n_pair = len(idx_i)
+        order = self.get_fixed_order(idx_i, idx_j)
+
+        para_a = np.asarray(self.para_a, dtype=float)
+        para_delta = np.asarray(self.para_delta, dtype=float)[idx_m]
+
+        x_ij = self.get_x(var_x, idx_i, idx_j)
+        y_im = var_y[idx_i, idx_m]
+        y_jm = var_y[idx_j, idx_m]
+        s_i = var_s[idx_i]
+        s_j = var_s[idx_j]
+        c_i = var_c[idx_i]
+        c_j = var_c[idx_j]
+        z_ijm = self.get_z(var_z, idx_i, idx_j, idx_m)
+        z_jim = self.get_z(var_z, idx_j, idx_i, idx_m)
+
+        # i before j and j before i on machine m
+        var_b_ij = model.addMVar(n_pair, vtype=GRB.BINARY, name="var_b_ij")
+        var_b_ji = model.addMVar(n_pair, vtype=GRB.BINARY, name="var_b_ji")
+        model.addConstr(var_b_ij >= x_ij + y_im + y_jm - 2, name="b_ij")
+        model.addConstr(var_b_ji >= y_im + y_jm - x_ij - 1, name="b_ji")
+        # the same without overlap
+        var_b_ij_z = model.addMVar(n_pair, vtype=GRB.BINARY, name="var_b_ij_z")
+        var_b_ji_z = model.addMVar(n_pair, vtype=GRB.BINARY, name="var_b_ji_z")
+        model.addConstr(var_b_ij_z >= var_b_ij - z_ijm, name="b_ij_z")
+        model.addConstr(var_b_ji_z >= var_b_ji - z_jim, name="b_ji_z")
+
+        # the pairs with a fixed order only need the rows of that order and eqs. (14) and (15)
+        # are implied by the lags, an indicator that cannot be 1 is left out
+        fwd, bwd, free = order != -1, order != 1, order == 0
+
+        # eq. (8)
+        a_ijm = para_a[idx_i, idx_j, idx_m]
+        setup = (a_ijm > -self.inf_milp) & fwd
+        model.addGenConstrIndicator(
+            var_b_ij[setup], True, s_j[setup] - c_i[setup], GRB.GREATER_EQUAL, a_ijm[setup]
+        )
+        # eq. (9)
+        a_jim = para_a[idx_j, idx_i, idx_m]
+        setup = (a_jim > -self.inf_milp) & bwd
+        model.addGenConstrIndicator(
+            var_b_ji[setup], True, s_i[setup] - c_j[setup], GRB.GREATER_EQUAL, a_jim[setup]
+        )
+        # eq. (10)
+        model.addGenConstrIndicator(
+            var_b_ij[fwd], True, s_j[fwd] - s_i[fwd], GRB.GREATER_EQUAL, para_delta[fwd]
+        )
+        # eq. (11)
+        model.addGenConstrIndicator(
+            var_b_ji[bwd], True, s_i[bwd] - s_j[bwd], GRB.GREATER_EQUAL, para_delta[bwd]
+        )
+        # eq. (12)
+        model.addGenConstrIndicator(
+            var_b_ij[fwd], True, c_j[fwd] - c_i[fwd], GRB.GREATER_EQUAL, para_delta[fwd]
+        )
+        # eq. (13)
+        model.addGenConstrIndicator(
+            var_b_ji[bwd], True, c_i[bwd] - c_j[bwd], GRB.GREATER_EQUAL, para_delta[bwd]
+        )
+        # eq. (14)
+        model.addGenConstrIndicator(
+            var_b_ij_z[free], True, s_j[free] - c_i[free], GRB.GREATER_EQUAL, 0.0
+        )
+        # eq. (15)
+        model.addGenConstrIndicator(
+            var_b_ji_z[free], True, s_i[free] - c_j[free], GRB.GREATER_EQUAL, 0.0
+        )
+
+    def add_capacity_constraints(self, model, var_y, var_z, first_new=0):
+        """Add eq. (16) with one addConstr call per (i, m) and i >= first_new."""
+        n_opt, n_mach = self.get_params()
+
+        for i, m in it.product(range(first_new, n_opt), range(n_mach)):
+            if self.sparse_pairs and not self.eligible[i, m]:
+                # var_y[i, m] is fixed to 0 and there is no var_z[i, j, m]
+                continue
+            overlaps = [j for j in range(n_opt) if i != j and self.has_z(i, j, m)]
+            capacity = self.para_mach_capacity[m] - self.para_w[i, m]
+            if self.prune_overlaps and not overlaps and capacity >= 0:
+                # no operation can overlap operation i on machine m
+                continue
+            self.capacity_rows[i, m] = model.addConstr(
+                gp.quicksum(
+                    self.para_w[j, m] * self.get_z(var_z, i, j, m) for j in overlaps
+                )
+                <= capacity * var_y[i, m],
+                name="eq_16",
+            )
+
+    def add_capacity_constraints_vectorized(self, model, var_y, var_z, first_new=0):
+        """Add eq. (16) as one sparse matrix constraint over all (i, m) rows with i >= first_new."""
+        n_opt, n_mach = self.get_params()
+        para_w = np.asarray(self.para_w, dtype=float)
+        para_mach_capacity = np.asarray(self.para_mach_capacity, dtype=float)
+
+        if self.sparse_pairs:
+            row_i, row_m = np.nonzero(self.eligible)
+            z_triples = self.get_overlap_triples()
+            z_flat = var_z
+            z_pos = self.z_index[z_triples[:, 0], z_triples[:, 1], z_triples[:, 2]]
+        else:
+            row_i, row_m = np.divmod(np.arange(n_opt * n_mach), n_mach)
+            z_triples = np.argwhere(~np.eye(n_opt, dtype=bool)[:, :, None].repeat(n_mach, 2))
+            z_flat = var_z.reshape(-1)
+            z_pos = np.ravel_multi_index(z_triples.T, (n_opt, n_opt, n_mach))
+        # only the rows of the operations added after the previous build
+        new_rows = row_i >= first_new
+        row_i, row_m = row_i[new_rows], row_m[new_rows]
+        new_terms = z_triples[:, 0] >= first_new
+        z_triples, z_pos = z_triples[new_terms], z_pos[new_terms]
+
+        # row of z_triples[k] is the position of (i, m) in (row_i, row_m)
+        row_index = np.full((n_opt, n_mach), -1, dtype=int)
+        row_index[row_i, row_m] = np.arange(len(row_i))
+        rows = row_index[z_triples[:, 0], z_triples[:, 2]]
+        coeffs = para_w[z_triples[:, 1], z_triples[:, 2]]
+        mat_w = sp.csr_matrix(
+            (coeffs, (rows, z_pos)), shape=(len(row_i), z_flat.shape[0])
+        )
+        rhs = para_mach_capacity[row_m] - para_w[row_i, row_m]
+        if self.prune_overlaps:
+            # rows without any var_z are trivially satisfied unless w_im exceeds the capacity
+            keep = (np.diff(mat_w.indptr) > 0) | (rhs < 0)
+            mat_w, rhs, row_i, row_m = mat_w[keep], rhs[keep], row_i[keep], row_m[keep]
+        rows = model.addConstr(mat_w @ z_flat <= rhs * var_y[row_i, row_m], name="eq_16")
+        self.capacity_rows.update(zip(zip(row_i.tolist(), row_m.tolist()), rows.tolist()))
+
+    def get_heuristic_solution(self):
+        """Get a feasible (var_y, var_s, var_c, makespan) from list scheduling.
+
+        None if the heuristic finds no schedule, e.g. one that meets the deadlines of
+        para_window, then the bounds are not tightened by it.
+        """
+        try:
+            return list_scheduling(
+                para_p=self.para_p,
+                para_a=self.para_a,
+                para_w=self.para_w,
+                para_delta=self.para_delta,
+                para_mach_capacity=self.para_mach_capacity,
+                para_lmin=self.para_lmin,
+                para_lmax=self.para_lmax,
+                infinity=self.inf_milp,
+                para_window=self.para_window,
+            )
+        except RuntimeError as error:
+            print(f"the list-scheduling heuristic found no schedule: {error}")
+            return None
+
+    def get_heuristic_big_m(self):
+        """Get the big-M value implied by the heuristic makespan.
+
+        With all the time variables in [0, makespan], a deactivated row of eqs. (8)-(15) is
+        violated by at most makespan + max(a_ijm, delta_m).
+        """
+        para_a = np.asarray(self.para_a, dtype=float)
+        para_a = para_a[para_a < self.inf_milp]
+        max_setup = max(
+            np.max(para_a, initial=0.0),
+            np.max(np.asarray(self.para_delta, dtype=float), initial=0.0),
+        )
+        return self.heuristic_solution[3] + max_setup
+
+    def get_time_bounds(self):
+        """Get the lower and upper bounds of the starting and completion times.
+
+        Every operation starts at or after 0 and completes at or before the horizon, and takes
+        at least its shortest processing time. With ``time_windows`` the bounds propagated from
+        the time windows and the lags are used instead.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+            s_lb, s_ub, c_lb and c_ub, each with shape (n_opt,).
+
+        """
+        if self.time_bounds is not None:
+            return self.time_bounds
+
+        para_p = np.asarray(self.para_p, dtype=float)
+        p_min = np.min(para_p, axis=1, where=self.eligible, initial=self.inf_milp)
+
+        s_lb = np.zeros(len(p_min))
+        c_lb = s_lb + p_min
+        c_ub = np.full(len(p_min), float(self.horizon))
+        s_ub = c_ub - p_min
+
+        return s_lb, s_ub, c_lb, c_ub
+
+    def get_pairwise_big_m(self):
+        """Get one big-M value per (i, j, m) for eqs. (8)-(15).
+
+        A deactivated row of eqs. (8)-(15) must hold for all the values of the time variables
+        within their bounds, so the big-M of the pair (i, j) on machine m is the largest
+        violation any of its eight rows can have, e.g. c_ub[i] + a_ijm - s_lb[j] for eq. (8).
+
+        Returns
+        -------
+        np.ndarray
+            The big-M values with shape (n_opt, n_opt, n_mach), symmetric in i and j.
+
+        """
+        s_lb, s_ub, c_lb, c_ub = self.get_time_bounds()
+        para_a = np.asarray(self.para_a, dtype=float)
+        para_delta = np.asarray(self.para_delta, dtype=float)[None, None, :]
+
+        # the rows of (i, j) with i before j, eqs. (8), (10), (12) and (14)
+        big_m = np.maximum.reduce(
+            [
+                c_ub[:, None, None] + para_a - s_lb[None, :, None],
+                s_ub[:, None, None] + para_delta - s_lb[None, :, None],
+                c_ub[:, None, None] + para_delta - c_lb[None, :, None],
+                np.broadcast_to((c_ub[:, None] - s_lb[None, :])[:, :, None], para_a.shape),
+            ]
+        )
+        # eqs. (9), (11), (13) and (15) are the same rows with i and j swapped
+        big_m = np.maximum(big_m, big_m.transpose(1, 0, 2))
+
+        return np.maximum(big_m, 0.0)
+
+    def get_big_m(self, i, j, m):
+        """Get the big-M of eqs. (8)-(15) for (i, j, m); i, j and m can be index arrays."""
+        if isinstance(self.big_m, np.ndarray):
+            return self.big_m[i, j, m]
+        return self.big_m
+
+    def get_fixed_order(self, idx_i, idx_j):
+        """Get the order of the pairs (i, j) implied by the minimum lags.
+
+        Returns
+        -------
+        np.ndarray
+            1 if i is processed before j, -1 if j is processed before i and 0 if the order is
+            not fixed, which is always the case without ``lag_closure``.
+
+        """
+        order = np.zeros(len(idx_i), dtype=int)
+        if self.lag_precedes is not None:
+            order[self.lag_precedes[idx_i, idx_j]] = 1
+            order[self.lag_precedes[idx_j, idx_i]] = -1
+        return order
+
+    def fix_lag_order(self, var_x, var_z):
+        """Fix var_x and var_z of the pairs with an order implied by the minimum lags.
+
+        If i precedes j, j starts after i is completed, so x_ij = 1 for i < j (x_ji = 0 for
+        i > j) and the two operations never overlap, z_ijm = z_jim = 0.
+        """
+        n_opt, _ = self.get_params()
+        idx_i, idx_j = np.triu_indices(n_opt, k=1)
+        order = self.get_fixed_order(idx_i, idx_j)
+        if self.x_index is not None:
+            # only the pairs sharing a machine are modelled
+            order[self.x_index[idx_i, idx_j] < 0] = 0
+        fixed = order != 0
+        var_x_ij = self.get_x(var_x, idx_i[fixed], idx_j[fixed])
+        var_x_ij.LB = (order[fixed] == 1).astype(float)
+        var_x_ij.UB = (order[fixed] == 1).astype(float)
+
+        if self.z_index is None:
+            n_mach = var_z.shape[2]
+            idx_i, idx_j = np.nonzero(self.lag_precedes | self.lag_precedes.T)
+            idx_i, idx_j = np.repeat(idx_i, n_mach), np.repeat(idx_j, n_mach)
+            idx_m = np.tile(np.arange(n_mach), len(idx_i) // n_mach)
+            var_z[idx_i, idx_j, idx_m].UB = 0.0
+        else:
+            modelled = self.z_index[self.lag_precedes | self.lag_precedes.T]
+            modelled = modelled[modelled >= 0]
+            var_z[modelled].UB = 0.0
+
+    def get_lag_pairs(self):
+        """Get the (i, j) pairs for eqs. (6) and (7)."""
+        if self.sparse_lags:
+            return get_lag_graph(self.para_lmin, self.para_lmax, self.inf_milp)
+        n_opt, _ = self.get_params()
+        pairs = np.argwhere(~np.eye(n_opt, dtype=bool))
+        return pairs, pairs
+
+    def get_disjunctive_pairs(self, first_new=0):
+        """Get the (i, j, m) triples with i < j for which eqs. (8)-(15) are modelled.
+
+        With ``sparse_pairs`` only triples where machine m can process both operations are
+        kept, since eqs. (8)-(15) are trivially satisfied otherwise. With first_new > 0 only
+        the triples with j >= first_new are returned, i.e. those of the added operations.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray]
+            Index arrays idx_i, idx_j and idx_m of the same length.
+
+        """
+        n_opt, n_mach = self.get_params()
+
+        # upper triangle (i < j) repeated for every machine
+        idx_i, idx_j = np.triu_indices(n_opt, k=1)
+        idx_i = np.repeat(idx_i, n_mach)
+        idx_j = np.repeat(idx_j, n_mach)
+        idx_m = np.tile(np.arange(n_mach), n_opt * (n_opt - 1) // 2)
+
+        keep = idx_j >= first_new
+        if self.sparse_pairs:
+            keep &= self.eligible[idx_i, idx_m] & self.eligible[idx_j, idx_m]
+        idx_i, idx_j, idx_m = idx_i[keep], idx_j[keep], idx_m[keep]
+
+        return idx_i, idx_j, idx_m
+
+    def get_overlap_triples(self, first_new=0):
+        """Get the ordered (i, j, m) triples for which var_z is modelled with sparse_pairs.
+
+        With ``prune_overlaps`` the pairs whose weights do not fit machine m together are
+        dropped, var_z[i, j, m] = 1 would violate eq. (16) for them. first_new is passed to
+        :meth:`get_disjunctive_pairs`.
+        """
+        idx_i, idx_j, idx_m = self.get_disjunctive_pairs(first_new)
+        if self.prune_overlaps:
+            para_w = np.asarray(self.para_w, dtype=float)
+            para_mach_capacity = np.asarray(self.para_mach_capacity, dtype=float)
+            fits = para_w[idx_i, idx_m] + para_w[idx_j, idx_m] <= para_mach_capacity[idx_m]
+            idx_i, idx_j, idx_m = idx_i[fits], idx_j[fits], idx_m[fits]
+        return np.concatenate(
+            [
+                np.stack([idx_i, idx_j, idx_m], axis=1),
+                np.stack([idx_j, idx_i, idx_m], axis=1),
+            ]
+        )
+
+    def get_x(self, var_x, i, j):
+        """Get var_x[i, j]; i and j can be integers or index arrays."""
+        if self.x_index is None:
+            return var_x[i, j]
+        return var_x[self.x_index[i, j]]
+
+    def get_z(self, var_z, i, j, m):
+        """Get var_z[i, j, m]; i, j and m can be integers or index arrays.
+
+        Entries that are not modelled are 0.
+        """
+        if self.z_index is None:
+            return var_z[i, j, m]
+        index = self.z_index[i, j, m]
+        if np.ndim(index) == 0:
+            return var_z[index] if index >= 0 else 0
+        modelled = index >= 0
+        if modelled.all():
+            return var_z[index]
+        var_z_ijm = gp.MLinExpr.zeros(index.shape)
+        if modelled.any():
+            var_z_ijm[modelled] = var_z[index[modelled]]
+        return var_z_ijm
+
+    def has_z(self, i, j, m):
+        """Check if var_z[i, j, m] is modelled; i, j and m can be integers or index arrays."""
+        if self.z_index is None:
+            return np.full(np.shape(i), True)
+        return self.z_index[i, j, m] >= 0
+
+    def get_solution_var_x(self):
+        """Get the solution of var_x as a dense (n_opt, n_opt) array."""
+        if self.x_index is None:
+            return self.var_x.X
+        var_x = np.zeros(self.x_index.shape)
+        modelled = self.x_index >= 0
+        var_x[modelled] = self.var_x.X[self.x_index[modelled]]
+        return var_x
+
+    def get_solution_var_z(self):
+        """Get the solution of var_z as a dense (n_opt, n_opt, n_mach) array."""
+        if self.z_index is None:
+            return self.var_z.X
+        var_z = np.zeros(self.z_index.shape)
+        modelled = self.z_index >= 0
+        var_z[modelled] = self.var_z.X[self.z_index[modelled]]
+        return var_z
+
+    def set_warm_start(self, solution=None, var_y=None, var_s=None, var_c=None):
+        """Set the initial solution of the next solve_gurobi or solve_ortools.
+
+        Parameters
+        ----------
+        solution : FjsOutput, optional
+            The output of an earlier run, e.g. of FJSS2 or of a smaller time limit.
+        var_y : np.ndarray, optional
+            Assignment of operation i to machine m with shape (n_start, n_mach), used with
+            var_s and var_c if solution is None.
+        var_s : np.ndarray, optional
+            Starting time of operation i with shape (n_start,).
+        var_c : np.ndarray, optional
+            Completion time of operation i with shape (n_start,).
+
+        Notes
+        -----
+        Without any argument the list-scheduling schedule is used. var_x and var_z are
+        inferred with infer_var_x and infer_var_z. With n_start < n_opt only the first n_start
+        operations are set, e.g. the schedule before add_operations, and the solver completes
+        the rest.
+
+        """
+        var_y, var_s, var_c = get_warm_start_arrays(
+            solution=solution,
+            var_y=var_y,
+            var_s=var_s,
+            var_c=var_c,
+            operations=self.operations,
+            machines=self.machines,
+            heuristic=lambda: self.heuristic_solution or self.get_heuristic_solution(),
+        )
+        self.warm_start = {
+            "var_y": var_y,
+            "var_s": var_s,
+            "var_c": var_c,
+            "var_c_max": float(var_c.max(initial=0.0)),
+            "var_x": infer_var_x(var_s),
+            "var_z": infer_var_z(var_s, var_y, var_c),
+        }
+
+    def apply_warm_start_gurobi(self):
+        """Set the Start attributes of the gurobi variables from the warm start."""
+        start = self.warm_start
+        n_start = len(start["var_s"])
+        self.var_y[:n_start].Start = start["var_y"]
+        self.var_s[:n_start].Start = start["var_s"]
+        self.var_c[:n_start].Start = start["var_c"]
+        # the makespan of a partial warm start is left to gurobi
+        if n_start == self.var_s.shape[0]:
+            self.var_c_max.Start = start["var_c_max"]
+        else:
+            self.var_c_max.Start = GRB.UNDEFINED
+        if self.x_index is None:
+            self.var_x[:n_start, :n_start].Start = start["var_x"]
+        else:
+            x_index = self.x_index[:n_start, :n_start]
+            modelled = x_index >= 0
+            self.var_x[x_index[modelled]].Start = start["var_x"][modelled]
+        if self.z_index is None:
+            self.var_z[:n_start, :n_start].Start = start["var_z"]
+        else:
+            z_index = self.z_index[:n_start, :n_start]
+            modelled = z_index >= 0
+            self.var_z[z_index[modelled]].Start = start["var_z"][modelled]
+
+    def apply_warm_start_ortools(self):
+        """Replace the hints of the CP-SAT model with the warm start."""
+        self._model.ClearHints()
+        n_start = len(self.warm_start["var_s"])
+        if n_start == len(self.var_s):
+            self._model.AddHint(self.var_c_max, round(self.warm_start["var_c_max"]))
+        # the number of leading operation axes of every variable
+        for name, n_axes in (("var_y", 1), ("var_s", 1), ("var_c", 1), ("var_x", 2), ("var_z", 2)):
+            variables = getattr(self, name)[(slice(n_start),) * n_axes]
+            for var, value in zip(variables.flat, self.warm_start[name].flat):
+                # var_x and var_z are None where they are not modelled
+                if var is not None:
+                    self._model.AddHint(var, round(value))
+
+    def solve_gurobi(self, callbacks=None):
+        """Solve the mixed integer linear programming model with gurobi.
+
+        Parameters
+        ----------
+        callbacks : list[Callable[[Incumbent], bool | None]], optional
+            Called with every improving schedule, a callback returning True stops the search.
+
+        """
         # creates the solver and solve
         if self.model is None:
             self.build_model_gurobi()
@@ -1209,9 +3212,38 @@ class FJSS4_v2:
         # set the number of solutions to be found
         # self.model.Params.PoolSolutions = 20
 
-        self.model.optimize()
-
-        if self.model.Status == GRB.OPTIMAL:
+        if self.time_limit is not None:
+            self.model.Params.TimeLimit = self.time_limit
+        if self.mip_gap is not None:
+            self.model.Params.MIPGap = self.mip_gap
+        if self.solution_limit is not None:
+            self.model.Params.SolutionLimit = self.solution_limit
+        if self.seed is not None:
+            self.model.Params.Seed = self.seed
+
+        if self.warm_start is not None:
+            self.apply_warm_start_gurobi()
+
+        self.progress = ProgressTrace()
+        callback = GurobiIncumbentCallback(
+            callbacks=callbacks or [],
+            variables=(self.var_y, self.var_s, self.var_c),
+            progress=self.progress,
+        )
+        start = PhaseTimer.now()
+        self.progress.start()
+        self.model.optimize(callback)
+        add_solve_phases(self.timer, start, callback.presolve_end, PhaseTimer.now())
+        if self.model.SolCount > 0:
+            self.progress.append(
+                objective=self.model.objVal,
+                best_bound=self.model.ObjBound,
+                nodes=self.model.NodeCount,
+                force=True,
+            )
+        extract_start = PhaseTimer.now()
+        # a limit can stop the search with a feasible but not optimal schedule
+        if self.model.SolCount > 0:
             print(f"the solution is : {self.model.objVal}")
 
             # assignments = dict()
@@ -1228,7 +3260,7 @@ class FJSS4_v2:
             operation_ids = list(self.operations.values())
 
             for i, m in it.product(range(len(self.operations)), range(len(self.machines))):
-                if var_y_solution[i, m] == 1:
+                if var_y_solution[i, m] > 0.5:
                     # assignments[operation_ids[i]] = self.machines[m]
                     # start_times[operation_ids[i]] = var_s_solution[i]
                     # end_times[operation_ids[i]] = var_c_solution[i]
@@ -1240,14 +3272,322 @@ class FJSS4_v2:
                     )
                     solved_operations.append(solved_operation)
 
-            return FjsOutput(
+            output = FjsOutput(
                 solved_operations=solved_operations,
                 makespan=self.model.objVal,
+                status=GUROBI_STATUS_NAMES.get(self.model.Status, str(self.model.Status)),
+                best_bound=self.model.ObjBound,
+                mip_gap=self.model.MIPGap,
             )
+            self.timer.add("extract", extract_start, PhaseTimer.now())
+            return output
         else:
             print("No solution found.")
             return None
 
+    def build_model_ortools(self):
+        """Build the same formulation with CP-SAT.
+
+        eqs. (8)-(15) are enforced with OnlyEnforceIf on the literals [x_ij, y_im, y_jm] (or
+        [not x_ij, y_im, y_jm]), plus not z_ijm (or not z_jim) for eqs. (14) and (15), so no
+        big-M is needed. All the parameters have to be integral.
+        """
+        n_opt, n_mach = self.get_params()
+        para_p = np.asarray(self.para_p, dtype=float)
+        para_h = np.asarray(self.para_h, dtype=float)
+        para_a = np.asarray(self.para_a, dtype=float)
+        para_w = np.asarray(self.para_w, dtype=float)
+        para_lmin = np.asarray(self.para_lmin, dtype=float)
+        para_lmax = np.asarray(self.para_lmax, dtype=float)
+
+        if self.heuristic_solution is not None:
+            horizon = int(math.ceil(self.horizon))
+        else:
+            # every operation processed one after another
+            horizon = int(
+                math.ceil(
+                    max(
+                        self.horizon,
+                        get_m_value_runzhong(
+                            para_p=para_p,
+                            para_h=para_h,
+                            para_lmin=para_lmin,
+                            para_a=para_a,
+                            infinity=self.inf_milp,
+                        ),
+                    )
+                )
+            )
+
+        model = cp_model.CpModel()
+
+        var_c_max = model.NewIntVar(0, horizon, "var_c_max")
+        # if operation i is processed by machine m
+        var_y = np.empty((n_opt, n_mach), dtype=object)
+        for i, m in product(range(n_opt), range(n_mach)):
+            var_y[i, m] = model.NewBoolVar(f"y_{i}_{m}")
+            if not self.eligible[i, m]:
+                model.Add(var_y[i, m] == 0)
+        # starting time of operation i
+        var_s = np.empty(n_opt, dtype=object)
+        # completion time of operation i
+        var_c = np.empty(n_opt, dtype=object)
+        if self.time_bounds is not None:
+            s_lb, s_ub, c_lb, c_ub = self.time_bounds
+        else:
+            s_lb = c_lb = np.zeros(n_opt)
+            s_ub = c_ub = np.full(n_opt, np.inf)
+        # the time windows only tighten the domains [0, horizon]
+        s_lb, c_lb = np.ceil(s_lb).astype(int), np.ceil(c_lb).astype(int)
+        s_ub, c_ub = (np.floor(np.minimum(ub, horizon)).astype(int) for ub in (s_ub, c_ub))
+        for i in range(n_opt):
+            var_s[i] = model.NewIntVar(int(s_lb[i]), int(s_ub[i]), f"s_{i}")
+            var_c[i] = model.NewIntVar(int(c_lb[i]), int(c_ub[i]), f"c_{i}")
+
+        idx_i, idx_j, idx_m = self.get_disjunctive_pairs()
+        # if operation i is processed before operation j, for i < j
+        var_x = np.full((n_opt, n_opt), None, dtype=object)
+        for i, j in set(zip(idx_i.tolist(), idx_j.tolist())):
+            var_x[i, j] = model.NewBoolVar(f"x_{i}_{j}")
+        # if operation i is processed before and overlapped operation j in machine m
+        var_z = np.full((n_opt, n_opt, n_mach), None, dtype=object)
+        for i, j, m in self.get_overlap_triples().tolist():
+            var_z[i, j, m] = model.NewBoolVar(f"z_{i}_{j}_{m}")
+
+        for i in range(n_opt):
+            machines = np.flatnonzero(self.eligible[i, :])
+            # eq. (2)
+            model.Add(var_c_max >= var_c[i])
+            # eq. (3)
+            model.Add(
+                var_c[i]
+                >= var_s[i] + sum(int(para_p[i, m]) * var_y[i, m] for m in machines)
+            )
+            # eq. (4)
+            model.Add(
+                var_c[i]
+                <= var_s[i]
+                + sum(int(para_p[i, m] + para_h[i, m]) * var_y[i, m] for m in machines)
+            )
+            # eq. (5)
+            model.Add(sum(var_y[i, m] for m in machines) == 1)
+
+        lmin_pairs, lmax_pairs = self.get_lag_pairs()
+        # eq. (6)
+        for i, j in lmin_pairs:
+            model.Add(var_s[j] >= var_c[i] + int(para_lmin[i, j]))
+        # eq. (7)
+        for i, j in lmax_pairs:
+            model.Add(var_s[j] <= var_c[i] + int(para_lmax[i, j]))
+
+        if self.lag_closure:
+            # the order of the pairs implied by the minimum lags
+            modelled = np.vectorize(lambda var: var is not None, otypes=[bool])
+            idx_i_x, idx_j_x = np.nonzero(modelled(var_x))
+            for i, j, order_ij in zip(
+                idx_i_x, idx_j_x, self.get_fixed_order(idx_i_x, idx_j_x)
+            ):
+                if order_ij != 0:
+                    model.Add(var_x[i, j] == int(order_ij == 1))
+            for i, j, m in np.argwhere(modelled(var_z)):
+                if self.lag_precedes[i, j] or self.lag_precedes[j, i]:
+                    model.Add(var_z[i, j, m] == 0)
+
+        for i, j, m, order_ij in zip(
+            idx_i, idx_j, idx_m, self.get_fixed_order(idx_i, idx_j)
+        ):
+            delta = int(self.para_delta[m])
+            before = [var_x[i, j], var_y[i, m], var_y[j, m]]
+            after = [var_x[i, j].Not(), var_y[i, m], var_y[j, m]]
+            if order_ij != -1:
+                # eq. (8)
+                if para_a[i, j, m] > -self.inf_milp:
+                    model.Add(var_s[j] >= var_c[i] + int(para_a[i, j, m])).OnlyEnforceIf(
+                        before
+                    )
+                # eq. (10)
+                model.Add(var_s[j] >= var_s[i] + delta).OnlyEnforceIf(before)
+                # eq. (12)
+                model.Add(var_c[j] >= var_c[i] + delta).OnlyEnforceIf(before)
+            if order_ij != 1:
+                # eq. (9)
+                if para_a[j, i, m] > -self.inf_milp:
+                    model.Add(var_s[i] >= var_c[j] + int(para_a[j, i, m])).OnlyEnforceIf(
+                        after
+                    )
+                # eq. (11)
+                model.Add(var_s[i] >= var_s[j] + delta).OnlyEnforceIf(after)
+                # eq. (13)
+                model.Add(var_c[i] >= var_c[j] + delta).OnlyEnforceIf(after)
+            if order_ij != 0:
+                # eqs. (14) and (15) are implied by the lags
+                continue
+            # eq. (14)
+            overlap = [] if var_z[i, j, m] is None else [var_z[i, j, m].Not()]
+            model.Add(var_s[j] >= var_c[i]).OnlyEnforceIf(before + overlap)
+            # eq. (15)
+            overlap = [] if var_z[j, i, m] is None else [var_z[j, i, m].Not()]
+            model.Add(var_s[i] >= var_c[j]).OnlyEnforceIf(after + overlap)
+
+        # eq. (16)
+        for i, m in zip(*np.nonzero(self.eligible)):
+            expr = [
+                int(para_w[j, m]) * var_z[i, j, m]
+                for j in range(n_opt)
+                if var_z[i, j, m] is not None
+            ]
+            capacity = int(self.para_mach_capacity[m] - para_w[i, m])
+            if self.prune_overlaps and not expr and capacity >= 0:
+                continue
+            model.Add(sum(expr) <= capacity * var_y[i, m])
+
+        model.Minimize(var_c_max)
+
+        self.var_c_max = var_c_max
+        self.var_y = var_y
+        self.var_c = var_c
+        self.var_s = var_s
+        self.var_x = var_x
+        self.var_z = var_z
+        self._model = model
+        self.backend = "ortools"
+
+    def solve_ortools(self, callbacks=None):
+        """Solve the model of build_model_ortools with CP-SAT.
+
+        Parameters
+        ----------
+        callbacks : list[Callable[[Incumbent], bool | None]], optional
+            Called with every improving schedule, a callback returning True stops the search.
+
+        """
+        if self._model is None:
+            self.build_model_ortools()
+
+        solver = cp_model.CpSolver()
+        self._solver = solver
+        if self.num_workers is not None:
+            solver.parameters.num_search_workers = self.num_workers
+        presolve = watch_cp_sat_presolve(solver, self.verbose)
+        set_cp_sat_limits(solver, time_limit=self.time_limit, mip_gap=self.mip_gap)
+        if self.seed is not None:
+            solver.parameters.random_seed = self.seed
+
+        if self.warm_start is not None:
+            self.apply_warm_start_ortools()
+
+        progress = ProgressTrace()
+        self.progress = progress
+        solver.best_bound_callback = lambda bound: progress.append(best_bound=bound)
+        callback = IncumbentCallback(
+            solution_limit=self.solution_limit,
+            callbacks=callbacks,
+            variables=(self.var_y, self.var_s, self.var_c),
+            progress=progress,
+        )
+        start = PhaseTimer.now()
+        progress.start()
+        status = solver.Solve(self._model, callback)
+        add_solve_phases(self.timer, start, presolve.get("presolve_end"), PhaseTimer.now())
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            progress.append(
+                objective=solver.ObjectiveValue(),
+                best_bound=solver.BestObjectiveBound(),
+                conflicts=solver.NumConflicts(),
+                force=True,
+            )
+        extract_start = PhaseTimer.now()
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            print(f"the solution is : {solver.ObjectiveValue()}")
+            solution = self.get_solution()
+            solved_operations = []
+            operation_ids = list(self.operations.values())
+            for i, m in zip(*np.nonzero(solution["var_y"] == 1)):
+                solved_operations.append(
+                    SolvedOperation(
+                        id=operation_ids[i],
+                        assigned_to=self.machines[m],
+                        start_time=solution["var_s"][i],
+                        end_time=solution["var_c"][i],
+                    )
+                )
+
+            output = FjsOutput(
+                solved_operations=solved_operations,
+                makespan=solver.ObjectiveValue(),
+                status=solver.StatusName(status),
+                best_bound=solver.BestObjectiveBound(),
+                mip_gap=get_mip_gap(solver.ObjectiveValue(), solver.BestObjectiveBound()),
+            )
+            self.timer.add("extract", extract_start, PhaseTimer.now())
+            return output
+        else:
+            print("No solution found.")
+            return None
+
+    def iter_incumbents(self, backend="gurobi"):
+        """Solve the model and yield an Incumbent for every improving schedule.
+
+        Parameters
+        ----------
+        backend : str, optional
+            "gurobi" for solve_gurobi or "ortools" for solve_ortools, by default "gurobi".
+
+        Notes
+        -----
+        The FjsOutput of the solve method is the return value of the generator. Closing the
+        generator early stops the search.
+
+        """
+        if backend == "gurobi":
+            if self.model is None:
+                self.build_model_gurobi()
+            return iter_incumbents(self.solve_gurobi, stop=self.model.terminate)
+        if backend == "ortools":
+            if self._model is None:
+                self.build_model_ortools()
+            return iter_incumbents(
+                self.solve_ortools, stop=lambda: self._solver and self._solver.stop_search()
+            )
+        raise ValueError("backend must be either gurobi or ortools.")
+
+    def get_solution(self):
+        """Get the solution of the last solved model as dense arrays.
+
+        Returns
+        -------
+        dict[str, np.ndarray | float]
+            var_y, var_s, var_c, var_c_max, var_x and var_z with the same shapes as the dense
+            gurobi variables.
+
+        """
+        if self.backend == "gurobi":
+            return {
+                "var_y": self.var_y.X,
+                "var_s": self.var_s.X,
+                "var_c": self.var_c.X,
+                "var_c_max": self.var_c_max.X,
+                "var_x": self.get_solution_var_x(),
+                "var_z": self.get_solution_var_z(),
+            }
+
+        solver = self._solver
+
+        def values(variables):
+            return np.array(
+                [0 if var is None else solver.Value(var) for var in variables.flat],
+                dtype=float,
+            ).reshape(variables.shape)
+
+        return {
+            "var_y": values(self.var_y),
+            "var_s": values(self.var_s),
+            "var_c": values(self.var_c),
+            "var_c_max": float(solver.Value(self.var_c_max)),
+            "var_x": values(self.var_x),
+            "var_z": values(self.var_z),
+        }
+
     def get_params(self):
         """Get parameters for the model."""
         n_opt = len(self.operations)
@@ -0,0 +1,301 @@
+"""Constructive heuristics for the generalized flexible job shop scheduling problem."""
+
+import numpy as np
+
+
+def get_jobs(para_lmin, para_lmax, infinity):
+    """Group the operations into jobs using the lag graph.
+
+    Parameters
+    ----------
+    para_lmin: numpy.ndarray
+        minimum lag between the starting time of operation i and the ending time of operation j.
+        shape: (number of operations, number of operations).
+    para_lmax: numpy.ndarray
+        maximum lag between the starting time of operation i and the ending time of operation j.
+        shape: (number of operations, number of operations).
+    infinity: float
+        The value used to replace np.inf, lags at or beyond it are treated as missing.
+
+    Returns
+    -------
+    jobs: list[list[int]]
+        The operations of every weakly connected component of the lag graph, in topological
+        order of the lags (ties and cycles are broken by the operation index).
+
+    """
+    para_lmin = np.asarray(para_lmin, dtype=float)
+    para_lmax = np.asarray(para_lmax, dtype=float)
+    n_opt = para_lmin.shape[0]
+
+    lag = (para_lmin > -infinity) | (para_lmax < infinity)
+    np.fill_diagonal(lag, False)
+
+    # weakly connected components
+    component = np.full(n_opt, -1, dtype=int)
+    n_component = 0
+    for root in range(n_opt):
+        if component[root] >= 0:
+            continue
+        stack = [root]
+        component[root] = n_component
+        while stack:
+            i = stack.pop()
+            for j in np.flatnonzero((lag[i, :] | lag[:, i]) & (component < 0)):
+                component[j] = n_component
+                stack.append(j)
+        n_component += 1
+
+    jobs = []
+    for k in range(n_component):
+        members = np.flatnonzero(component == k)
+        in_degree = {i: int(lag[members, i].sum()) for i in members}
+        order = []
+        remaining = set(members.tolist())
+        while remaining:
+            ready = [i for i in remaining if in_degree[i] == 0]
+            # a cycle of lags, continue with the smallest remaining index
+            i = min(ready) if ready else min(remaining)
+            order.append(i)
+            remaining.remove(i)
+            for j in np.flatnonzero(lag[i, :]):
+                if j in remaining:
+                    in_degree[j] -= 1
+        jobs.append(order)
+
+    return jobs
+
+
+def _fits_on_machine(start, end, weight, op, placed, para_a_m, delta, capacity):
+    """Check if operation op in [start, end] is compatible with the operations placed on a machine.
+
+    The check covers eqs. (8)-(13)/(22)-(23) and the capacity in the stricter of the two
+    formulations: for every operation k, the weights of k and of all operations starting in
+    (s_k, c_k] must fit the capacity. This implies eq. (16) of the MILP and eq. (25) of the CP.
+    """
+    duration = end - start
+    anchors = [(start, end, weight)]
+    for s_k, c_k, w_k, k in placed:
+        # eqs. (8)/(9) and (22)
+        if not (start >= c_k + para_a_m[k, op] or s_k >= end + para_a_m[op, k]):
+            return False
+        # eqs. (10)-(13) and (23)
+        d_k = c_k - s_k
+        if not (
+            start >= s_k + max(0.0, d_k - duration) + delta
+            or s_k >= start + max(0.0, duration - d_k) + delta
+        ):
+            return False
+        anchors.append((s_k, c_k, w_k))
+
+    for s_a, c_a, w_a in anchors:
+        load = w_a
+        if s_a < start <= c_a:
+            load += weight
+        for s_k, c_k, w_k, _ in placed:
+            if s_a < s_k <= c_a:
+                load += w_k
+        if load > capacity:
+            return False
+    return True
+
+
+def _earliest_start(est, duration, weight, op, placed, para_a_m, delta, capacity):
+    """Get the earliest start not before est at which op fits on a machine."""
+    candidates = {est}
+    latest = est
+    for s_k, c_k, _, k in placed:
+        candidates.update(
+            [
+                c_k + 1,
+                c_k + delta,
+                c_k + para_a_m[k, op],
+                c_k + delta - duration,
+                s_k + delta,
+            ]
+        )
+        # placing op after every operation on the machine is always feasible
+        latest = max(latest, c_k + max(para_a_m[k, op], delta, 1))
+    for start in sorted(t for t in candidates if est <= t < latest):
+        if _fits_on_machine(
+            start, start + duration, weight, op, placed, para_a_m, delta, capacity
+        ):
+            return start
+    return latest
+
+
+def list_scheduling(
+    para_p,
+    para_a,
+    para_w,
+    para_delta,
+    para_mach_capacity,
+    para_lmin,
+    para_lmax,
+    infinity,
+    max_restarts=1000,
+    para_window=None,
+):
+    """Build a feasible schedule with a job-based list-scheduling heuristic.
+
+    Jobs (components of the lag graph) are scheduled one after another. Every operation of a
+    job is put on the machine where it completes first, at the earliest start that respects the
+    release time, minimum lags, setup times, input/output delays and machine capacity, among the
+    machines where it completes by its deadline. If a maximum lag cannot be met, the job is
+    removed again and restarted later by the amount of the violation.
+
+    Parameters
+    ----------
+    para_p: numpy.ndarray
+        processing time of operation i in machine m. shape: (number of operations, number of
+        machines).
+    para_a: numpy.ndarray
+        setup time of machine m when processing operation i before j. shape: (number of
+        operations, number of operations, number of machines).
+    para_w: numpy.ndarray
+        weight of operation i in machine m. shape: (number of operations, number of machines).
+    para_delta: numpy.ndarray
+        input/output delay time between two consecutive operations in machine m. shape:
+        (number of machines,).
+    para_mach_capacity: numpy.ndarray
+        capacity of machine m. shape: (number of machines,).
+    para_lmin: numpy.ndarray
+        minimum lag between the starting time of operation i and the ending time of operation j.
+        shape: (number of operations, number of operations).
+    para_lmax: numpy.ndarray
+        maximum lag between the starting time of operation i and the ending time of operation j.
+        shape: (number of operations, number of operations).
+    infinity: float
+        The value used to replace np.inf in the parameters.
+    max_restarts: int
+        Maximum number of restarts of a single job.
+    para_window: numpy.ndarray, optional
+        The time window (a_i, b_i) of operation i. shape: (number of operations, 2). Operation
+        i does not start before a_i and completes by b_i.
+
+    Returns
+    -------
+    var_y: numpy.ndarray
+        Assignment of operation i to machine m. shape: (number of operations, number of
+        machines).
+    var_s: numpy.ndarray
+        Starting time of operation i. shape: (number of operations,).
+    var_c: numpy.ndarray
+        Completion time of operation i. shape: (number of operations,).
+    makespan: float
+        The largest completion time.
+
+    Raises
+    ------
+    RuntimeError
+        If an operation cannot complete by its deadline or a job cannot be scheduled within
+        max_restarts. Restarting a job later does not help with a missed deadline.
+
+    Notes
+    -----
+    The schedule satisfies the constraints of both the MILP and the CP formulation, so its
+    makespan is a valid upper bound for both. Holding times are not used, every operation
+    completes right after its processing time.
+
+    """
+    para_p = np.asarray(para_p, dtype=float)
+    para_a = np.asarray(para_a, dtype=float)
+    para_w = np.asarray(para_w, dtype=float)
+    para_delta = np.asarray(para_delta, dtype=float)
+    para_mach_capacity = np.asarray(para_mach_capacity, dtype=float)
+    para_lmin = np.asarray(para_lmin, dtype=float)
+    para_lmax = np.asarray(para_lmax, dtype=float)
+    n_opt, n_mach = para_p.shape
+    release = np.zeros(n_opt)
+    deadline = np.full(n_opt, np.inf)
+    if para_window is not None:
+        para_window = np.asarray(para_window, dtype=float)
+        release = np.maximum(release, para_window[:, 0])
+        deadline = para_window[:, 1]
+
+    var_y = np.zeros((n_opt, n_mach), dtype=int)
+    var_s = np.zeros(n_opt)
+    var_c = np.zeros(n_opt)
+    scheduled = np.zeros(n_opt, dtype=bool)
+    # (start, completion, weight, operation) of the operations on every machine
+    placed = [[] for _ in range(n_mach)]
+
+    for job in get_jobs(para_lmin, para_lmax, infinity):
+        offset = 0.0
+        for _ in range(max_restarts):
+            violation = 0.0
+            for i in job:
+                done = np.flatnonzero(scheduled)
+                # eq. (6) from the scheduled operations
+                lmin = para_lmin[done, i]
+                est = max(
+                    [offset, release[i]] + (var_c[done] + lmin)[lmin > -infinity].tolist()
+                )
+
+                best = None
+                for m in np.flatnonzero(para_p[i, :] < infinity):
+                    start = _earliest_start(
+                        est,
+                        para_p[i, m],
+                        para_w[i, m],
+                        i,
+                        placed[m],
+                        para_a[:, :, m],
+                        para_delta[m],
+                        para_mach_capacity[m],
+                    )
+                    if start + para_p[i, m] > deadline[i]:
+                        continue
+                    if best is None or start + para_p[i, m] < best[1] + para_p[i, best[0]]:
+                        best = (m, start)
+                if best is None:
+                    raise RuntimeError(
+                        f"could not complete operation {i} by its deadline {deadline[i]}."
+                    )
+                m, start = best
+
+                var_y[i, m] = 1
+                var_s[i] = start
+                var_c[i] = start + para_p[i, m]
+                scheduled[i] = True
+                placed[m].append((var_s[i], var_c[i], para_w[i, m], i))
+
+                # eq. (7) from the scheduled operations
+                lmax = para_lmax[done, i]
+                lst = (var_c[done] + lmax)[lmax < infinity]
+                if len(lst) > 0 and start > lst.min():
+                    violation = start - lst.min()
+                    break
+
+            if violation == 0.0:
+                # lags between operations of the job that point backwards
+                members = np.asarray(job)
+                lag_s = var_s[members][None, :] - var_c[members][:, None]
+                sub_lmin = para_lmin[np.ix_(members, members)]
+                sub_lmax = para_lmax[np.ix_(members, members)]
+                np.fill_diagonal(sub_lmin, -np.inf)
+                np.fill_diagonal(sub_lmax, np.inf)
+                violation = max(
+                    0.0,
+                    np.max(sub_lmin - lag_s, initial=0.0),
+                    np.max(lag_s - sub_lmax, initial=0.0),
+                )
+                if violation == 0.0:
+                    break
+
+            # remove the job and restart it later
+            for i in job:
+                if scheduled[i]:
+                    m = int(np.argmax(var_y[i, :]))
+                    placed[m] = [entry for entry in placed[m] if entry[3] != i]
+                    var_y[i, :] = 0
+                    scheduled[i] = False
+            offset += max(violation, 1.0)
+        else:
+            raise RuntimeError(
+                f"could not schedule job {job} within {max_restarts} restarts."
+            )
+
+    makespan = float(var_c.max()) if n_opt > 0 else 0.0
+
+    return var_y, var_s, var_c, makespan
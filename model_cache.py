@@ -0,0 +1,305 @@
+"""Disk cache of built models, keyed by a fingerprint of the instance and the model options."""
+
+import hashlib
+import json
+import os
+
+import gurobipy as gp
+import numpy as np
+from ortools.sat.python import cp_model
+
+# bump when the stored layout changes, old entries then get new keys
+CACHE_VERSION = 2
+
+# the options that change the built model, solver parameters such as time_limit, num_workers
+# or the warm start are not part of the fingerprint
+FINGERPRINT_OPTIONS = {
+    "FJSS2": (
+        "inf_cp",
+        "horizon",
+        "sparse_lags",
+        "capacity_model",
+        "unit_capacity_model",
+        "lag_closure",
+        "time_windows",
+    ),
+    "FJSS4_v2": (
+        "inf_milp",
+        "horizon",
+        "matrix_variables",
+        "vectorized_constraints",
+        "sparse_pairs",
+        "sparse_lags",
+        "formulation",
+        "prune_overlaps",
+        "lag_closure",
+        "time_windows",
+        "shift_durations",
+        "operations_subset_indices",
+    ),
+}
+
+# the variables restored from a cache entry, var_u and yu_list only exist in the time-indexed
+# capacity model of FJSS2
+GUROBI_VARIABLES = ("var_y", "var_s", "var_c", "var_c_max", "var_x", "var_z")
+ORTOOLS_VARIABLES = {
+    "FJSS2": ("var_y", "var_s", "var_c", "var_c_max", "var_u", "yu_list"),
+    "FJSS4_v2": ("var_y", "var_s", "var_c", "var_c_max", "var_x", "var_z"),
+}
+
+
+def get_fingerprint(fjss, backend):
+    """Get the hex digest that identifies the model built by fjss with backend.
+
+    Parameters
+    ----------
+    fjss : FJSS2 | FJSS4_v2
+        The instance, before or after building the model.
+    backend : str
+        "gurobi" or "ortools".
+
+    Returns
+    -------
+    str
+        The SHA-256 digest over the parameter arrays (para_*, big_m), the model options of
+        FINGERPRINT_OPTIONS and the backend.
+
+    """
+    class_name = type(fjss).__name__
+    options = {name: getattr(fjss, name) for name in FINGERPRINT_OPTIONS[class_name]}
+    options.update(
+        version=CACHE_VERSION,
+        class_name=class_name,
+        backend=backend,
+        n_opt=len(fjss.operations),
+        n_mach=len(fjss.machines),
+        heuristic=getattr(fjss, "heuristic_solution", None) is not None,
+    )
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+    arrays = {
+        name: value
+        for name, value in sorted(vars(fjss).items())
+        if (name.startswith("para_") or name == "big_m") and value is not None
+    }
+    for name, value in arrays.items():
+        # normalize the object arrays of the MILP and the int arrays of the CP
+        value = np.ascontiguousarray(value, dtype=float)
+        digest.update(f"{name}{value.shape}".encode())
+        digest.update(value.tobytes())
+
+    return digest.hexdigest()
+
+
+def get_gurobi_offsets(variables):
+    """Get the (start, shape) of a gurobi Var or MVar in the variables of its model."""
+    if isinstance(variables, gp.Var):
+        return variables.index, ()
+    if variables.size == 0:
+        return -1, variables.shape
+    return variables.reshape(-1)[0].item().index, variables.shape
+
+
+def get_ortools_indices(variables):
+    """Get the proto indices of CP-SAT variables, -1 where an entry is None."""
+    if isinstance(variables, cp_model.IntVar):
+        return np.asarray(variables.Index())
+    variables = np.asarray(variables, dtype=object)
+    return np.array(
+        [-1 if var is None else var.Index() for var in variables.flat], dtype=int
+    ).reshape(variables.shape)
+
+
+class ModelCache:
+    """Store built gurobi and CP-SAT models on disk to solve them again without building.
+
+    Every entry is a model file (MPS for gurobi, the serialized binary CpModelProto for
+    CP-SAT) plus an npz with the positions of the variables in the model, named by the
+    fingerprint of the instance. The least recently used entries are removed once the
+    directory is larger than max_bytes.
+
+    The CpModelProto of ortools >= 9.12 (pybind11) only parses the text format, which takes
+    longer than building the CP-SAT model, so with those versions build_ortools builds the
+    model without the cache and only the gurobi models are cached.
+
+    Parameters
+    ----------
+    directory : str
+        The cache directory, created if it does not exist.
+    max_bytes : int
+        The size bound of all the entries, by default 2 GiB.
+
+    Examples
+    --------
+    >>> cache = ModelCache("model_cache")
+    >>> cache.build_gurobi(fjss4)  # builds the model and stores it
+    False
+    >>> cache.build_gurobi(fjss4_same_instance)  # reads the stored model
+    True
+
+    """
+
+    def __init__(self, directory="model_cache", max_bytes=2 * 1024**3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def get_paths(self, key, model_suffix):
+        """Get the paths of the model file and of the npz of the variables of an entry."""
+        return (
+            os.path.join(self.directory, f"{key}{model_suffix}"),
+            os.path.join(self.directory, f"{key}.npz"),
+        )
+
+    def build_gurobi(self, fjss4):
+        """Build the gurobi model of FJSS4_v2, reading it from the cache if possible.
+
+        Returns
+        -------
+        bool
+            True if the model was read from the cache.
+
+        """
+        key = get_fingerprint(fjss4, "gurobi")
+        model_path, index_path = self.get_paths(key, ".mps")
+        if os.path.exists(model_path) and os.path.exists(index_path):
+            self.load_gurobi(fjss4, model_path, index_path)
+            self.touch(model_path, index_path)
+            return True
+
+        fjss4.build_model_gurobi()
+        fjss4.model.update()
+        offsets = {
+            name: get_gurobi_offsets(getattr(fjss4, name)) for name in GUROBI_VARIABLES
+        }
+        arrays = {f"{name}_start": start for name, (start, _) in offsets.items()}
+        arrays.update({f"{name}_shape": shape for name, (_, shape) in offsets.items()})
+        if fjss4.x_index is not None:
+            arrays.update(x_index=fjss4.x_index, z_index=fjss4.z_index)
+        self.write_atomic(model_path, fjss4.model.write)
+        self.write_atomic(index_path, lambda path: np.savez(path, **arrays))
+        self.evict(keep=key)
+        return False
+
+    def load_gurobi(self, fjss4, model_path, index_path):
+        """Attach the gurobi model of a cache entry to fjss4."""
+        model = gp.read(model_path)
+        variables = model.getVars()
+        with np.load(index_path) as arrays:
+            for name in GUROBI_VARIABLES:
+                start = int(arrays[f"{name}_start"])
+                shape = tuple(arrays[f"{name}_shape"])
+                if shape == ():
+                    value = variables[start]
+                else:
+                    size = int(np.prod(shape))
+                    value = gp.MVar.fromlist(variables[start : start + size]).reshape(shape)
+                setattr(fjss4, name, value)
+            fjss4.x_index = arrays["x_index"] if "x_index" in arrays else None
+            fjss4.z_index = arrays["z_index"] if "z_index" in arrays else None
+        fjss4.model = model
+        fjss4.backend = "gurobi"
+
+    def build_ortools(self, fjss):
+        """Build the CP-SAT model of FJSS2 or FJSS4_v2, reading it from the cache if possible.
+
+        The interval variables of FJSS2 (intervals, no_overlap_intervals) are not restored.
+        Without a binary parser of the CpModelProto the model is always built, see ModelCache.
+
+        Returns
+        -------
+        bool
+            True if the model was read from the cache.
+
+        """
+        if not hasattr(cp_model.CpModel().Proto(), "ParseFromString"):
+            # no binary parser, reading the entry is slower than building the model
+            fjss.build_model_ortools()
+            return False
+
+        key = get_fingerprint(fjss, "ortools")
+        model_path, index_path = self.get_paths(key, ".pb")
+        names = ORTOOLS_VARIABLES[type(fjss).__name__]
+        if os.path.exists(model_path) and os.path.exists(index_path):
+            self.load_ortools(fjss, names, model_path, index_path)
+            self.touch(model_path, index_path)
+            return True
+
+        fjss.build_model_ortools()
+        arrays = {
+            name: get_ortools_indices(getattr(fjss, name))
+            for name in names
+            if getattr(fjss, name) is not None
+        }
+        if getattr(fjss, "num_t", None) is not None:
+            arrays["num_t"] = np.asarray(fjss.num_t)
+        # ExportToFile writes the binary proto, the text format only for a .txt suffix
+        self.write_atomic(model_path, fjss._model.ExportToFile)
+        self.write_atomic(index_path, lambda path: np.savez(path, **arrays))
+        self.evict(keep=key)
+        return False
+
+    def load_ortools(self, fjss, names, model_path, index_path):
+        """Attach the CP-SAT model of a cache entry to fjss."""
+        model = cp_model.CpModel()
+        with open(model_path, "rb") as f:
+            model.Proto().ParseFromString(f.read())
+
+        def get_var(index):
+            return None if index < 0 else model.GetIntVarFromProtoIndex(int(index))
+
+        with np.load(index_path) as arrays:
+            for name in names:
+                if name not in arrays:
+                    setattr(fjss, name, None)
+                elif arrays[name].ndim == 0:
+                    setattr(fjss, name, get_var(arrays[name]))
+                else:
+                    value = np.array([get_var(index) for index in arrays[name].flat], dtype=object)
+                    setattr(fjss, name, value.reshape(arrays[name].shape))
+            if "num_t" in arrays:
+                fjss.num_t = int(arrays["num_t"])
+        if hasattr(fjss, "var_c_max_var"):
+            fjss.var_c_max_var = fjss.var_c_max
+        if hasattr(fjss, "intervals"):
+            fjss.intervals = None
+            fjss.no_overlap_intervals = None
+        fjss._model = model
+        if hasattr(fjss, "backend"):
+            fjss.backend = "ortools"
+
+    @staticmethod
+    def write_atomic(path, write):
+        """Call write with a temporary path next to path and move the file into place."""
+        root, suffix = os.path.splitext(path)
+        tmp_path = f"{root}.{os.getpid()}.tmp{suffix}"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def touch(*paths):
+        """Mark the files of an entry as recently used."""
+        for path in paths:
+            os.utime(path)
+
+    def evict(self, keep=None):
+        """Remove the least recently used entries until the cache fits in max_bytes."""
+        entries = {}
+        for fname in os.listdir(self.directory):
+            path = os.path.join(self.directory, fname)
+            key = fname.split(".")[0]
+            stat = os.stat(path)
+            size, last_used = entries.get(key, (0, 0.0))
+            entries[key] = (size + stat.st_size, max(last_used, stat.st_mtime))
+
+        total = sum(size for size, _ in entries.values())
+        for key, (size, _) in sorted(entries.items(), key=lambda entry: entry[1][1]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for fname in os.listdir(self.directory):
+                if fname.split(".")[0] == key:
+                    os.remove(os.path.join(self.directory, fname))
+            total -= size
@@ -4,31 +4,50 @@ import time
 import numpy as np
 import pandas as pd
 
-from profiling_utils import run_single_cp
+from profiling_utils import run_cp_sweep, run_single_cp
 
 
-def multiple_cp_runs():
-    """Perform the CP on multiple data input for performance prifling."""
+def multiple_cp_runs(incremental=False):
+    """Perform the CP on multiple data input for performance prifling.
+
+    With incremental, one CP-SAT model with the cumulative capacity model is grown over the
+    sweep with run_cp_sweep instead of building a model per n_opt.
+    """
 
     # delete the file if it exists
     if os.path.exists("cp_results.csv"):
         os.remove("cp_results.csv")
 
     with open("cp_results.csv", "a", encoding="utf-8") as f:
-        f.write(
-            "method,n_opt,n_mach,running_time_seconds,num_constraints,num_variables,makespan,feasible_MILP,feasible_CP\n"
-        )
-
-        for n_opt_selected in np.arange(10, 94, 5):
-        # for n_opt_selected in np.arange(10, 17, 5):
-        # for n_opt_selected in [60]:
-            new_row = run_single_cp(
+        header_written = False
+
+        n_opt_list = np.arange(10, 94, 5)
+        # n_opt_list = np.arange(10, 17, 5)
+        # n_opt_list = [60]
+        if incremental:
+            rows = run_cp_sweep(
+                n_opt_list,
                 input_fname="gfjsp_10_5_1.txt",
                 infinity=1.0e7,
-                n_opt_selected=n_opt_selected,
                 num_workers=32,
                 verbose=False,
             )
+        else:
+            rows = (
+                run_single_cp(
+                    input_fname="gfjsp_10_5_1.txt",
+                    infinity=1.0e7,
+                    n_opt_selected=n_opt_selected,
+                    num_workers=32,
+                    verbose=False,
+                )
+                for n_opt_selected in n_opt_list
+            )
+        for new_row in rows:
+            # the columns are the keys of the first row
+            if not header_written:
+                f.write(",".join(new_row.keys()) + "\n")
+                header_written = True
             # contact all the values into a string with comma separated
             new_row = ",".join(map(str, new_row.values())) + "\n"
             f.write(new_row)
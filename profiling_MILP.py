@@ -3,10 +3,17 @@ import numpy as np
 import time
 import os
 
-from profiling_utils import run_single_milp
+from profiling_utils import run_milp_sweep, run_single_milp
 
 
-def multiple_milp_runs():
+def multiple_milp_runs(formulation="big_m", backend="gurobi", incremental=False):
+    """Solve the first 10, 15, ..., 90 operations and write one row per run.
+
+    With incremental, one gurobi model is grown over the sweep with run_milp_sweep instead of
+    building a model per n_opt.
+    """
+    if incremental and backend != "gurobi":
+        raise ValueError("incremental requires backend='gurobi'.")
     # write the new_row to the csv file
 
     # delete the file if it exists
@@ -14,20 +21,38 @@ def multiple_milp_runs():
         os.remove("milp_results_2024Jan29.csv")
 
     with open("milp_results_2024Jan29.csv", "a", encoding="utf-8") as f:
-        f.write(
-            "method,n_opt,n_mach,running_time_seconds,num_constraints,num_variables,makespan,feasible_MILP,feasible_CP\n"
-        )
-
-        for n_opt_selected in np.arange(10, 94, 5):
-        # for n_opt_selected in np.arange(10, 21, 5):
-        # for n_opt_selected in [25, 30]:
-            new_row = run_single_milp(
+        header_written = False
+
+        n_opt_list = np.arange(10, 94, 5)
+        # n_opt_list = np.arange(10, 21, 5)
+        # n_opt_list = [25, 30]
+        if incremental:
+            rows = run_milp_sweep(
+                n_opt_list,
                 input_fname="gfjsp_10_5_1.txt",
                 infinity=1.0e7,
-                n_opt_selected=n_opt_selected,
                 num_workers=None,
                 verbose=True,
+                formulation=formulation,
+            )
+        else:
+            rows = (
+                run_single_milp(
+                    input_fname="gfjsp_10_5_1.txt",
+                    infinity=1.0e7,
+                    n_opt_selected=n_opt_selected,
+                    num_workers=None,
+                    verbose=True,
+                    formulation=formulation,
+                    backend=backend,
+                )
+                for n_opt_selected in n_opt_list
             )
+        for new_row in rows:
+            # the columns are the keys of the first row
+            if not header_written:
+                f.write(",".join(new_row.keys()) + "\n")
+                header_written = True
             # contact all the values into a string with comma separated
             new_row = ",".join(map(str, new_row.values())) + "\n"
             f.write(new_row)
@@ -1,8 +1,12 @@
 """Profiling utilities for the MILP and CP."""
 
 import logging
+import os
+import tempfile
+import threading
 import time
 from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
 import itertools as it
 
 import numpy as np
@@ -18,7 +22,7 @@ from checking_constraints import (
 )
 from fjss import FJSS2, FJSS4_v2
 from utils import *  # get_m_value, parse_data
-from utils import parse_data
+from utils import PhaseTimer, get_para_window, parse_data
 
 
 def load_data(input_fname="gfjsp_10_5_1.txt"):
@@ -229,18 +233,264 @@ def check_fix_shape_of_para_a(para_p, para_a, intended_for="milp"):
     return para_a
 
 
+def get_gurobi_model_size(model):
+    """Get the non-zeros of the linear constraints and the variable types of a gurobi model.
+
+    proto_bytes is None, it is only measured for CP-SAT models.
+    """
+    return OrderedDict(
+        num_nonzeros=model.NumNZs,
+        num_binary_variables=model.NumBinVars,
+        num_integer_variables=model.NumIntVars - model.NumBinVars,
+        num_continuous_variables=model.NumVars - model.NumIntVars,
+        proto_bytes=None,
+    )
+
+
+def get_cp_model_size(model):
+    """Get the non-zeros, the variable types and the proto size of a CP-SAT model.
+
+    The non-zeros are the terms of the linear constraints, the literals of the boolean
+    constraints and the enforcement literals. Variables with the domain [0, 1] are binary,
+    CP-SAT has no continuous variables. proto_bytes is the size of the serialized
+    CpModelProto.
+    """
+    proto = model.Proto()
+    num_binary = sum(1 for var in proto.variables if list(var.domain) == [0, 1])
+    num_nonzeros = 0
+    for constraint in proto.constraints:
+        num_nonzeros += len(constraint.enforcement_literal)
+        if constraint.has_linear():
+            num_nonzeros += len(constraint.linear.vars)
+        elif constraint.has_bool_or():
+            num_nonzeros += len(constraint.bool_or.literals)
+        elif constraint.has_bool_and():
+            num_nonzeros += len(constraint.bool_and.literals)
+        elif constraint.has_at_most_one():
+            num_nonzeros += len(constraint.at_most_one.literals)
+        elif constraint.has_exactly_one():
+            num_nonzeros += len(constraint.exactly_one.literals)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.pb")
+        model.ExportToFile(path)
+        proto_bytes = os.path.getsize(path)
+
+    return OrderedDict(
+        num_nonzeros=num_nonzeros,
+        num_binary_variables=num_binary,
+        num_integer_variables=len(proto.variables) - num_binary,
+        num_continuous_variables=0,
+        proto_bytes=proto_bytes,
+    )
+
+
+def fill_milp_row(new_row, fjss4, output, infinity=1.0e7, backend="gurobi"):
+    """Add the model size, makespan, constraint checks and status of a solved FJSS4_v2.
+
+    The checks are timed as the check_milp and check_cp phases of fjss4.timer, whose columns
+    (times and peak memory) end the row.
+    """
+    operations = list(fjss4.operations.values())
+    machines = list(fjss4.machines.values())
+
+    print("checking if the solution satisfies the constraints of MILP")
+    if backend == "ortools":
+        proto = fjss4._model.Proto()
+        # get the number of constraints
+        new_row["num_constraints"] = len(proto.constraints)
+        # get the number of variables
+        new_row["num_variables"] = len(proto.variables)
+        new_row.update(get_cp_model_size(fjss4._model))
+        # makespan
+        makespan = fjss4._solver.ObjectiveValue()
+    else:
+        model = fjss4.model
+        # get the number of constraints, including the indicator constraints
+        new_row["num_constraints"] = model.NumConstrs + model.NumGenConstrs
+        # get the number of variables
+        new_row["num_variables"] = model.NumVars
+        new_row.update(get_gurobi_model_size(model))
+        # makespan
+        makespan = model.objVal
+    new_row["makespan"] = makespan
+
+    with fjss4.timer.phase("extract"):
+        solution = fjss4.get_solution()
+    var_x = solution["var_x"]
+    var_y = solution["var_y"]
+    var_z = solution["var_z"]
+    var_s = solution["var_s"]
+    var_c = solution["var_c"]
+    var_c_max = solution["var_c_max"]
+    big_m = fjss4.big_m
+
+    start = PhaseTimer.now()
+    para_a = check_fix_shape_of_para_a(
+        fjss4.para_p, fjss4.para_a, intended_for="milp"
+    )
+    violations = check_constraints_milp(
+        var_y=var_y,
+        var_s=var_s,
+        var_c=var_c,
+        var_c_max=var_c_max,
+        operations=operations,
+        machines=machines,
+        para_p=fjss4.para_p,
+        para_a=para_a,
+        para_w=fjss4.para_w,
+        para_h=fjss4.para_h,
+        para_delta=fjss4.para_delta,
+        para_mach_capacity=fjss4.para_mach_capacity,
+        para_lmin=fjss4.para_lmin,
+        para_lmax=fjss4.para_lmax,
+        big_m=big_m,
+        var_x=var_x,
+        var_z=var_z,
+        return_violations=True,
+    )
+    fjss4.timer.add("check_milp", start, PhaseTimer.now())
+    if len(violations) == 0:
+        print("the solution satisfies the constraints of MILP formulation.")
+        new_row["feasible_MILP"] = "yes"
+    else:
+        print("the solution does not satisfy the constraints of MILP formulation.")
+        print(violations.summary())
+        new_row["feasible_MILP"] = "no"
+
+    print("checking if the solution satisfies the constraints of CP")
+
+    start = PhaseTimer.now()
+    horizon_milp_testing = build_horizon_for_cp(
+        para_p=fjss4.para_p,
+        para_h=fjss4.para_h,
+        para_lmax=fjss4.para_lmax,
+        inf_cp=infinity,
+    )
+
+    violations = check_constraints_cp(
+        var_y=var_y,
+        var_s=var_s,
+        var_c=var_c,
+        var_c_max=var_c_max,
+        operations=operations,
+        machines=machines,
+        para_p=fjss4.para_p,
+        para_a=check_fix_shape_of_para_a(
+            fjss4.para_p, fjss4.para_a, intended_for="cp"
+        ),
+        para_w=fjss4.para_w,
+        para_h=fjss4.para_h,
+        para_delta=fjss4.para_delta,
+        para_mach_capacity=fjss4.para_mach_capacity,
+        para_lmin=fjss4.para_lmin,
+        para_lmax=fjss4.para_lmax,
+        num_t=None,
+        var_u=None,
+        horizion=horizon_milp_testing,
+        return_violations=True,
+    )
+    fjss4.timer.add("check_cp", start, PhaseTimer.now())
+    if len(violations) == 0:
+        print("the solution satisfies the constraints of CP formulation.")
+        new_row["feasible_CP"] = "yes"
+    else:
+        print("the solution does not satisfy the constraints of CP formulation.")
+        print(violations.summary())
+        new_row["feasible_CP"] = "no"
+
+    if new_row["feasible_MILP"] == "yes" and new_row["feasible_CP"] == "yes":
+        print("congragulations! Everything is good now.\n\n")
+
+    new_row["formulation"] = fjss4.formulation
+    new_row["backend"] = backend
+    new_row["status"] = output.status
+    new_row["best_bound"] = output.best_bound
+    new_row["mip_gap"] = output.mip_gap
+    new_row.update(fjss4.timer.to_row())
+
+    return new_row
+
+
+@contextmanager
+def save_progress(fjss, path, interval=5.0, **metadata):
+    """Write the ProgressTrace of fjss to path while its solver runs and once it returns.
+
+    Parameters
+    ----------
+    fjss : FJSS2 | FJSS4_v2
+        The instance whose solve method runs in the with block.
+    path : str | None
+        The npz file, nothing is written if None.
+    interval : float
+        The seconds between two writes during the solve, so that a run killed by a
+        timeout keeps the trace up to the last write.
+    **metadata
+        Written with the columns, see ProgressTrace.save.
+
+    """
+    if path is None:
+        yield
+        return
+    stop = threading.Event()
+
+    def flush():
+        while not stop.wait(interval):
+            if fjss.progress is not None:
+                fjss.progress.save(path, **metadata)
+
+    thread = threading.Thread(target=flush, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+        if fjss.progress is not None:
+            fjss.progress.save(path, **metadata)
+
+
 def run_single_milp(
     input_fname="gfjsp_10_5_1.txt",
     infinity=1.0e7,
     n_opt_selected=40,
     num_workers=16,
     verbose=False,
+    vectorized_constraints=False,
+    sparse_pairs=False,
+    sparse_lags=True,
+    heuristic_bounds=False,
+    pairwise_big_m=False,
+    formulation="big_m",
+    backend="gurobi",
+    prune_overlaps=False,
+    lag_closure=False,
+    time_windows=False,
+    warm_start=False,
+    time_limit=None,
+    mip_gap=None,
+    solution_limit=None,
+    model_cache=None,
+    seed=None,
+    trace_memory=False,
+    progress_path=None,
 ):
-    """Solove a single FJSS problem."""
+    """Solove a single FJSS problem.
+
+    formulation is "big_m" or "indicator" for eqs. (8)-(15) and backend is "gurobi" or
+    "ortools", both are recorded in the row. The row ends with the wall-clock and CPU time
+    and the peak RSS of every phase of PhaseTimer, with trace_memory also the peak of the
+    Python heap. running_time_seconds covers the phases from normalize to extract of the
+    solver. With progress_path, the ProgressTrace of the solver (objective and bound over
+    time) is written to that npz file, also if no schedule is found, and rewritten every few
+    seconds during the solve, see save_progress.
+    """
     new_row = OrderedDict()
     new_row["method"] = "MILP"
+    timer = PhaseTimer(trace_memory=trace_memory)
 
     print("loading and setting up data")
+    start = PhaseTimer.now()
     (
         n_opt,
         n_mach,
@@ -260,6 +510,8 @@ def run_single_milp(
         method="milp", n_opt_selected=n_opt_selected, input_fname=input_fname
     )
     para_a = check_fix_shape_of_para_a(para_p, para_a, intended_for="milp")
+    para_window = get_para_window(operation_data, n_opt)
+    timer.add("parse", start, PhaseTimer.now())
     new_row["n_opt"] = n_opt
     new_row["n_mach"] = n_mach
 
@@ -285,100 +537,187 @@ def run_single_milp(
         verbose=verbose,
         big_m=None,
         matrix_variables=True,
+        vectorized_constraints=vectorized_constraints,
+        sparse_pairs=sparse_pairs,
+        sparse_lags=sparse_lags,
+        heuristic_bounds=heuristic_bounds,
+        pairwise_big_m=pairwise_big_m,
+        formulation=formulation,
+        prune_overlaps=prune_overlaps,
+        lag_closure=lag_closure,
+        time_windows=time_windows,
+        para_window=para_window,
+        time_limit=time_limit,
+        mip_gap=mip_gap,
+        solution_limit=solution_limit,
+        seed=seed,
+        timer=timer,
     )
-    fjss4.build_model_gurobi()
-    fjss4.solve_gurobi()
+    if warm_start:
+        # start from the list-scheduling schedule
+        with timer.phase("warm_start"):
+            fjss4.set_warm_start()
+    # a ModelCache reads the model of an earlier run instead of building it again
+    if backend == "ortools":
+        with timer.phase("build"):
+            if model_cache is None:
+                fjss4.build_model_ortools()
+            else:
+                model_cache.build_ortools(fjss4)
+    else:
+        with timer.phase("build"):
+            if model_cache is None:
+                fjss4.build_model_gurobi()
+            else:
+                model_cache.build_gurobi(fjss4)
+    with save_progress(
+        fjss4, progress_path, method="MILP", n_opt=n_opt, formulation=formulation, backend=backend
+    ):
+        if backend == "ortools":
+            output = fjss4.solve_ortools()
+        else:
+            output = fjss4.solve_gurobi()
     end_time = time.time()
+    if output is None:
+        raise RuntimeError(f"no feasible schedule found for n_opt={n_opt}.")
     running_time_seconds = end_time - start_time
     new_row["running_time_seconds"] = running_time_seconds
 
+    return fill_milp_row(new_row, fjss4, output, infinity=infinity, backend=backend)
+
+
+def fill_cp_row(new_row, fjss2, output, infinity=1.0e7):
+    """Add the model size, makespan, constraint checks and status of a solved FJSS2.
+
+    The checks are timed as the check_milp and check_cp phases of fjss2.timer, whose columns
+    (times and peak memory) end the row.
+    """
+    operations = fjss2.operations
+    machines = fjss2.machines
+
     print("checking if the solution satisfies the constraints of MILP")
-    model = fjss4.model
+    solver = fjss2._solver
+    model = fjss2._model
+
     # get the number of constraints
-    new_row["num_constraints"] = model.NumConstrs
+    new_row["num_constraints"] = len(model.Proto().constraints)
     # get the number of variables
-    new_row["num_variables"] = model.NumVars
-    # makespan
-    makespan = model.objVal
-    new_row["makespan"] = makespan
+    new_row["num_variables"] = len(model.Proto().variables)
+    new_row.update(get_cp_model_size(model))
+    # the makespan
+    new_row["makespan"] = solver.ObjectiveValue()
 
-    var_x = fjss4.var_x.X
-    var_y = fjss4.var_y.X
-    var_z = fjss4.var_z.X
-    var_s = fjss4.var_s.X
-    var_c = fjss4.var_c.X
-    var_c_max = fjss4.var_c_max.X
-    big_m = fjss4.big_m
+    def get_values(var):
+        """Vectorize to get the values of the variables."""
+        return solver.Value(var)
 
-    try:
-        para_a = check_fix_shape_of_para_a(
-            fjss4.para_p, fjss4.para_a, intended_for="milp"
-        )
-        check_constraints_milp(
-            var_y=var_y,
-            var_s=var_s,
-            var_c=var_c,
-            var_c_max=var_c_max,
-            operations=operations,
-            machines=machines,
-            para_p=fjss4.para_p,
-            para_a=para_a,
-            para_w=fjss4.para_w,
-            para_h=fjss4.para_h,
-            para_delta=fjss4.para_delta,
-            para_mach_capacity=fjss4.para_mach_capacity,
-            para_lmin=fjss4.para_lmin,
-            para_lmax=fjss4.para_lmax,
-            big_m=big_m,
-            var_x=var_x,
-            var_z=var_z,
-        )
+    # get the number of constraints
+
+    v_get_values = np.vectorize(get_values)
+
+    start = PhaseTimer.now()
+    var_y = v_get_values(fjss2.var_y)
+    var_s = v_get_values(fjss2.var_s)
+    var_c = v_get_values(fjss2.var_c)
+    var_c_max = fjss2.var_c_max
+    if fjss2.var_u is not None:
+        var_u = v_get_values(fjss2.var_u)
+        yu_list = v_get_values(fjss2.yu_list)
+        num_t = v_get_values(fjss2.num_t)
+    else:
+        # the cumulative capacity model has no time-indexed variables, the checker infers
+        # var_u from eq. (24)
+        var_u = None
+        num_t = None
+
+    fjss2.timer.add("extract", start, PhaseTimer.now())
+
+    start = PhaseTimer.now()
+    # infer var_x
+    var_x = infer_var_x(var_s)
+    # infer var_z
+    var_z = infer_var_z(var_s=var_s, var_y=var_y, var_c=var_c)
+
+    print("checking if the solution satisfies the constraints of MILP")
+    para_a = check_fix_shape_of_para_a(fjss2.para_p, fjss2.para_a, intended_for="milp")
+    # para_a = np.einsum("mij->ijm", fjss2.para_a)
+
+    big_m = get_m_value_runzhong(
+        para_p=fjss2.para_p,
+        para_h=fjss2.para_h,
+        para_lmin=fjss2.para_lmin,
+        para_a=para_a,
+        infinity=infinity,
+    )
+    violations = check_constraints_milp(
+        var_y=var_y,
+        var_s=var_s,
+        var_c=var_c,
+        var_c_max=var_c_max,
+        operations=operations,
+        machines=machines,
+        para_p=fjss2.para_p,
+        para_a=para_a,
+        para_w=fjss2.para_w,
+        para_h=fjss2.para_h,
+        para_delta=fjss2.para_delta,
+        para_mach_capacity=fjss2.para_mach_capacity,
+        para_lmin=fjss2.para_lmin,
+        para_lmax=fjss2.para_lmax,
+        big_m=big_m,
+        var_x=var_x,
+        var_z=var_z,
+        return_violations=True,
+    )
+    fjss2.timer.add("check_milp", start, PhaseTimer.now())
+    if len(violations) == 0:
         print("the solution satisfies the constraints of MILP formulation.")
         new_row["feasible_MILP"] = "yes"
-    except:  # pylint: disable=bare-except
+    else:
         print("the solution does not satisfy the constraints of MILP formulation.")
+        print(violations.summary())
         new_row["feasible_MILP"] = "no"
 
     print("checking if the solution satisfies the constraints of CP")
-
-    horizon_milp_testing = build_horizon_for_cp(
-        para_p=fjss4.para_p,
-        para_h=fjss4.para_h,
-        para_lmax=fjss4.para_lmax,
-        inf_cp=infinity,
+    start = PhaseTimer.now()
+    para_a = check_fix_shape_of_para_a(fjss2.para_p, fjss2.para_a, intended_for="cp")
+    violations = check_constraints_cp(
+        var_y=var_y,
+        var_s=var_s,
+        var_c=var_c,
+        var_c_max=var_c_max,
+        operations=operations,
+        machines=machines,
+        para_p=fjss2.para_p,
+        para_a=para_a,
+        para_w=fjss2.para_w,
+        para_h=fjss2.para_h,
+        para_delta=fjss2.para_delta,
+        para_mach_capacity=fjss2.para_mach_capacity,
+        para_lmin=fjss2.para_lmin,
+        para_lmax=fjss2.para_lmax,
+        num_t=num_t,
+        var_u=var_u,
+        horizion=fjss2.horizon,
+        return_violations=True,
     )
-
-    try:
-        check_constraints_cp(
-            var_y=var_y,
-            var_s=var_s,
-            var_c=var_c,
-            var_c_max=var_c_max,
-            operations=operations,
-            machines=machines,
-            para_p=fjss4.para_p,
-            para_a=check_fix_shape_of_para_a(
-                fjss4.para_p, fjss4.para_a, intended_for="cp"
-            ),
-            para_w=fjss4.para_w,
-            para_h=fjss4.para_h,
-            para_delta=fjss4.para_delta,
-            para_mach_capacity=fjss4.para_mach_capacity,
-            para_lmin=fjss4.para_lmin,
-            para_lmax=fjss4.para_lmax,
-            num_t=None,
-            var_u=None,
-            horizion=horizon_milp_testing,
-        )
-        print("the solution satisfies the constraints of CP formulation.")
+    fjss2.timer.add("check_cp", start, PhaseTimer.now())
+    if len(violations) == 0:
         new_row["feasible_CP"] = "yes"
-    except:  # pylint: disable=bare-except
-        print("the solution does not satisfy the constraints of CP formulation.")
+        print("the solution satisfies the constraints of CP formulation.")
+    else:
         new_row["feasible_CP"] = "no"
+        print("the solution does not satisfy the constraints of CP formulation.")
+        print(violations.summary())
 
     if new_row["feasible_MILP"] == "yes" and new_row["feasible_CP"] == "yes":
         print("congragulations! Everything is good now.\n\n")
 
+    new_row["status"] = output.status
+    new_row["best_bound"] = output.best_bound
+    new_row["mip_gap"] = output.mip_gap
+    new_row.update(fjss2.timer.to_row())
+
     return new_row
 
 
@@ -388,13 +727,33 @@ def run_single_cp(
     n_opt_selected=40,
     num_workers=16,
     verbose=False,
+    sparse_lags=True,
+    capacity_model="time_indexed",
+    unit_capacity_model="reified",
+    heuristic_bounds=False,
+    lag_closure=False,
+    time_windows=False,
+    warm_start=False,
+    time_limit=None,
+    mip_gap=None,
+    solution_limit=None,
+    model_cache=None,
+    seed=None,
+    trace_memory=False,
+    progress_path=None,
 ):
-    """Run a single CP problem."""
+    """Run a single CP problem.
+
+    The row ends with the wall-clock and CPU time and the peak memory of every phase of
+    PhaseTimer and progress_path gets the ProgressTrace of CP-SAT as in run_single_milp.
+    """
 
     new_row = OrderedDict()
     new_row["method"] = "CP"
+    timer = PhaseTimer(trace_memory=trace_memory)
 
     print("loading and setting up data")
+    start = PhaseTimer.now()
     (
         n_opt,
         n_mach,
@@ -414,6 +773,8 @@ def run_single_cp(
         method="cp", n_opt_selected=n_opt_selected, input_fname=input_fname
     )
     para_a = check_fix_shape_of_para_a(para_p, para_a, intended_for="cp")
+    para_window = get_para_window(operation_data, n_opt)
+    timer.add("parse", start, PhaseTimer.now())
     new_row["n_opt"] = n_opt
     new_row["n_mach"] = n_mach
 
@@ -436,114 +797,288 @@ def run_single_cp(
         inf_cp=infinity,
         num_workers=num_workers,
         verbose=verbose,
+        sparse_lags=sparse_lags,
+        capacity_model=capacity_model,
+        unit_capacity_model=unit_capacity_model,
+        heuristic_bounds=heuristic_bounds,
+        lag_closure=lag_closure,
+        time_windows=time_windows,
+        para_window=para_window,
+        time_limit=time_limit,
+        mip_gap=mip_gap,
+        solution_limit=solution_limit,
+        seed=seed,
+        timer=timer,
     )
-    fjss2.build_model_ortools()
+    if warm_start:
+        # start from the list-scheduling schedule
+        with timer.phase("warm_start"):
+            fjss2.set_warm_start()
+    with timer.phase("build"):
+        if model_cache is None:
+            fjss2.build_model_ortools()
+        else:
+            model_cache.build_ortools(fjss2)
     # print("big_m from fjss3", fjss3.big_m)
-    fjss2.solve_ortools()
+    with save_progress(
+        fjss2, progress_path, method="CP", n_opt=n_opt, capacity_model=capacity_model
+    ):
+        output = fjss2.solve_ortools()
     running_time_seconds = time.time() - start_time
+    if output is None:
+        raise RuntimeError(f"no feasible schedule found for n_opt={n_opt}.")
     new_row["running_time_seconds"] = running_time_seconds
 
-    print("checking if the solution satisfies the constraints of MILP")
-    solver = fjss2._solver
-    model = fjss2._model
-
-    # get the number of constraints
-    new_row["num_constraints"] = len(model.Proto().constraints)
-    # get the number of variables
-    new_row["num_variables"] = len(model.Proto().variables)
-    # the makespan
-    new_row["makespan"] = solver.ObjectiveValue()
-
-    def get_values(var):
-        """Vectorize to get the values of the variables."""
-        return solver.Value(var)
+    return fill_cp_row(new_row, fjss2, output, infinity=infinity)
 
-    # get the number of constraints
-
-    v_get_values = np.vectorize(get_values)
-
-    var_y = v_get_values(fjss2.var_y)
-    var_s = v_get_values(fjss2.var_s)
-    var_c = v_get_values(fjss2.var_c)
-    var_u = v_get_values(fjss2.var_u)
-    yu_list = v_get_values(fjss2.yu_list)
-    var_c_max = fjss2.var_c_max
-    num_t = v_get_values(fjss2.num_t)
 
-    # infer var_x
-    var_x = infer_var_x(var_s)
-    # infer var_z
-    var_z = infer_var_z(var_s=var_s, var_y=var_y, var_c=var_c)
-
-    print("checking if the solution satisfies the constraints of MILP")
-    para_a = check_fix_shape_of_para_a(fjss2.para_p, fjss2.para_a, intended_for="milp")
-    # para_a = np.einsum("mij->ijm", fjss2.para_a)
-
-    big_m = get_m_value_runzhong(
-        para_p=fjss2.para_p,
-        para_h=fjss2.para_h,
-        para_lmin=fjss2.para_lmin,
-        para_a=para_a,
-        infinity=infinity,
-    )
-    try:
-        check_constraints_milp(
-            var_y=var_y,
-            var_s=var_s,
-            var_c=var_c,
-            var_c_max=var_c_max,
-            operations=operations,
-            machines=machines,
-            para_p=fjss2.para_p,
+def run_milp_sweep(
+    n_opt_list,
+    input_fname="gfjsp_10_5_1.txt",
+    infinity=1.0e7,
+    num_workers=16,
+    verbose=False,
+    vectorized_constraints=False,
+    sparse_pairs=False,
+    sparse_lags=True,
+    formulation="big_m",
+    prune_overlaps=False,
+    time_limit=None,
+    mip_gap=None,
+    solution_limit=None,
+    trace_memory=False,
+):
+    """Solve the first n_opt operations for every n_opt in n_opt_list with one gurobi model.
+
+    The model of the smallest n_opt is built once and every further step adds its operations
+    with FJSS4_v2.add_operations, starting from the schedule of the previous step. The big_m
+    of the largest instance is used throughout, so it is valid for every step.
+
+    Yields
+    ------
+    OrderedDict
+        The row of every step with the columns of run_single_milp, running_time_seconds
+        covers adding the operations and solving. The parse and bounds phases of the whole
+        sweep are in the row of the first step.
+
+    """
+    n_opt_list = sorted(int(n_opt) for n_opt in n_opt_list)
+    timer = PhaseTimer(trace_memory=trace_memory)
+    start = PhaseTimer.now()
+    (
+        _,
+        n_mach,
+        operations,
+        machines,
+        operation_data,
+        _,
+        para_lmin,
+        para_lmax,
+        para_p,
+        para_h,
+        para_w,
+        para_delta,
+        para_a,
+        para_mach_capacity,
+    ) = prepare_input(method="milp", n_opt_selected=n_opt_list[-1], input_fname=input_fname)
+    para_a = check_fix_shape_of_para_a(para_p, para_a, intended_for="milp")
+    para_window = get_para_window(operation_data, n_opt_list[-1])
+    timer.add("parse", start, PhaseTimer.now())
+    with timer.phase("bounds"):
+        big_m = get_m_value_runzhong(
+            para_p=para_p,
+            para_h=para_h,
+            para_lmin=para_lmin,
             para_a=para_a,
-            para_w=fjss2.para_w,
-            para_h=fjss2.para_h,
-            para_delta=fjss2.para_delta,
-            para_mach_capacity=fjss2.para_mach_capacity,
-            para_lmin=fjss2.para_lmin,
-            para_lmax=fjss2.para_lmax,
-            big_m=big_m,
-            var_x=var_x,
-            var_z=var_z,
+            infinity=infinity,
         )
-        print("the solution satisfies the constraints of MILP formulation.")
-        new_row["feasible_MILP"] = "yes"
-    except:  # pylint: disable=bare-except
-        print("the solution does not satisfy the constraints of MILP formulation.")
-        new_row["feasible_MILP"] = "no"
 
-    print("checking if the solution satisfies the constraints of CP")
-    para_a = check_fix_shape_of_para_a(fjss2.para_p, fjss2.para_a, intended_for="cp")
-    try:
-        check_constraints_cp(
-            var_y=var_y,
-            var_s=var_s,
-            var_c=var_c,
-            var_c_max=var_c_max,
-            operations=operations,
-            machines=machines,
-            para_p=fjss2.para_p,
-            para_a=fjss2.para_a,
-            para_w=fjss2.para_w,
-            para_h=fjss2.para_h,
-            para_delta=fjss2.para_delta,
-            para_mach_capacity=fjss2.para_mach_capacity,
-            para_lmin=fjss2.para_lmin,
-            para_lmax=fjss2.para_lmax,
-            num_t=num_t,
-            var_u=var_u,
-            horizion=fjss2.horizon,
+    fjss4 = None
+    output = None
+    for n_opt in n_opt_list:
+        new_row = OrderedDict()
+        new_row["method"] = "MILP"
+        new_row["n_opt"] = n_opt
+        new_row["n_mach"] = n_mach
+        # copies, FJSS4_v2 replaces np.inf in place
+        para = dict(
+            para_p=para_p[:n_opt].copy(),
+            para_a=para_a[:n_opt, :n_opt].copy(),
+            para_w=para_w[:n_opt].copy(),
+            para_h=para_h[:n_opt].copy(),
+            para_lmin=para_lmin[:n_opt, :n_opt].copy(),
+            para_lmax=para_lmax[:n_opt, :n_opt].copy(),
         )
-        new_row["feasible_CP"] = "yes"
-        print("the solution satisfies the constraints of CP formulation.")
-    except:  # pylint: disable=bare-except
-        new_row["feasible_CP"] = "no"
-        print("the solution does not satisfy the constraints of CP formulation.")
 
-    if new_row["feasible_MILP"] == "yes" and new_row["feasible_CP"] == "yes":
-        print("congragulations! Everything is good now.\n\n")
+        print(f"solve the MILP problem with FJSS4_v2 for n_opt={n_opt}")
+        start_time = time.time()
+        if fjss4 is None:
+            fjss4 = FJSS4_v2(
+                operations=operations[:n_opt],
+                machines=machines,
+                para_delta=para_delta,
+                para_mach_capacity=para_mach_capacity,
+                precedence=None,
+                model_string=None,
+                inf_milp=infinity,
+                num_workers=num_workers,
+                verbose=verbose,
+                big_m=big_m,
+                matrix_variables=True,
+                vectorized_constraints=vectorized_constraints,
+                sparse_pairs=sparse_pairs,
+                sparse_lags=sparse_lags,
+                formulation=formulation,
+                prune_overlaps=prune_overlaps,
+                para_window=para_window[:n_opt],
+                time_limit=time_limit,
+                mip_gap=mip_gap,
+                solution_limit=solution_limit,
+                timer=timer,
+                **para,
+            )
+            with timer.phase("build"):
+                fjss4.build_model_gurobi()
+        else:
+            # every step has its own phase times
+            fjss4.timer = timer = PhaseTimer(trace_memory=trace_memory)
+            # the schedule of the previous step is the warm start of its operations
+            with timer.phase("warm_start"):
+                var_y, var_s, var_c = output.to_arrays(fjss4.operations, machines)
+            with timer.phase("build"):
+                fjss4.add_operations(
+                    operations=operations[:n_opt], para_window=para_window[:n_opt], **para
+                )
+            with timer.phase("warm_start"):
+                fjss4.set_warm_start(var_y=var_y, var_s=var_s, var_c=var_c)
+        output = fjss4.solve_gurobi()
+        running_time_seconds = time.time() - start_time
+        if output is None:
+            raise RuntimeError(f"no feasible schedule found for n_opt={n_opt}.")
+        new_row["running_time_seconds"] = running_time_seconds
+
+        yield fill_milp_row(new_row, fjss4, output, infinity=infinity)
+
+
+def run_cp_sweep(
+    n_opt_list,
+    input_fname="gfjsp_10_5_1.txt",
+    infinity=1.0e7,
+    num_workers=16,
+    verbose=False,
+    sparse_lags=True,
+    unit_capacity_model="reified",
+    time_limit=None,
+    mip_gap=None,
+    solution_limit=None,
+    trace_memory=False,
+):
+    """Solve the first n_opt operations for every n_opt in n_opt_list with one CP-SAT model.
+
+    The model of the smallest n_opt is built once with the cumulative capacity model and every
+    further step adds its operations with FJSS2.add_operations, hinted with the schedule of
+    the previous step. The horizon of the largest instance is used throughout.
+
+    Yields
+    ------
+    OrderedDict
+        The row of every step with the columns of run_single_cp, running_time_seconds covers
+        adding the operations and solving. The parse and bounds phases of the whole sweep are
+        in the row of the first step.
+
+    """
+    n_opt_list = sorted(int(n_opt) for n_opt in n_opt_list)
+    timer = PhaseTimer(trace_memory=trace_memory)
+    start = PhaseTimer.now()
+    (
+        _,
+        n_mach,
+        operations,
+        machines,
+        operation_data,
+        _,
+        para_lmin,
+        para_lmax,
+        para_p,
+        para_h,
+        para_w,
+        para_delta,
+        para_a,
+        para_mach_capacity,
+    ) = prepare_input(method="cp", n_opt_selected=n_opt_list[-1], input_fname=input_fname)
+    para_a = check_fix_shape_of_para_a(para_p, para_a, intended_for="cp")
+    para_window = get_para_window(operation_data, n_opt_list[-1])
+    timer.add("parse", start, PhaseTimer.now())
+    with timer.phase("bounds"):
+        horizon = build_horizon_for_cp(
+            para_p=np.where(para_p == np.inf, infinity, para_p),
+            para_h=para_h,
+            para_lmax=np.where(para_lmax == np.inf, infinity, para_lmax),
+            inf_cp=infinity,
+        )
 
-    return new_row
+    fjss2 = None
+    output = None
+    for n_opt in n_opt_list:
+        new_row = OrderedDict()
+        new_row["method"] = "CP"
+        new_row["n_opt"] = n_opt
+        new_row["n_mach"] = n_mach
+        # copies, FJSS2 replaces np.inf in place
+        para = dict(
+            para_p=para_p[:n_opt].copy(),
+            para_a=para_a[:, :n_opt, :n_opt].copy(),
+            para_w=para_w[:n_opt].copy(),
+            para_h=para_h[:n_opt].copy(),
+            para_lmin=para_lmin[:n_opt, :n_opt].copy(),
+            para_lmax=para_lmax[:n_opt, :n_opt].copy(),
+        )
+
+        print(f"solving the CP problem with FJSS2 for n_opt={n_opt}")
+        start_time = time.time()
+        if fjss2 is None:
+            fjss2 = FJSS2(
+                operations=operations[:n_opt],
+                machines=machines,
+                para_delta=para_delta.copy(),
+                para_mach_capacity=para_mach_capacity,
+                precedence=None,
+                model_string=None,
+                inf_cp=infinity,
+                num_workers=num_workers,
+                verbose=verbose,
+                sparse_lags=sparse_lags,
+                capacity_model="cumulative",
+                unit_capacity_model=unit_capacity_model,
+                para_window=para_window[:n_opt],
+                horizon=horizon,
+                time_limit=time_limit,
+                mip_gap=mip_gap,
+                solution_limit=solution_limit,
+                timer=timer,
+                **para,
+            )
+            with timer.phase("build"):
+                fjss2.build_model_ortools()
+        else:
+            # every step has its own phase times
+            fjss2.timer = timer = PhaseTimer(trace_memory=trace_memory)
+            # the schedule of the previous step hints its operations
+            with timer.phase("warm_start"):
+                var_y, var_s, var_c = output.to_arrays(fjss2.operations, machines)
+            with timer.phase("build"):
+                fjss2.add_operations(
+                    operations=operations[:n_opt], para_window=para_window[:n_opt], **para
+                )
+            with timer.phase("warm_start"):
+                fjss2.set_warm_start(var_y=var_y, var_s=var_s, var_c=var_c)
+        output = fjss2.solve_ortools()
+        running_time_seconds = time.time() - start_time
+        if output is None:
+            raise RuntimeError(f"no feasible schedule found for n_opt={n_opt}.")
+        new_row["running_time_seconds"] = running_time_seconds
+
+        yield fill_cp_row(new_row, fjss2, output, infinity=infinity)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,9 @@
 import json
+import resource
+import time
+import tracemalloc
 from collections import OrderedDict
+from contextlib import contextmanager
 
 import requests
 import numpy as np
@@ -38,45 +42,66 @@ def json_load(fn: FilePath):
     return o
 
 
-def get_m_value_runzhong(para_p, para_h, para_lmin, para_a, infinity):
-    """Implementation after discussion with Runzhong."""
-    n_opt, n_mach = para_h.shape
+def get_m_value_runzhong(
+    para_p, para_h, para_lmin, para_a, infinity, return_terms=False
+):
+    """Implementation after discussion with Runzhong.
+
+    Parameters
+    ----------
+    para_p: numpy.ndarray
+        processing time of operation i in machine m, where infinity marks the machines that
+        cannot process operation i. shape: (number of operations, number of machines).
+    para_h: numpy.ndarray
+        holding time of operation i in machine m. shape: (number of operations, number of
+        machines).
+    para_lmin: numpy.ndarray
+        minimum lag between the starting time of operation i and the ending time of operation j.
+        shape: (number of operations, number of operations).
+    para_a: numpy.ndarray
+        setup time of machine m when processing operation i before j. shape: (number of
+        operations, number of operations, number of machines).
+    infinity: float
+        The value used to replace np.inf in the parameters.
+    return_terms: bool
+        Also return the per-operation terms of eqs. (17)-(19).
+
+    Returns
+    -------
+    big_m: float
+        The big-M of eq. (20).
+    p_i: numpy.ndarray
+        Longest processing plus holding time of operation i over its machines, eq. (17). Only
+        returned if return_terms is True. shape: (number of operations,).
+    l_i: numpy.ndarray
+        Largest non-negative minimum lag from operation i, 0 if there is none, eq. (18). Only
+        returned if return_terms is True. shape: (number of operations,).
+    a_i: numpy.ndarray
+        Largest setup time after operation i on its machines, 0 if there is none, eq. (19). Only
+        returned if return_terms is True. shape: (number of operations,).
+
+    """
+    para_p = np.asarray(para_p, dtype=float)
+    para_h = np.asarray(para_h, dtype=float)
+    para_lmin = np.asarray(para_lmin, dtype=float)
+    para_a = np.asarray(para_a, dtype=float)
+    eligible = para_p < infinity
 
     # eq. (17)
-    p_i = []
-    for i in range(n_opt):
-        p_i_max = []
-        for m in range(n_mach):
-            if para_p[i, m] < infinity:
-                p_i_max.append(para_p[i, m] + para_h[i, m])
-        p_i.append(max(p_i_max))
+    p_i = np.max(para_p + para_h, axis=1, where=eligible, initial=0.0)
 
     # eq. (18)
-    l_i = []
-    for i in range(n_opt):
-        l_i_max = []
-        for j in range(n_opt):
-            if para_lmin[i, j] >= 0:
-                l_i_max.append(para_lmin[i, j])
-        # print(f"l_i_max={l_i_max}")
-        if len(l_i_max) == 0:
-            l_i_max.append(0)
-        else:
-            l_i.append(max(l_i_max))
+    l_i = np.max(para_lmin, axis=1, where=para_lmin >= 0, initial=0.0)
 
     # eq. (19)
-    a_i = []
-    for i in range(n_opt):
-        a_i_max = []
-        for j in range(n_opt):
-            for m in range(n_mach):
-                if para_p[i, m] < infinity:
-                    a_i_max.append(para_a[i, j, m])
-        a_i.append(max(a_i_max))
+    a_i = np.max(para_a, axis=1, where=eligible[:, None, :], initial=0.0)
+    a_i = np.max(a_i, axis=1)
 
     # eq. (20)
-    l_a_max = [max(l_element, a_element) for l_element, a_element in zip(l_i, a_i)]
-    big_m = sum(p_i + l_a_max)
+    big_m = float(np.sum(p_i) + np.sum(np.maximum(l_i, a_i)))
+
+    if return_terms:
+        return big_m, p_i, l_i, a_i
     return big_m
 
 
@@ -113,6 +138,207 @@ def get_m_value_runzhong(para_p, para_h, para_lmin, para_a, infinity):
 #     return big_m
 
 
+def get_lag_graph(para_lmin, para_lmax, infinity):
+    """Get the sparse lag graph of eqs. (6) and (7).
+
+    Parameters
+    ----------
+    para_lmin: numpy.ndarray
+        minimum lag between the starting time of operation i and the ending time of operation j,
+        where missing lags are -infinity. shape: (number of operations, number of operations).
+    para_lmax: numpy.ndarray
+        maximum lag between the starting time of operation i and the ending time of operation j,
+        where missing lags are +infinity. shape: (number of operations, number of operations).
+    infinity: float
+        The value used to replace np.inf in the model, values at or beyond it are treated as
+        missing lags.
+
+    Returns
+    -------
+    lmin_pairs: numpy.ndarray
+        (i, j) pairs with i != j and a finite minimum lag. shape: (number of lags, 2).
+    lmax_pairs: numpy.ndarray
+        (i, j) pairs with i != j and a finite maximum lag. shape: (number of lags, 2).
+
+    Notes
+    -----
+    Eq. (6) with lmin = -infinity and eq. (7) with lmax = +infinity are trivially slack, so only
+    the returned pairs need to become constraints.
+
+    """
+    para_lmin = np.asarray(para_lmin, dtype=float)
+    para_lmax = np.asarray(para_lmax, dtype=float)
+    off_diagonal = ~np.eye(para_lmin.shape[0], dtype=bool)
+
+    lmin_pairs = np.argwhere((para_lmin > -infinity) & off_diagonal)
+    lmax_pairs = np.argwhere((para_lmax < infinity) & off_diagonal)
+
+    return lmin_pairs, lmax_pairs
+
+
+def get_lag_closure(para_lmin, para_p, infinity):
+    """Get the longest paths of the minimum lag graph and the precedences they imply.
+
+    Eq. (6) gives s_j >= c_i + lmin_ij and every operation takes at least its shortest
+    processing time, c_j >= s_j + min_m p_jm. Chaining both along a path i -> j -> k gives
+    s_k >= c_i + lmin_ij + min_m p_jm + lmin_jk, so the longest path from i to k is a valid
+    lower bound of s_k - c_i.
+
+    Parameters
+    ----------
+    para_lmin: numpy.ndarray
+        minimum lag between the starting time of operation i and the ending time of operation j,
+        where missing lags are -infinity. shape: (number of operations, number of operations).
+    para_p: numpy.ndarray
+        processing time of operation i in machine m, where infinity marks the machines that
+        cannot process operation i. shape: (number of operations, number of machines).
+    infinity: float
+        The value used to replace np.inf in the parameters.
+
+    Returns
+    -------
+    longest: numpy.ndarray
+        The longest path from i to j, -np.inf if there is no path. shape: (number of
+        operations, number of operations).
+    precedes: numpy.ndarray
+        precedes[i, j] is True if operation j cannot start before operation i is completed,
+        i.e. i is processed before j on any machine they share. shape: (number of operations,
+        number of operations).
+
+    Raises
+    ------
+    ValueError
+        If the minimum lags contain a cycle that no schedule can satisfy.
+
+    """
+    para_lmin = np.asarray(para_lmin, dtype=float)
+    para_p = np.asarray(para_p, dtype=float)
+    n_opt = para_lmin.shape[0]
+    p_min = np.min(para_p, axis=1, where=para_p < infinity, initial=infinity)
+
+    longest = np.where(para_lmin > -infinity, para_lmin, -np.inf)
+    np.fill_diagonal(longest, -np.inf)
+    # Floyd-Warshall for the longest paths, operation k is the intermediate node
+    for k in range(n_opt):
+        longest = np.maximum(longest, longest[:, k, None] + p_min[k] + longest[None, k, :])
+
+    # s_i >= c_i + longest[i, i] >= s_i + p_min[i] + longest[i, i]
+    if np.any(np.diag(longest) + p_min > 0):
+        raise ValueError("the minimum lags contain a cycle that cannot be satisfied.")
+
+    # s_j >= c_i + longest[i, j] > s_i
+    precedes = (longest >= 0) & (longest + p_min[:, None] > 0)
+    np.fill_diagonal(precedes, False)
+
+    return longest, precedes
+
+
+def get_time_windows(
+    para_p, para_h, para_lmin, para_lmax, horizon, infinity, para_window=None
+):
+    """Get the bounds of the starting and completion times from the windows and the lags.
+
+    The bounds start from the time windows, s_i >= a_i and c_i <= b_i, and from the horizon,
+    and are propagated to a fixpoint through
+
+    - c_i >= s_i + min_m p_im and c_i <= s_i + max_m (p_im + h_im), eqs. (3) and (4)
+    - s_j >= c_i + lmin_ij, eq. (6)
+    - s_j <= c_i + lmax_ij, eq. (7)
+
+    in both directions, i.e. this is Bellman-Ford on the network of the difference
+    constraints.
+
+    Parameters
+    ----------
+    para_p: numpy.ndarray
+        processing time of operation i in machine m, where infinity marks the machines that
+        cannot process operation i. shape: (number of operations, number of machines).
+    para_h: numpy.ndarray
+        maximum holding time of operation i in machine m. shape: (number of operations, number
+        of machines).
+    para_lmin: numpy.ndarray
+        minimum lag between the starting time of operation i and the ending time of operation j,
+        where missing lags are -infinity. shape: (number of operations, number of operations).
+    para_lmax: numpy.ndarray
+        maximum lag between the starting time of operation i and the ending time of operation j,
+        where missing lags are +infinity. shape: (number of operations, number of operations).
+    horizon: float
+        The latest completion time of all the operations, np.inf if there is none.
+    infinity: float
+        The value used to replace np.inf in the parameters.
+    para_window: numpy.ndarray, optional
+        The time window (a_i, b_i) of operation i: it starts at or after a_i and completes at or
+        before b_i. shape: (number of operations, 2). Default is (0, horizon).
+
+    Returns
+    -------
+    s_lb, s_ub, c_lb, c_ub: numpy.ndarray
+        The earliest and latest starting and completion times, with np.inf for the unbounded
+        ones. shape: (number of operations,).
+
+    Raises
+    ------
+    ValueError
+        If the windows and the lags cannot be satisfied together.
+
+    """
+    para_p = np.asarray(para_p, dtype=float)
+    para_h = np.asarray(para_h, dtype=float)
+    para_lmin = np.asarray(para_lmin, dtype=float)
+    para_lmax = np.asarray(para_lmax, dtype=float)
+    n_opt = para_p.shape[0]
+    eligible = para_p < infinity
+
+    # shortest and longest duration c_i - s_i
+    d_min = np.min(para_p, axis=1, where=eligible, initial=infinity)
+    d_max = np.max(
+        np.where(para_h < infinity, para_p + para_h, np.inf),
+        axis=1,
+        where=eligible,
+        initial=0.0,
+    )
+    lag_min = np.where(para_lmin > -infinity, para_lmin, -np.inf)
+    lag_max = np.where(para_lmax < infinity, para_lmax, np.inf)
+    np.fill_diagonal(lag_min, -np.inf)
+    np.fill_diagonal(lag_max, np.inf)
+
+    s_lb = np.zeros(n_opt)
+    c_ub = np.full(n_opt, float(horizon))
+    if para_window is not None:
+        para_window = np.asarray(para_window, dtype=float)
+        s_lb = np.maximum(s_lb, para_window[:, 0])
+        c_ub = np.minimum(c_ub, np.where(para_window[:, 1] < infinity, para_window[:, 1], np.inf))
+    c_lb = s_lb + d_min
+    s_ub = c_ub - d_min
+
+    # a longest path visits every one of the 2 * n_opt time variables at most once
+    for _ in range(2 * n_opt + 1):
+        bounds = (s_lb.copy(), s_ub.copy(), c_lb.copy(), c_ub.copy())
+
+        s_lb = np.maximum.reduce([s_lb, c_lb - d_max, np.max(c_lb[:, None] + lag_min, axis=0)])
+        c_lb = np.maximum.reduce([c_lb, s_lb + d_min, np.max(s_lb[None, :] - lag_max, axis=1)])
+        c_ub = np.minimum.reduce([c_ub, s_ub + d_max, np.min(s_ub[None, :] - lag_min, axis=1)])
+        s_ub = np.minimum.reduce([s_ub, c_ub - d_min, np.min(c_ub[:, None] + lag_max, axis=0)])
+
+        if all(np.array_equal(old, new) for old, new in zip(bounds, (s_lb, s_ub, c_lb, c_ub))):
+            break
+    else:
+        raise ValueError("the lags contain a cycle that cannot be satisfied.")
+
+    if np.any(s_lb > s_ub) or np.any(c_lb > c_ub):
+        raise ValueError("the time windows and the lags cannot be satisfied together.")
+
+    return s_lb, s_ub, c_lb, c_ub
+
+
+def get_para_window(operation_data, n_opt):
+    """Get the time windows (a_i, b_i) of the first n_opt operations parsed by parse_data."""
+    return np.array(
+        [[operation_data[str(i)]["a"], operation_data[str(i)]["b"]] for i in range(n_opt)],
+        dtype=float,
+    )
+
+
 def get_m_value_old(para_p, para_h, para_lmin, para_a):
     selected_idx = np.argwhere(para_p != np.inf)
     # eq. (17)
@@ -344,3 +570,118 @@ def parse_data(input_fname):
                     }
 
     return n_opt, n_mach, operation_data, machine_data  # pylint: disable=E0601
+
+
+# the phases of a profiling run, in the order of the columns of PhaseTimer.to_row
+PHASES = (
+    "parse",
+    "normalize",
+    "bounds",
+    "warm_start",
+    "build",
+    "presolve",
+    "solve",
+    "extract",
+    "check_milp",
+    "check_cp",
+)
+
+
+def get_peak_memory():
+    """Get the peak resident set size and the peak traced Python heap in bytes.
+
+    Both peaks start again after every call. The peak RSS is VmHWM of /proc/self/status,
+    reset through /proc/self/clear_refs; without them (not Linux) it is ru_maxrss, the peak
+    since the start of the process. The peak heap is None if tracemalloc is not tracing.
+    """
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            peak_rss = next(
+                int(line.split()[1]) * 1024 for line in f if line.startswith("VmHWM:")
+            )
+        with open("/proc/self/clear_refs", "w", encoding="utf-8") as f:
+            f.write("5")
+    except (OSError, StopIteration):
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    peak_heap = None
+    if tracemalloc.is_tracing():
+        peak_heap = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+    return peak_rss, peak_heap
+
+
+class PhaseTimer:
+    """Accumulate the wall-clock and CPU time and the peak memory of the phases of a run.
+
+    The CPU time is time.process_time, i.e. of all the threads of the process, so the CPU
+    time of the solve phases includes the solver threads. A phase that runs more than once
+    accumulates its times and keeps the largest peaks.
+
+    The peaks of a phase are the peaks of get_peak_memory between its start and its end,
+    the solvers included in the RSS. As every PhaseTimer.now() starts new peaks, the phases
+    must not be nested.
+
+    Parameters
+    ----------
+    trace_memory : bool
+        Also record the peak of the Python heap with tracemalloc, by default False. This
+        starts tracemalloc, which slows down the allocations of Python (not of the solvers)
+        and keeps tracing until tracemalloc.stop().
+
+    Examples
+    --------
+    >>> timer = PhaseTimer()
+    >>> with timer.phase("build"):
+    ...     fjss4.build_model_gurobi()
+    >>> timer.to_row()["build_wall_seconds"]
+    0.52
+
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.wall_seconds = OrderedDict()
+        self.cpu_seconds = OrderedDict()
+        self.peak_rss = OrderedDict()
+        self.peak_heap = OrderedDict()
+
+    @staticmethod
+    def now():
+        """Get the current (wall-clock, CPU) time and the (RSS, heap) peaks since the last call."""
+        return (time.perf_counter(), time.process_time()) + get_peak_memory()
+
+    def add(self, name, start, end):
+        """Add the time and the peaks between two PhaseTimer.now() to the phase name."""
+        self.wall_seconds[name] = self.wall_seconds.get(name, 0.0) + end[0] - start[0]
+        self.cpu_seconds[name] = self.cpu_seconds.get(name, 0.0) + end[1] - start[1]
+        self.peak_rss[name] = max(self.peak_rss.get(name, 0), end[2])
+        if end[3] is not None:
+            self.peak_heap[name] = max(self.peak_heap.get(name, 0), end[3])
+
+    @contextmanager
+    def phase(self, name):
+        """Time the body of the with statement as the phase name."""
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.add(name, start, self.now())
+
+    def to_row(self):
+        """Get the columns <phase>_wall_seconds, <phase>_cpu_seconds, <phase>_peak_rss_mib
+        and, with trace_memory, <phase>_peak_heap_mib of every phase.
+
+        All the PHASES are included, 0.0 if they did not run, so that the rows of different
+        runs have the same columns. Other phases follow in the order they first ran.
+        """
+        names = list(PHASES) + [name for name in self.wall_seconds if name not in PHASES]
+        row = OrderedDict()
+        for name in names:
+            row[f"{name}_wall_seconds"] = self.wall_seconds.get(name, 0.0)
+            row[f"{name}_cpu_seconds"] = self.cpu_seconds.get(name, 0.0)
+            row[f"{name}_peak_rss_mib"] = self.peak_rss.get(name, 0) / 1024**2
+            if self.trace_memory:
+                row[f"{name}_peak_heap_mib"] = self.peak_heap.get(name, 0) / 1024**2
+        return row